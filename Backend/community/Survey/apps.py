@@ -1,4 +1,12 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def install_member_search(sender, using="default", **kwargs):
+    # (re)creates the SQLite FTS table / triggers a table rebuild may have dropped
+    from Survey import search
+    search.install(connections[using])
 
 
 class SurveyConfig(AppConfig):
@@ -7,3 +15,4 @@ class SurveyConfig(AppConfig):
 
     def ready(self):
         import Survey.signals
+        post_migrate.connect(install_member_search, sender=self)
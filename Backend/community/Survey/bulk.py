@@ -0,0 +1,203 @@
+"""
+Batch create / update endpoints.
+
+``POST|PUT|PATCH /api/<resource>/bulk/`` takes a JSON array. Every item is
+validated by the resource's own serializer; if any item fails nothing is
+written and the errors come back keyed by item index. Valid batches are
+written with bulk_create / bulk_update inside one transaction.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import stamp
+from .reports import invalidate_reports
+
+BULK_MAX = 500
+
+
+def sync_children(model, fk, key, items_by_parent):
+    """
+    Make each parent's ``model`` rows match ``items_by_parent``
+    ({parent_id: [attrs, ...]}) without delete-and-reinsert: existing rows
+    are paired with items on ``key``, changed pairs are bulk_update'd,
+    unpaired items created and unpaired rows deleted.
+    """
+    if not items_by_parent:
+        return
+
+    existing = defaultdict(lambda: defaultdict(list))
+    rows = model.objects.filter(**{f"{fk}_id__in": list(items_by_parent)}).order_by("id")
+    for row in rows:
+        existing[getattr(row, f"{fk}_id")][getattr(row, key)].append(row)
+
+    to_create, to_update, changed_fields = [], [], set()
+    for parent_id, items in items_by_parent.items():
+        current = existing.get(parent_id, {})
+        for attrs in items:
+            matches = current.get(attrs.get(key))
+            if not matches:
+                to_create.append(model(**{f"{fk}_id": parent_id}, **attrs))
+                continue
+
+            row = matches.pop(0)
+            changed = {f: v for f, v in attrs.items() if getattr(row, f) != v}
+            if changed:
+                for field, value in changed.items():
+                    setattr(row, field, value)
+                changed_fields.update(changed)
+                to_update.append(row)
+
+    leftovers = [row.pk for by_key in existing.values() for rows in by_key.values() for row in rows]
+
+    if leftovers:
+        model.objects.filter(pk__in=leftovers).delete()
+    if to_update:
+        stamp(to_update)
+        model.objects.bulk_update(to_update, sorted(changed_fields | {"revision"}))
+    if to_create:
+        stamp(to_create)
+        model.objects.bulk_create(to_create)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ``many=True`` serializer that writes with bulk_create / bulk_update.
+
+    For updates ``instance`` is a {pk: object} mapping and every item must
+    carry its ``id``. The child serializer may define:
+
+    * ``bulk_nested`` – {field: (fk name, pairing key)} for nested many=True
+      fields, synced with ``sync_children``
+    * ``bulk_written(objs, created)`` – called once after the rows are written
+      (bulk writes send no model signals)
+    """
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+
+        pk = data.get("id") if isinstance(data, dict) else None
+        obj = self.instance.get(pk) if isinstance(pk, int) else None
+        if obj is None:
+            raise serializers.ValidationError({"id": ["Unknown id."]})
+
+        self.child.instance = obj
+        self.child.initial_data = data
+        try:
+            attrs = super().run_child_validation(data)
+        finally:
+            self.child.instance = None
+        attrs["id"] = pk
+        return attrs
+
+    def _split_nested(self, validated_data):
+        nested_fields = getattr(self.child, "bulk_nested", {})
+        nested = []
+        for attrs in validated_data:
+            nested.append({name: attrs.pop(name) for name in nested_fields if name in attrs})
+        return nested
+
+    def _write_nested(self, objs, nested):
+        for name, (fk, key) in getattr(self.child, "bulk_nested", {}).items():
+            model = self.child.fields[name].child.Meta.model
+            items_by_parent = {
+                obj.pk: [item for item in extra[name] if any(item.values())]
+                for obj, extra in zip(objs, nested)
+                if name in extra
+            }
+            sync_children(model, fk, key, items_by_parent)
+
+    def _written(self, objs, created):
+        hook = getattr(self.child, "bulk_written", None)
+        if hook:
+            hook(objs, created)
+        invalidate_reports()
+
+    @transaction.atomic
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        nested = self._split_nested(validated_data)
+
+        objs = [model(**attrs) for attrs in validated_data]
+        stamp(objs)
+        objs = model.objects.bulk_create(objs)
+        self._write_nested(objs, nested)
+        self._written(objs, created=True)
+        return objs
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        model = self.child.Meta.model
+        nested = self._split_nested(validated_data)
+
+        objs, fields = [], set()
+        for attrs in validated_data:
+            obj = instance[attrs.pop("id")]
+            for field, value in attrs.items():
+                setattr(obj, field, value)
+            fields.update(attrs)
+            objs.append(obj)
+
+        if fields:
+            stamp(objs)
+            model.objects.bulk_update(objs, sorted(fields | {"revision"}))
+        self._write_nested(objs, nested)
+        self._written(objs, created=False)
+        return objs
+
+
+def item_errors(errors):
+    """ListSerializer errors (a list or an index dict) → {index: errors} for failed items."""
+    if isinstance(errors, dict):
+        return errors
+    return {index: error for index, error in enumerate(errors) if error}
+
+
+class BulkWriteViewSetMixin:
+    """
+    ✔ POST  /bulk/ → create every item
+    ✔ PUT   /bulk/ → full update, each item carries its ``id``
+    ✔ PATCH /bulk/ → partial update, each item carries its ``id``
+    """
+
+    bulk_max = BULK_MAX
+
+    @action(detail=False, methods=["post", "put", "patch"], url_path="bulk")
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "A non-empty JSON array is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > self.bulk_max:
+            return Response(
+                {"error": f"At most {self.bulk_max} items per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        creating = request.method == "POST"
+        if creating:
+            serializer = self.get_serializer(data=items, many=True)
+        else:
+            ids = [item.get("id") for item in items if isinstance(item, dict)]
+            instances = self.get_queryset().in_bulk([i for i in ids if isinstance(i, int)])
+            serializer = self.get_serializer(
+                instances, data=items, many=True, partial=request.method == "PATCH"
+            )
+
+        if not serializer.is_valid():
+            return Response(
+                {"errors": item_errors(serializer.errors)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        objs = serializer.save()
+        return Response(
+            {"count": len(objs), "ids": [obj.pk for obj in objs]},
+            status=status.HTTP_201_CREATED if creating else status.HTTP_200_OK
+        )
@@ -0,0 +1,155 @@
+"""
+House.total_members / House.total_voters bookkeeping.
+
+Every house of a family carries the family's member and voter totals.
+Member writes adjust them with F() deltas instead of re-counting, deltas
+can be coalesced for a whole block with ``deferred_house_counts()``, and
+``recount_houses()`` rebuilds them from scratch in a single UPDATE.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import House, Member, next_revision
+
+_local = threading.local()
+
+
+def counted_state(member):
+    """
+    (family_id, is_voter) as last written to the DB, or None when unknown
+    (e.g. the instance was built by hand or loaded with deferred fields).
+    """
+    return getattr(member, "_counted_as", None)
+
+
+def remember_state(member):
+    member._counted_as = (member.family_id, bool(member.election_id))
+
+
+def _pending():
+    return getattr(_local, "pending", None)
+
+
+@transaction.atomic
+def _update(family_ids, members, voters):
+    House.objects.filter(family_id__in=family_ids).update(
+        total_members=Greatest(F("total_members") + members, Value(0)),
+        total_voters=Greatest(F("total_voters") + voters, Value(0)),
+        revision=next_revision(),
+    )
+
+
+def apply_delta(family_id, members=0, voters=0):
+    if not family_id or (members == 0 and voters == 0):
+        return
+
+    pending = _pending()
+    if pending is None:
+        _update([family_id], members, voters)
+        return
+
+    dm, dv = pending["deltas"][family_id]
+    pending["deltas"][family_id] = (dm + members, dv + voters)
+
+
+def mark_dirty(family_id):
+    """Schedule a full recount for a family whose previous state is unknown."""
+    if not family_id:
+        return
+
+    pending = _pending()
+    if pending is None:
+        recount_houses([family_id])
+    else:
+        pending["dirty"].add(family_id)
+
+
+def member_saved(member, created):
+    new_family = member.family_id
+    new_voter = bool(member.election_id)
+    old = None if created else counted_state(member)
+
+    if old is None and not created:
+        mark_dirty(new_family)
+    else:
+        old_family, old_voter = old or (None, False)
+        if old_family == new_family:
+            apply_delta(new_family, 0, int(new_voter) - int(old_voter))
+        else:
+            apply_delta(old_family, -1, -int(old_voter))
+            apply_delta(new_family, 1, int(new_voter))
+
+    remember_state(member)
+
+
+def member_deleted(member):
+    family_id, voter = counted_state(member) or (member.family_id, bool(member.election_id))
+    apply_delta(family_id, -1, -int(voter))
+
+
+def flush(deltas, dirty=()):
+    # Families that get recounted anyway don't need their deltas applied.
+    grouped = defaultdict(list)
+    for family_id, delta in deltas.items():
+        if family_id not in dirty and delta != (0, 0):
+            grouped[delta].append(family_id)
+
+    for (members, voters), family_ids in grouped.items():
+        _update(family_ids, members, voters)
+
+    if dirty:
+        recount_houses(dirty)
+
+
+@contextmanager
+def deferred_house_counts():
+    """
+    Collect counter changes made inside the block and write them on exit,
+    one UPDATE per distinct delta. Nested blocks join the outer one and
+    nothing is written if the block raises.
+    """
+    if _pending() is not None:
+        yield
+        return
+
+    pending = {"deltas": defaultdict(lambda: (0, 0)), "dirty": set()}
+    _local.pending = pending
+    try:
+        yield
+    finally:
+        _local.pending = None
+
+    flush(pending["deltas"], pending["dirty"])
+
+
+@transaction.atomic
+def recount_houses(family_ids=None, house_ids=None):
+    """
+    Recompute stored totals from Member rows with one aggregate UPDATE,
+    limited to ``family_ids`` / ``house_ids`` when given. Returns the number
+    of houses written.
+    """
+    members = (
+        Member.objects.filter(family_id=OuterRef("family_id"))
+        .order_by()
+        .values("family_id")
+    )
+    member_total = members.annotate(c=Count("id")).values("c")
+    voter_total = members.annotate(c=Count("id", filter=Q(election_id=True))).values("c")
+
+    houses = House.objects.all()
+    if family_ids is not None:
+        houses = houses.filter(family_id__in=list(family_ids))
+    if house_ids is not None:
+        houses = houses.filter(id__in=list(house_ids))
+
+    return houses.update(
+        total_members=Coalesce(Subquery(member_total, output_field=IntegerField()), 0),
+        total_voters=Coalesce(Subquery(voter_total, output_field=IntegerField()), 0),
+        revision=next_revision(),
+    )
@@ -0,0 +1,99 @@
+"""
+Booth-wise member / voter lists as CSV or XLSX.
+
+Rows come from ``values_list(...).iterator()`` so only the requested columns
+are read and memory stays flat: CSV is written straight into the response,
+XLSX is built by openpyxl's write-only mode in a temp file and streamed back.
+"""
+import csv
+import tempfile
+
+from rest_framework.exceptions import ValidationError
+
+from .models import Member
+
+CHUNK_SIZE = 2000
+
+# Related columns that can be exported alongside Member's own fields
+RELATED_COLUMNS = {
+    "family__family_name_en": "Family Name(EN)",
+    "family__family_name_ml": "Family Name(ML)",
+    "family__h_no": "House No",
+    "family__sub": "Sub",
+    "house__owner_en": "House Owner",
+    "constituency__constituency": "Constituency",
+}
+
+DEFAULT_COLUMNS = [
+    "polling_booth_no", "roll_no_sec", "roll_no_ceo",
+    "m_name_en", "m_name_ml", "guardian_en", "guardian_ml",
+    "m_gender", "m_age", "voter_id_number", "epic_id",
+    "family__h_no", "family__sub", "family__family_name_en",
+]
+
+
+def member_columns():
+    columns = {f.attname: f.verbose_name for f in Member._meta.concrete_fields}
+    columns.update(RELATED_COLUMNS)
+    return columns
+
+
+def parse_columns(param):
+    """``?columns=a,b`` → validated list, DEFAULT_COLUMNS when absent."""
+    if not param:
+        return list(DEFAULT_COLUMNS)
+
+    allowed = member_columns()
+    columns = [c.strip() for c in param.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in allowed]
+    if unknown:
+        raise ValidationError({"columns": f"Unknown columns: {', '.join(unknown)}"})
+    return columns
+
+
+def export_rows(queryset, columns):
+    return (
+        queryset.order_by("polling_booth_no", "roll_no_sec", "id")
+        .values_list(*columns)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, columns):
+    labels = member_columns()
+    writer = csv.writer(_Echo())
+
+    # BOM so Excel opens Malayalam text as UTF-8
+    yield "\ufeff" + writer.writerow([labels[c] for c in columns])
+
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) == CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+    yield "".join(buffer)
+
+
+def xlsx_file(rows, columns, title="Members"):
+    """Write rows to a temp .xlsx file (write-only mode) and return it rewound."""
+    from openpyxl import Workbook
+
+    labels = member_columns()
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append([str(labels[c]) for c in columns])
+    for row in rows:
+        sheet.append(row)
+
+    out = tempfile.TemporaryFile()
+    workbook.save(out)
+    out.seek(0)
+    return out
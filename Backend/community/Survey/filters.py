@@ -0,0 +1,207 @@
+"""
+Declarative ?param= filters and facet counts for the member list.
+
+MEMBER_FILTERS maps a query param to a Member lookup; MemberFilterBackend
+ANDs together every param present. Comma-separated values mean "any of"
+and match values as stored (facet counts return them in that form).
+Education rows are matched with EXISTS so a member with several never
+shows up twice.
+
+``facet_counts()`` groups the filtered members by every requested facet
+column in one query and folds the combinations into per-facet counts.
+"""
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Value, When
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import MemberEducation
+from .rollups import AGE_BANDS
+
+TRUE = {"1", "true", "yes"}
+FALSE = {"0", "false", "no"}
+
+
+def parse_bool(raw):
+    value = raw.lower()
+    if value in TRUE:
+        return True
+    if value in FALSE:
+        return False
+    raise ValueError("Must be true or false.")
+
+
+def parse_int(raw):
+    if not raw.lstrip("-").isdigit():
+        raise ValueError("Must be a whole number.")
+    return int(raw)
+
+
+def parse_ids(raw):
+    return [parse_int(part) for part in raw.split(",")]
+
+
+def parse_values(raw):
+    return [part.strip() for part in raw.split(",") if part.strip()]
+
+
+class Filter:
+    """One query param → one lookup on Member; ``parse`` turns the raw string into its value."""
+
+    def __init__(self, lookup, parse=parse_values):
+        self.lookup = lookup
+        self.parse = parse
+
+    def q(self, value):
+        if isinstance(value, list):
+            return Q(**{f"{self.lookup}__in": value})
+        return Q(**{self.lookup: value})
+
+
+class ExistsFilter(Filter):
+    """A lookup on a reverse relation, as EXISTS so members aren't repeated."""
+
+    def __init__(self, model, lookup, parse=parse_values):
+        super().__init__(lookup, parse)
+        self.model = model
+
+    def q(self, value):
+        rows = self.model.objects.filter(super().q(value), member=OuterRef("pk"))
+        return Q(Exists(rows))
+
+
+class ClusterFilter(Filter):
+    """The house's cluster, or the family's for members without a house."""
+
+    def __init__(self):
+        super().__init__("cluster", parse_ids)
+
+    def q(self, value):
+        return Q(house__cluster_id__in=value) | Q(house__isnull=True, family__cluster_id__in=value)
+
+
+MEMBER_FILTERS = {
+    # people
+    "gender": Filter("m_gender"),
+    "age_min": Filter("m_age__gte", parse_int),
+    "age_max": Filter("m_age__lte", parse_int),
+    "religion": Filter("religion"),
+    "caste": Filter("caste"),
+    "marital_status": Filter("marital_status"),
+    "blood_group": Filter("blood_grp"),
+    "relation": Filter("m_relation"),
+    "job": Filter("job_status", parse_bool),
+    "disability": Filter("m_disability", parse_bool),
+    "pension": Filter("m_pension", parse_bool),
+    "pension_type": Filter("pension_type"),
+    "ration_card": Filter("m_ration_card", parse_bool),
+    "ration_type": Filter("m_ration_type"),
+    "health_insurance": Filter("m_health_insurance", parse_bool),
+    "chronic_disease": Filter("has_chronic_disease", parse_bool),
+    # place
+    "booth": Filter("polling_booth_no"),
+    "ward": Filter("ward_id", parse_ids),
+    "constituency": Filter("constituency_id", parse_ids),
+    "cluster": ClusterFilter(),
+    # election
+    "voter": Filter("election_id", parse_bool),
+    "has_2002": Filter("has_2002", parse_bool),
+    "has_2025": Filter("has_2025", parse_bool),
+    "d_sir": Filter("d_sir", parse_bool),
+    # related rows
+    "education": ExistsFilter(MemberEducation, "education"),
+    "education_status": ExistsFilter(MemberEducation, "education_status"),
+    "madrasa": Filter("madrasa_details__studied", parse_bool),
+}
+
+
+def member_filter_q(params):
+    """Q for every MEMBER_FILTERS param in ``params``; ValidationError on bad values."""
+    q, errors = Q(), {}
+    for name, spec in MEMBER_FILTERS.items():
+        raw = params.get(name, "").strip()
+        if not raw:
+            continue
+        try:
+            q &= spec.q(spec.parse(raw))
+        except ValueError as exc:
+            errors[name] = str(exc)
+    if errors:
+        raise ValidationError(errors)
+    return q
+
+
+class MemberFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        q = member_filter_q(request.query_params)
+        return queryset.filter(q) if q else queryset
+
+
+# ---------------------------------------
+# FACETS
+# ---------------------------------------
+AGE_BAND = Case(
+    *(
+        When(m_age__gte=low, then=Value(name)) if high is None
+        else When(m_age__gte=low, m_age__lte=high, then=Value(name))
+        for name, (low, high) in AGE_BANDS.items()
+    ),
+    default=Value("age_unknown"),
+)
+
+# ?facets= names → Member columns (or expressions) to count by
+FACETS = {
+    "gender": "m_gender",
+    "age": AGE_BAND,
+    "religion": "religion",
+    "caste": "caste",
+    "marital_status": "marital_status",
+    "booth": "polling_booth_no",
+    "ward": "ward_id",
+    "constituency": "constituency_id",
+    "voter": "election_id",
+    "pension": "m_pension",
+    "disability": "m_disability",
+    "has_2002": "has_2002",
+    "has_2025": "has_2025",
+    "d_sir": "d_sir",
+}
+DEFAULT_FACETS = ["gender", "age", "religion", "booth"]
+
+
+def facet_counts(queryset, names):
+    """
+    {"count": n, "facets": {name: [{"value", "count"}, ...]}} for the members
+    in ``queryset``, largest bucket first, from one grouped query.
+    """
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValidationError({"facets": f"Unknown facets: {', '.join(unknown)}"})
+
+    columns = {
+        f"facet_{name}": F(FACETS[name]) if isinstance(FACETS[name], str) else FACETS[name]
+        for name in names
+    }
+    rows = (
+        queryset.order_by()
+        .values(**columns)
+        # only the house page's OR filter can repeat a member
+        .annotate(n=Count("id", distinct=queryset.query.distinct))
+    )
+
+    total, buckets = 0, {name: {} for name in names}
+    for row in rows:
+        total += row["n"]
+        for name in names:
+            value = row[f"facet_{name}"]
+            buckets[name][value] = buckets[name].get(value, 0) + row["n"]
+
+    return {
+        "count": total,
+        "facets": {
+            name: [
+                {"value": value, "count": count}
+                for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+            ]
+            for name, counts in buckets.items()
+        },
+    }
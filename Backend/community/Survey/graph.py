@@ -0,0 +1,222 @@
+"""
+Household graph: who is whose guardian and who lived in which house.
+
+A household is every member and house within HOPS steps of a member (or a
+family), a step being the family, the current house, the original house or
+the MemberHouse history. It is loaded with a fixed number of queries
+whatever its size, each an IN lookup on indexed foreign keys. Guardians
+come from the GuardianLink rows Survey/guardians.py keeps current.
+
+member_household(member) / family_household(family) load a Household;
+Household.graph() and Household.tree() shape it for the API.
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import GuardianLink, House, Member, MemberHouse
+
+MEMBER_FIELDS = (
+    "id", "m_name_en", "m_name_ml", "m_age", "m_gender", "m_relation",
+    "guardian_en", "guardian_ml", "g_relation",
+    "family_id", "house_id", "original_house_id", "is_active_in_house",
+)
+HOUSE_FIELDS = ("id", "owner_en", "owner_ml", "family_id", "cluster_id")
+
+# what member_household() needs of its starting member
+ROOT_FIELDS = ("id", "family_id", "house_id", "original_house_id")
+
+# rounds of "members of these families / houses → their families / houses"
+HOPS = 2
+
+
+def member_household(member):
+    """The household around ``member``: its family, houses and their residents."""
+    return Household.load(
+        member_ids={member.pk},
+        house_ids={member.house_id, member.original_house_id},
+        family_ids={member.family_id},
+    )
+
+
+def family_household(family):
+    """Members of ``family``, everyone who lives or lived in its houses, and so on for HOPS steps."""
+    return Household.load(family_ids={family.pk})
+
+
+class Household:
+    """
+    Members and houses (as dicts) of one household, the MemberHouse links
+    between them, and each member's guardian as (member id or None,
+    candidate ids) from its GuardianLink.
+    """
+
+    def __init__(self, members, houses, links, guardians):
+        self.members = {member["id"]: member for member in members}
+        self.houses = {house["id"]: house for house in houses}
+        self.links = links
+        self.guardians = {
+            member_id: guardians.get(member_id, (None, [])) for member_id in self.members
+        }
+
+    @classmethod
+    def load(cls, member_ids=(), house_ids=(), family_ids=(), hops=HOPS):
+        """
+        Start from the given members, houses and families and take ``hops``
+        rounds of: houses of the families, then the members of the families
+        and houses (residents, original residents, past residents), then
+        those members' own families and houses. Three queries a round.
+        """
+        member_ids, house_ids, family_ids = set(member_ids), set(house_ids) - {None}, set(family_ids) - {None}
+        members, links = [], []
+
+        for _ in range(hops):
+            houses = House.objects.filter(Q(pk__in=house_ids) | Q(family_id__in=family_ids))
+            for house_id, family_id in houses.values_list("id", "family_id"):
+                house_ids.add(house_id)
+                family_ids.add(family_id)
+
+            # 🔗 family, current / original house, house history
+            members = list(
+                Member.objects.filter(
+                    Q(pk__in=member_ids)
+                    | Q(family_id__in=family_ids)
+                    | Q(house_id__in=house_ids)
+                    | Q(original_house_id__in=house_ids)
+                    | Q(pk__in=MemberHouse.objects.filter(house_id__in=house_ids).values("member_id"))
+                )
+                .order_by("id")
+                .values(*MEMBER_FIELDS)
+            )
+            member_ids = {member["id"] for member in members}
+            links = list(
+                MemberHouse.objects.filter(member_id__in=member_ids)
+                .order_by("id")
+                .values_list("member_id", "house_id", "is_active")
+            )
+
+            house_ids |= {house_id for _, house_id, _ in links}
+            house_ids |= {member[f] for member in members for f in ("house_id", "original_house_id")}
+            house_ids -= {None}
+            family_ids |= {member["family_id"] for member in members} - {None}
+
+        houses = House.objects.filter(pk__in=house_ids).values(*HOUSE_FIELDS)
+        guardians = GuardianLink.objects.filter(member_id__in=member_ids).values_list(
+            "member_id", "guardian_id", "candidates"
+        )
+        return cls(
+            members, list(houses), links,
+            {member_id: (guardian_id, candidates) for member_id, guardian_id, candidates in guardians},
+        )
+
+    # ---------------------------------------
+    # GUARDIANS
+    # ---------------------------------------
+    def guardian(self, member_id):
+        """``member_id``'s guardian when it is part of the household."""
+        guardian = self.guardians[member_id][0]
+        return guardian if guardian in self.members else None
+
+    def guardian_chain(self, member_id):
+        """``member_id``'s guardian, their guardian, ... (stops at a repeat or the household's edge)."""
+        chain, seen = [], {member_id}
+        while (guardian := self.guardian(member_id)) is not None and guardian not in seen:
+            chain.append(guardian)
+            seen.add(guardian)
+            member_id = guardian
+        return chain
+
+    # ---------------------------------------
+    # SHAPES
+    # ---------------------------------------
+    def member_row(self, member_id):
+        member = self.members[member_id]
+        guardian, candidates = self.guardians[member_id]
+        return {
+            "id": member_id,
+            "m_name_en": member["m_name_en"],
+            "m_name_ml": member["m_name_ml"],
+            "m_age": member["m_age"],
+            "m_gender": member["m_gender"],
+            "m_relation": member["m_relation"],
+            "family": member["family_id"],
+            "house": member["house_id"],
+            "original_house": member["original_house_id"],
+            "is_active_in_house": member["is_active_in_house"],
+            "guardian_en": member["guardian_en"],
+            "guardian_ml": member["guardian_ml"],
+            "g_relation": member["g_relation"],
+            "guardian": guardian,
+            "guardian_candidates": candidates,
+        }
+
+    def house_rows(self):
+        return [
+            {
+                "id": house["id"],
+                "owner_en": house["owner_en"],
+                "owner_ml": house["owner_ml"],
+                "family": house["family_id"],
+                "cluster": house["cluster_id"],
+            }
+            for house in sorted(self.houses.values(), key=lambda house: house["id"])
+        ]
+
+    def edges(self):
+        edges = []
+        for member_id, member in self.members.items():
+            guardian = self.guardian(member_id)
+            if guardian is not None:
+                edges.append({"from": member_id, "to": guardian, "kind": "guardian", "relation": member["g_relation"]})
+            if member["house_id"]:
+                edges.append({"from": member_id, "to": member["house_id"], "kind": "house"})
+            if member["original_house_id"]:
+                edges.append({"from": member_id, "to": member["original_house_id"], "kind": "original_house"})
+        for member_id, house_id, is_active in self.links:
+            if not is_active:
+                edges.append({"from": member_id, "to": house_id, "kind": "past_house"})
+        return edges
+
+    def graph(self, root):
+        """Every node and edge around ``root`` plus its guardian line."""
+        return {
+            "member": root,
+            "guardian_chain": self.guardian_chain(root),
+            "members": [self.member_row(member_id) for member_id in sorted(self.members)],
+            "houses": self.house_rows(),
+            "edges": self.edges(),
+        }
+
+    def tree(self):
+        """
+        Members nested under their guardian, eldest first. Members whose
+        guardian isn't in the household start a tree of their own.
+        """
+        def eldest_first(member_id):
+            age = self.members[member_id]["m_age"]
+            return (age is None, -(age or 0), member_id)
+
+        children = defaultdict(list)
+        roots = []
+        for member_id in sorted(self.members, key=eldest_first):
+            guardian = self.guardian(member_id)
+            if guardian is None:
+                roots.append(member_id)
+            else:
+                children[guardian].append(member_id)
+
+        placed = set()
+
+        def node(member_id):
+            placed.add(member_id)
+            return {
+                **self.member_row(member_id),
+                "children": [node(child) for child in children[member_id] if child not in placed],
+            }
+
+        forest = [node(member_id) for member_id in roots]
+        # members naming each other as guardian have no root: start from the eldest
+        for member_id in sorted(self.members, key=eldest_first):
+            if member_id not in placed:
+                forest.append(node(member_id))
+        return {"houses": self.house_rows(), "tree": forest}
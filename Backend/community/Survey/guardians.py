@@ -0,0 +1,323 @@
+"""
+Guardian links: Member.guardian_en / guardian_ml resolved to the member
+they name, stored in GuardianLink so "who is X's guardian" and "who lists
+X as guardian" are indexed joins instead of name scans.
+
+A guardian is looked for in the member's neighbourhood: its family, and
+everyone whose current or original house is the member's current or
+original house. A candidate matches when its name or one of its aliases
+normalizes (names.normalize_name, the MemberNameVariant.normalized_name
+key) to the guardian name, English first, then Malayalam. Candidates are
+ranked same family, then older, then same house; a tie is stored
+unresolved with the tied ids in ``candidates``.
+
+Links keep the normalized guardian names, so when a member changes only
+its own link and the links of neighbours whose guardian key is one of its
+names are redone (``relink()``), with a fixed number of queries. Inside
+``deferred_links()`` that happens once, on exit.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import zip_longest
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import GUARDIAN_LINK_FIELDS as LINK_FIELDS, GuardianLink, Member, MemberNameVariant
+from .names import normalize_name
+
+_local = threading.local()
+
+MEMBER_FIELDS = ("id", *LINK_FIELDS)
+
+# families resolved per round of rebuild()
+FAMILY_BATCH = 500
+# a member's current link, as read alongside MEMBER_FIELDS by relink()
+LINK_COLUMNS = (
+    "guardian_link__guardian_key", "guardian_link__guardian_key_ml", "guardian_link__guardian_id",
+)
+# ids per IN (...) list; a statement carries up to five of them, which
+# stays well under SQLite's usual 32766 bound parameters
+ID_BATCH = 2000
+
+
+# ---------------------------------------
+# RESOLVE
+# ---------------------------------------
+def guardian_keys(member):
+    """Normalized (English, Malayalam) guardian names, "" when missing."""
+    return normalize_name(member["guardian_en"]) or "", normalize_name(member["guardian_ml"]) or ""
+
+
+def name_keys(member):
+    return {normalize_name(member["m_name_en"]), normalize_name(member["m_name_ml"])} - {None, ""}
+
+
+def rank(member, candidate):
+    older = None not in (candidate["m_age"], member["m_age"]) and candidate["m_age"] > member["m_age"]
+    return (
+        member["family_id"] is not None and candidate["family_id"] == member["family_id"],
+        older,
+        member["house_id"] is not None and candidate["house_id"] == member["house_id"],
+    )
+
+
+class Neighbourhoods:
+    """Candidate members (as dicts) indexed by (name key, family) and (name key, house)."""
+
+    def __init__(self, members, aliases):
+        self.members = {member["id"]: member for member in members}
+        self.by_family = defaultdict(set)
+        self.by_house = defaultdict(set)
+        for member in members:
+            for key in name_keys(member):
+                self.add(member, key)
+        for member_id, key in aliases:
+            member = self.members[member_id]
+            # SIR updates keep a replaced guardian name as an alias of the ward
+            if key and key not in guardian_keys(member):
+                self.add(member, key)
+
+    def add(self, member, key):
+        if member["family_id"] is not None:
+            self.by_family[key, member["family_id"]].add(member["id"])
+        for house_id in {member["house_id"], member["original_house_id"]} - {None}:
+            self.by_house[key, house_id].add(member["id"])
+
+    def named(self, member, key):
+        """Members called ``key`` in ``member``'s family or current / original house."""
+        matches = set(self.by_family.get((key, member["family_id"]), ()))
+        for house_id in {member["house_id"], member["original_house_id"]} - {None}:
+            matches |= self.by_house.get((key, house_id), set())
+        matches.discard(member["id"])
+        return matches
+
+    def resolve(self, member):
+        """(guardian id or None, tied candidate ids)."""
+        for key in guardian_keys(member):
+            matches = self.named(member, key) if key else None
+            if matches:
+                break
+        else:
+            return None, []
+
+        best = max(rank(member, self.members[c]) for c in matches)
+        top = sorted(c for c in matches if rank(member, self.members[c]) == best)
+        return (top[0], []) if len(top) == 1 else (None, top)
+
+    def link(self, member, model=GuardianLink):
+        """An unsaved ``model`` row for ``member``, None when it names no guardian."""
+        key, key_ml = guardian_keys(member)
+        if not (key or key_ml):
+            return None
+        guardian_id, candidates = self.resolve(member)
+        return model(
+            member_id=member["id"], guardian_id=guardian_id, candidates=candidates,
+            guardian_key=key, guardian_key_ml=key_ml,
+        )
+
+
+def batches(ids):
+    ids = list(ids)
+    return [ids[start:start + ID_BATCH] for start in range(0, len(ids), ID_BATCH)]
+
+
+def rounds(*id_sets):
+    """One tuple of ID_BATCH-sized lists per query, [] once a set runs out."""
+    return zip_longest(*(batches(ids) for ids in id_sets), fillvalue=[])
+
+
+def neighbourhood_q(family_ids, house_ids):
+    return (
+        Q(family_id__in=family_ids)
+        | Q(house_id__in=house_ids)
+        | Q(original_house_id__in=house_ids)
+    )
+
+
+def in_neighbourhood(member, family_ids, house_ids):
+    return member["family_id"] in family_ids or bool(
+        {member["house_id"], member["original_house_id"]} & house_ids
+    )
+
+
+@transaction.atomic(savepoint=False)
+def link_members(members):
+    """Resolve and store the links of ``members`` (dicts with MEMBER_FIELDS)."""
+    if not members:
+        return 0
+    family_ids = {m["family_id"] for m in members} - {None}
+    house_ids = {m[f] for m in members for f in ("house_id", "original_house_id")} - {None}
+
+    pool = {m["id"]: m for m in members}
+    for families, houses in rounds(family_ids, house_ids):
+        for m in Member.objects.filter(neighbourhood_q(families, houses)).values(*MEMBER_FIELDS):
+            pool.setdefault(m["id"], m)
+    aliases = [
+        alias
+        for ids in batches(pool)
+        for alias in MemberNameVariant.objects.filter(member_id__in=ids).values_list(
+            "member_id", "normalized_name"
+        )
+    ]
+    neighbourhoods = Neighbourhoods(list(pool.values()), aliases)
+
+    links, unnamed = [], []
+    for member in members:
+        link = neighbourhoods.link(member)
+        if link is None:
+            unnamed.append(member["id"])
+        else:
+            links.append(link)
+
+    for ids in batches(unnamed):
+        GuardianLink.objects.filter(member_id__in=ids).delete()
+    GuardianLink.objects.bulk_create(
+        links,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["member"],
+        update_fields=["guardian", "candidates", "guardian_key", "guardian_key_ml"],
+    )
+    return len(links)
+
+
+def relink(member_ids=(), named_ids=(), family_ids=(), house_ids=(), keys=()):
+    """
+    Redo the links of ``member_ids``, and of the members who could name
+    one of ``member_ids`` / ``named_ids`` as guardian: those in their
+    families and houses (or ``family_ids`` / ``house_ids``, where they used
+    to be) whose guardian key is one of their names, aliases or ``keys``
+    (names they used to have). Returns the links written.
+    """
+    member_ids = set(member_ids)
+    named_ids = set(named_ids) | member_ids
+    family_ids, house_ids, keys = set(family_ids), set(house_ids), set(keys)
+
+    for ids in batches(named_ids):
+        for member in Member.objects.filter(pk__in=ids).values(*MEMBER_FIELDS):
+            family_ids.add(member["family_id"])
+            house_ids.update((member["house_id"], member["original_house_id"]))
+            keys |= name_keys(member)
+        keys |= set(
+            MemberNameVariant.objects.filter(member_id__in=ids).values_list("normalized_name", flat=True)
+        )
+    family_ids -= {None}
+    house_ids -= {None}
+    keys -= {None, ""}
+
+    # the keys (as many as the members named) are matched here, not in SQL
+    members = {}
+    for families, houses, named in rounds(family_ids, house_ids, named_ids):
+        rows = Member.objects.filter(
+            neighbourhood_q(families, houses)
+            | Q(pk__in=[pk for pk in named if pk in member_ids])
+            | Q(guardian_link__guardian_id__in=named)
+        ).values(*MEMBER_FIELDS, *LINK_COLUMNS)
+        for row in rows:
+            key, key_ml, guardian_id = (row.pop(column) for column in LINK_COLUMNS)
+            if (
+                row["id"] in member_ids
+                # resolved to one of them under a name since dropped
+                or guardian_id in named_ids
+                or ({key, key_ml} & keys and in_neighbourhood(row, family_ids, house_ids))
+            ):
+                members.setdefault(row["id"], row)
+    return link_members(list(members.values()))
+
+
+def rebuild():
+    """Every link, FAMILY_BATCH families at a time. Returns the links written."""
+    family_ids = list(
+        Member.objects.exclude(family=None).order_by("family_id").values_list("family_id", flat=True).distinct()
+    )
+    written = 0
+    with transaction.atomic():
+        GuardianLink.objects.all().delete()
+        for start in range(0, len(family_ids), FAMILY_BATCH):
+            members = Member.objects.filter(family_id__in=family_ids[start:start + FAMILY_BATCH])
+            written += link_members(list(members.values(*MEMBER_FIELDS)))
+        written += link_members(list(Member.objects.filter(family=None).values(*MEMBER_FIELDS)))
+    return written
+
+
+# ---------------------------------------
+# DIRTY TRACKING
+# ---------------------------------------
+def _pending():
+    return getattr(_local, "pending", None)
+
+
+def mark_dirty(member_ids=(), named_ids=(), family_ids=(), house_ids=(), keys=()):
+    """See relink(); inside deferred_links() the arguments pile up until the block exits."""
+    pending = _pending()
+    if pending is None:
+        relink(member_ids, named_ids, family_ids, house_ids, keys)
+        return
+    for name, values in zip(
+        ("members", "named", "families", "houses", "keys"),
+        (member_ids, named_ids, family_ids, house_ids, keys),
+    ):
+        pending[name].update(values)
+
+
+def snapshot(member):
+    """LINK_FIELDS values of ``member``, None when some weren't loaded."""
+    loaded = member.__dict__
+    if any(field not in loaded for field in LINK_FIELDS):
+        return None
+    return tuple(loaded[field] for field in LINK_FIELDS)
+
+
+def _was(values):
+    """(families, houses, name keys) of a snapshot: where its namers are."""
+    member = dict(zip(LINK_FIELDS, values))
+    return (
+        {member["family_id"]},
+        {member["house_id"], member["original_house_id"]},
+        name_keys(member),
+    )
+
+
+def member_written(member, created=False):
+    old, new = getattr(member, "_linked_as", None), snapshot(member)
+    if not created and old is not None and old == new:
+        return
+    was = _was(old) if old is not None else ((), (), ())
+    mark_dirty({member.pk}, (), *was)
+    member._linked_as = new
+
+
+def member_removing(member):
+    """pre_delete: remember the aliases its namers may use, they go first."""
+    member._alias_keys = set(member.name_variants.values_list("normalized_name", flat=True))
+
+
+def member_removed(member):
+    values = getattr(member, "_linked_as", None) or snapshot(member)
+    if values is None:
+        values = tuple(member.__dict__.get(field) for field in LINK_FIELDS)
+    family_ids, house_ids, keys = _was(values)
+    mark_dirty((), (), family_ids, house_ids, keys | getattr(member, "_alias_keys", set()))
+
+
+@contextmanager
+def deferred_links():
+    """
+    Relink what was dirtied inside the block once, on exit. Nested blocks
+    join the outer one and nothing is written if the block raises.
+    """
+    if _pending() is not None:
+        yield
+        return
+
+    _local.pending = {name: set() for name in ("members", "named", "families", "houses", "keys")}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+
+    if any(pending.values()):
+        relink(pending["members"], pending["named"], pending["families"], pending["houses"], pending["keys"])
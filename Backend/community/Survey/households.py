@@ -0,0 +1,52 @@
+"""
+Moving members between houses.
+
+A member has at most one active house: ``Member.house`` plus an active
+``MemberHouse`` link, with inactive links kept as history. ``assign_house``
+moves any number of members with a fixed number of set-based statements.
+"""
+from django.db import transaction
+
+from . import guardians
+from .models import Member, MemberHouse, next_revision
+from .reports import invalidate_reports
+from .rollups import members_moved
+
+
+@transaction.atomic
+def assign_house(member_ids, house):
+    """
+    Make ``house`` the only active house of every member in ``member_ids``.
+    Returns the number of members moved.
+
+    House totals are per family and a member keeps its family when it moves,
+    so the stored counters need no adjustment; ``update()`` skips the
+    per-member signals that would otherwise recount them.
+    """
+    member_ids = list(set(member_ids))
+    left = set(Member.objects.filter(id__in=member_ids).values_list("house_id", flat=True))
+
+    # 🔴 1. Deactivate links to any other house
+    MemberHouse.objects.filter(member_id__in=member_ids, is_active=True).exclude(
+        house=house
+    ).update(is_active=False)
+
+    # 🔴 2. Point the members at the new house
+    moved = Member.objects.filter(id__in=member_ids).update(
+        house=house, is_active_in_house=True, revision=next_revision()
+    )
+
+    # 🔴 3. Create or re-activate the links to the new house
+    MemberHouse.objects.bulk_create(
+        [MemberHouse(member_id=member_id, house=house, is_active=True) for member_id in member_ids],
+        update_conflicts=True,
+        unique_fields=["member", "house"],
+        update_fields=["is_active"],
+    )
+
+    # the new house may sit in another cluster
+    members_moved(Member.objects.filter(id__in=member_ids))
+    # guardians are looked for by house: the movers and both neighbourhoods
+    guardians.mark_dirty(member_ids, house_ids=left | {house.pk})
+    invalidate_reports()
+    return moved
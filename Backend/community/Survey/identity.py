@@ -0,0 +1,75 @@
+"""
+In-process lookup of members by their electoral identifiers.
+
+The import commands build one MemberIdentityIndex up front and then match
+every sheet row with dictionary hits instead of one query per row.
+"""
+from collections import defaultdict
+
+from .models import Member
+
+IDENTITY_FIELDS = ("voter_id_number", "roll_no_sec", "roll_no_ceo", "epic_id")
+
+
+def no_scope(member):
+    return None
+
+
+class MemberIdentityIndex:
+    """
+    (scope, field, value) → members.
+
+    ``scope`` narrows a match the way each command needs it, e.g.
+    ``(family, age)`` for import_members or the polling booth for the SIR
+    update; the default is one global scope.
+    """
+
+    def __init__(self, members=(), scope=no_scope, fields=IDENTITY_FIELDS):
+        self.scope = scope
+        self.fields = fields
+        self._index = defaultdict(list)
+        self.members = []
+        for member in members:
+            self.add(member)
+
+    @classmethod
+    def from_queryset(cls, queryset=None, scope=no_scope, fields=IDENTITY_FIELDS, extra=()):
+        """
+        Load only the columns needed to index (plus ``extra``) in one query.
+        ``scope`` may only read loaded columns, or it will query per member.
+        """
+        queryset = Member.objects.all() if queryset is None else queryset
+        queryset = queryset.only(
+            "id", "family_id", "election_id", "m_age", "constituency_id", "polling_booth_no",
+            *fields, *extra,
+        )
+        return cls(queryset.iterator(chunk_size=5000), scope=scope, fields=fields)
+
+    def __len__(self):
+        """Members indexed (each one counted once, however many keys it has)."""
+        return len(self.members)
+
+    def add(self, member):
+        self.members.append(member)
+        key = self.scope(member)
+        for field in self.fields:
+            value = getattr(member, field)
+            if value:
+                self._index[(key, field, value)].append(member)
+
+    def get_all(self, field, value, scope=None):
+        if not value:
+            return []
+        return self._index.get((scope, field, value), [])
+
+    def get(self, field, value, scope=None):
+        matches = self.get_all(field, value, scope)
+        return matches[0] if matches else None
+
+    def find(self, scope=None, **identifiers):
+        """First member matching any identifier, checked in ``fields`` order."""
+        for field in self.fields:
+            member = self.get(field, identifiers.get(field), scope)
+            if member:
+                return member
+        return None
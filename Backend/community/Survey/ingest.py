@@ -0,0 +1,211 @@
+"""
+Sheet reading shared by the import commands and import jobs.
+
+``read_table(path, columns)`` parses only the listed columns (header names
+are compared stripped) of an .xlsx / .xls / .csv / .parquet file. Excel goes
+through calamine when python-calamine is installed, openpyxl otherwise;
+Parquet needs pyarrow. Parsed tables of files over INGEST_CACHE_MIN_BYTES
+are pickled under INGEST_CACHE_DIR, keyed by the file's hash and the
+projection, so reading the same sheet again (dry run, then the real run)
+skips parsing.
+
+``iter_chunks(path, columns, rows)`` yields DataFrames of ``rows`` rows
+without holding the whole file: CSV and Parquet natively, .xlsx through
+openpyxl's read-only mode. The index keeps counting across chunks, so
+``index + 2`` is still the sheet row number.
+"""
+import hashlib
+import os
+from functools import lru_cache
+from importlib.util import find_spec
+
+import pandas as pd
+from django.conf import settings
+
+EXCEL = (".xlsx", ".xlsm", ".xls")
+CSV = (".csv",)
+PARQUET = (".parquet",)
+SUPPORTED = EXCEL + CSV + PARQUET
+
+# bump when the cached format / parsing changes
+CACHE_VERSION = 1
+
+
+def extension(path):
+    return os.path.splitext(str(path))[1].lower()
+
+
+@lru_cache(maxsize=None)
+def excel_engine():
+    """pandas' calamine engine when python-calamine is installed, else pandas' default."""
+    return "calamine" if find_spec("python_calamine") else None
+
+
+def wanted(columns):
+    """``usecols`` callable keeping ``columns`` (None keeps everything)."""
+    if columns is None:
+        return None
+    names = set(columns)
+    return lambda name: str(name).strip() in names
+
+
+def _strip_headers(df):
+    df.columns = [str(name).strip() for name in df.columns]
+    return df
+
+
+# ---------------------------------------
+# WHOLE TABLE
+# ---------------------------------------
+def parse(path, columns=None, dtype=None):
+    ext = extension(path)
+    if ext in CSV:
+        return _strip_headers(pd.read_csv(path, usecols=wanted(columns), dtype=dtype))
+    if ext in PARQUET:
+        df = _strip_headers(pd.read_parquet(path))
+        if columns is not None:
+            df = df[[name for name in df.columns if name in set(columns)]]
+        return df.astype(dtype) if dtype else df
+    if ext in EXCEL:
+        return _strip_headers(pd.read_excel(
+            path, usecols=wanted(columns), dtype=dtype, engine=excel_engine()
+        ))
+    raise ValueError(f"Unsupported file type {ext or '(none)'}; use {', '.join(SUPPORTED)}")
+
+
+def read_table(path, columns=None, dtype=None, cache=True):
+    """The first sheet / the table in ``path``, only ``columns``, via the parse cache."""
+    if not cache or os.path.getsize(path) < settings.INGEST_CACHE_MIN_BYTES:
+        return parse(path, columns, dtype)
+
+    cached = os.path.join(settings.INGEST_CACHE_DIR, f"{cache_key(path, columns, dtype)}.pkl")
+    if os.path.exists(cached):
+        return pd.read_pickle(cached)
+
+    df = parse(path, columns, dtype)
+    os.makedirs(settings.INGEST_CACHE_DIR, exist_ok=True)
+    partial = f"{cached}.{os.getpid()}.tmp"
+    df.to_pickle(partial)
+    os.replace(partial, cached)
+    prune_cache()
+    return df
+
+
+# ---------------------------------------
+# CACHE
+# ---------------------------------------
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(path, columns, dtype):
+    projection = "*" if columns is None else ",".join(sorted(columns))
+    options = f"{CACHE_VERSION}|{projection}|{dtype}|{excel_engine()}"
+    return f"{file_hash(path)[:32]}-{hashlib.sha256(options.encode()).hexdigest()[:16]}"
+
+
+def prune_cache():
+    """Keep the INGEST_CACHE_MAX most recently written tables."""
+    directory = settings.INGEST_CACHE_DIR
+    entries = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".pkl")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in entries[settings.INGEST_CACHE_MAX:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+# ---------------------------------------
+# STREAMING
+# ---------------------------------------
+def iter_chunks(path, columns=None, rows=10_000, dtype=None):
+    """DataFrames of at most ``rows`` rows, index continuing across chunks."""
+    ext = extension(path)
+    if ext in CSV:
+        reader = pd.read_csv(path, usecols=wanted(columns), dtype=dtype, chunksize=rows)
+        for df in reader:
+            yield _strip_headers(df)
+    elif ext in PARQUET:
+        yield from _parquet_chunks(path, columns, rows, dtype)
+    elif ext in (".xlsx", ".xlsm"):
+        yield from _xlsx_chunks(path, columns, rows, dtype)
+    else:
+        # .xls has no streaming reader
+        df = read_table(path, columns, dtype)
+        for start in range(0, len(df), rows):
+            yield df.iloc[start:start + rows]
+
+
+def _parquet_chunks(path, columns, rows, dtype):
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    names = None
+    if columns is not None:
+        names = [name for name in parquet.schema_arrow.names if name.strip() in set(columns)]
+
+    offset = 0
+    for batch in parquet.iter_batches(batch_size=rows, columns=names):
+        df = _strip_headers(batch.to_pandas())
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        yield df.astype(dtype) if dtype else df
+
+
+def _cell_text(value):
+    # as read_excel(dtype=str): whole floats lose their ".0", empty cells stay missing
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _xlsx_chunks(path, columns, rows, dtype):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        first = next(sheet.iter_rows(max_row=1, values_only=True), ())
+        header = [str(name).strip() if name is not None else "" for name in first]
+        keep = wanted(columns) or (lambda name: True)
+        positions = [i for i, name in enumerate(header) if name and keep(name)]
+        names = [header[i] for i in positions]
+        if not positions:
+            return
+        # cells right of the last wanted column are never turned into values
+        lines = sheet.iter_rows(min_row=2, max_col=positions[-1] + 1, values_only=True)
+
+        def frame(buffer, index):
+            # object columns: cells stay as openpyxl gave them until converted
+            df = pd.DataFrame(buffer, columns=names, index=index, dtype=object)
+            if dtype is str:
+                df = df.apply(lambda col: col.map(_cell_text))
+                df = df.where(df.notna(), float("nan"))
+            elif dtype:
+                df = df.astype(dtype)
+            return df
+
+        buffer, index = [], []
+        for position, line in enumerate(lines):
+            # blank lines are dropped but still count towards the row number
+            if not any(value is not None for value in line):
+                continue
+            buffer.append([line[i] if i < len(line) else None for i in positions])
+            index.append(position)
+            if len(buffer) == rows:
+                yield frame(buffer, index)
+                buffer, index = [], []
+        if buffer:
+            yield frame(buffer, index)
+    finally:
+        workbook.close()
@@ -0,0 +1,342 @@
+"""
+Chunked, resumable sheet imports (ImportJob / ImportChunk).
+
+split()  reads the uploaded sheet once, runs the kind's one-off prepare
+         step, and stores the rows as pickled chunks. Rows sharing a
+         partition key (a house, a family name, a booth ...) always land
+         in the same chunk, so chunks never race over the same rows.
+work()   claims pending chunks one at a time and imports each in a single
+         transaction together with its "done" mark: a crash loses at most
+         the chunks in flight, and those are simply pending again.
+run()    drives a job: split if needed, start local worker processes
+         (``manage.py run_import_job <id> --worker``), wait, and settle
+         the job's status. The ImportChunk table is the only queue.
+
+While a job runs its driver and workers touch ``heartbeat_at``; a
+"running" job without a recent heartbeat has crashed (``is_stale()``) and
+can be resumed like a failed one.
+
+Rows skipped by an importer are stored per chunk as {"row", "error"},
+"row" being the sheet row number (the header is row 1).
+"""
+import os
+import shutil
+import subprocess
+import sys
+from collections import Counter
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .management.commands import (
+    family_autocreate, fix_polling_booth, import_houses, import_members, import_sir_excel,
+)
+from .models import ImportChunk, ImportJob
+
+ERROR_PREVIEW = 50
+
+
+class ImportKind:
+    """
+    ``read(path)`` → raw DataFrame, ``key(df)`` → partition key per row,
+    ``process(df, skip=)`` → summary counts, ``prepare(df)`` once per job.
+    """
+
+    def __init__(self, read, key, process, prepare=None):
+        self.read = read
+        self.key = key
+        self.process = process
+        self.prepare = prepare
+
+
+def column(*names):
+    """Partition key: the first of ``names`` that the sheet has, as text."""
+    def key(df):
+        for name in names:
+            if name in df.columns:
+                return df[name].fillna("").astype(str).str.strip()
+        return pd.Series("", index=df.index)
+    return key
+
+
+def whole_sheet(df):
+    """Partition key for kinds that must see every row at once: one chunk."""
+    return pd.Series("sheet", index=df.index)
+
+
+def import_member_rows(df, skip=None):
+    importer = import_members.MemberImporter()
+    rows, families = importer.import_frame(import_members.normalize_sheet(df))
+    return {
+        "members": len(importer.new_members),
+        "aliases": importer.alias_count,
+        "families": families,
+    }
+
+
+def create_member_clusters(df):
+    import_members.MemberImporter().create_clusters(import_members.normalize_sheet(df))
+
+
+KINDS = {
+    "members": ImportKind(
+        read=import_members.read_sheet,
+        key=column(*import_members.COLUMNS["house"]),
+        process=import_member_rows,
+        prepare=create_member_clusters,
+    ),
+    "houses": ImportKind(
+        read=import_houses.read_sheet,
+        # houses renumber and recount per family, which can span clusters
+        key=column("Family Name"),
+        process=import_houses.import_house_rows,
+    ),
+    "families": ImportKind(
+        read=family_autocreate.read_sheet,
+        key=column("Family Name"),
+        process=family_autocreate.create_families,
+    ),
+    "sir": ImportKind(
+        read=import_sir_excel.read_sheet,
+        key=column("Polling Booth No"),
+        process=import_sir_excel.apply_sir_rows,
+    ),
+    "booths": ImportKind(
+        read=fix_polling_booth.read_sheet,
+        # a Voter ID row and a Roll No row can name the same member, so
+        # conflicts are only found by planning the whole sheet together
+        key=whole_sheet,
+        process=fix_polling_booth.fix_booths,
+    ),
+}
+
+
+# ---------------------------------------
+# SPLIT
+# ---------------------------------------
+def chunk_dir(job):
+    return f"{job.file.path}.chunks"
+
+
+def chunk_path(job, index):
+    return os.path.join(chunk_dir(job), f"{index:05d}.pkl")
+
+
+def partition(keys, size):
+    """Row positions per chunk: whole key groups, about ``size`` rows each."""
+    groups = {}
+    for position, key in enumerate(keys):
+        # rows without a key don't depend on each other
+        groups.setdefault(key or ("row", position), []).append(position)
+
+    chunks, current = [], []
+    for positions in groups.values():
+        current.extend(positions)
+        if len(current) >= size:
+            chunks.append(sorted(current))
+            current = []
+    if current:
+        chunks.append(sorted(current))
+    return chunks
+
+
+def split(job):
+    kind = KINDS[job.kind]
+    df = kind.read(job.file.path)
+    if kind.prepare:
+        kind.prepare(df)
+
+    os.makedirs(chunk_dir(job), exist_ok=True)
+    chunks = []
+    for index, positions in enumerate(partition(list(kind.key(df)), job.chunk_size)):
+        df.iloc[positions].to_pickle(chunk_path(job, index))
+        chunks.append(ImportChunk(job=job, index=index, rows=len(positions)))
+
+    with transaction.atomic():
+        ImportChunk.objects.bulk_create(chunks)
+        job.total_rows = len(df)
+        job.save(update_fields=["total_rows"])
+
+
+# ---------------------------------------
+# WORK
+# ---------------------------------------
+def claim(job, worker):
+    """Mark the next pending chunk as ours, or None when there is none left."""
+    with transaction.atomic():
+        chunk = (
+            job.chunks.select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("index")
+            .first()
+        )
+        if chunk is None:
+            return None
+        chunk.status, chunk.worker = "running", worker
+        chunk.save(update_fields=["status", "worker"])
+    return chunk
+
+
+def import_chunk(job, chunk):
+    df = pd.read_pickle(chunk_path(job, chunk.index))
+    errors = []
+
+    def skip(index, reason):
+        errors.append({"row": int(index) + 2, "error": reason})
+
+    try:
+        with transaction.atomic():
+            summary = KINDS[job.kind].process(df, skip=skip)
+            chunk.status, chunk.summary, chunk.errors = "done", summary, errors
+            chunk.finished_at = timezone.now()
+            chunk.save(update_fields=["status", "summary", "errors", "finished_at"])
+    except Exception as exc:
+        chunk.status, chunk.summary = "failed", {}
+        chunk.errors = [{"row": None, "error": f"{type(exc).__name__}: {exc}"}]
+        chunk.finished_at = timezone.now()
+        chunk.save(update_fields=["status", "summary", "errors", "finished_at"])
+    return chunk
+
+
+def work(job, worker="inline"):
+    """Import chunks of ``job`` until none is pending; returns how many."""
+    done = 0
+    while (chunk := claim(job, worker)) is not None:
+        beat(job)
+        import_chunk(job, chunk)
+        done += 1
+    return done
+
+
+# ---------------------------------------
+# HEARTBEAT
+# ---------------------------------------
+def beat(job):
+    job.heartbeat_at = timezone.now()
+    ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=job.heartbeat_at)
+
+
+def is_stale(job):
+    """A "running" job nothing has reported on for IMPORT_JOB_STALE_AFTER seconds."""
+    if job.status != "running":
+        return False
+    limit = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_AFTER)
+    return (job.heartbeat_at or job.started_at or job.created_at) < limit
+
+
+def wait(job, processes):
+    """Wait for the worker processes, beating for the job meanwhile."""
+    for process in processes:
+        while True:
+            try:
+                process.wait(timeout=settings.IMPORT_JOB_HEARTBEAT)
+                break
+            except subprocess.TimeoutExpired:
+                beat(job)
+
+
+# ---------------------------------------
+# DRIVE
+# ---------------------------------------
+def run(job, workers=None):
+    """Import (or resume) ``job`` with ``workers`` processes, 0 = in this one."""
+    workers = settings.IMPORT_JOB_WORKERS if workers is None else workers
+
+    job.status, job.error = "running", ""
+    job.started_at = job.started_at or timezone.now()
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=["status", "error", "started_at", "heartbeat_at"])
+
+    try:
+        if not job.chunks.exists():
+            split(job)
+    except Exception as exc:
+        job.status, job.error = "failed", f"{type(exc).__name__}: {exc}"
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        return job
+
+    # a previous run's chunks in flight were rolled back, failed ones get another try
+    job.chunks.filter(status__in=["running", "failed"]).update(
+        status="pending", worker="", errors=[], finished_at=None
+    )
+
+    if workers:
+        # the workers do the writing, don't hold a connection open meanwhile
+        connections.close_all()
+        manage = os.path.join(settings.BASE_DIR, "manage.py")
+        processes = [
+            subprocess.Popen([
+                sys.executable, manage, "run_import_job", str(job.pk),
+                "--worker", f"{os.getpid()}-{n}",
+            ])
+            for n in range(workers)
+        ]
+        wait(job, processes)
+    else:
+        work(job)
+
+    return finish(job)
+
+
+def finish(job):
+    counts = job.chunks.aggregate(
+        total=Count("id"), done=Count("id", filter=Q(status="done")),
+    )
+    job.finished_at = timezone.now()
+    if counts["done"] == counts["total"]:
+        job.status = "done"
+        shutil.rmtree(chunk_dir(job), ignore_errors=True)
+    else:
+        job.status = "failed"
+        job.error = f"{counts['total'] - counts['done']} of {counts['total']} chunks not imported"
+    job.save(update_fields=["status", "error", "finished_at"])
+    return job
+
+
+def launch(job):
+    """Start ``job`` in a background process (or right here with no workers configured)."""
+    if not settings.IMPORT_JOB_WORKERS:
+        return run(job, workers=0)
+
+    connections.close_all()
+    subprocess.Popen(
+        [sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "run_import_job", str(job.pk)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+    return job
+
+
+# ---------------------------------------
+# PROGRESS
+# ---------------------------------------
+def progress(job):
+    """Chunk / row counts, summed importer counts and the first skipped rows."""
+    counts = job.chunks.aggregate(
+        chunks_total=Count("id"),
+        chunks_done=Count("id", filter=Q(status="done")),
+        chunks_failed=Count("id", filter=Q(status="failed")),
+        rows_done=Sum("rows", filter=Q(status="done"), default=0),
+    )
+
+    summary = Counter()
+    for chunk_summary in job.chunks.filter(status="done").values_list("summary", flat=True):
+        summary.update(chunk_summary)
+    errors = row_errors(job)
+
+    return {
+        **counts,
+        "summary": dict(summary),
+        "error_count": len(errors),
+        "errors": errors[:ERROR_PREVIEW],
+    }
+
+
+def row_errors(job):
+    """Every skipped row of ``job``, in sheet order."""
+    errors = [e for chunk in job.chunks.values_list("errors", flat=True) for e in chunk]
+    return sorted(errors, key=lambda e: (e["row"] is not None, e["row"] or 0))
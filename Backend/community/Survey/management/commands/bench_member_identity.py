@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from Survey.identity import MemberIdentityIndex
+from Survey.models import Family, Member
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark member identity lookups (table scan vs DB index vs "
+        "MemberIdentityIndex) on a synthetic fixture. Rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--members", type=int, default=100_000)
+        parser.add_argument("--lookups", type=int, default=2_000)
+
+    def handle(self, *args, **kwargs):
+        try:
+            with transaction.atomic():
+                self.run(kwargs["members"], kwargs["lookups"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def timed(self, label, fn, keys):
+        started = time.perf_counter()
+        for key in keys:
+            fn(key)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label:<28} {elapsed * 1000 / len(keys):8.3f} ms/lookup   {elapsed:7.2f} s total"
+        )
+
+    def run(self, n_members, n_lookups):
+        family = Family.objects.create(family_name_en="bench", h_no="bench", sub="bench")
+        Member.objects.bulk_create(
+            (
+                Member(
+                    family=family,
+                    m_age=i % 90,
+                    voter_id_number=f"BV{i:07d}",
+                    epic_id=f"BE{i:07d}",
+                    roll_no_sec=str(i % 1500),
+                    polling_booth_no=str(i // 1500),
+                )
+                for i in range(n_members)
+            ),
+            batch_size=5000,
+        )
+        keys = [f"BV{random.randrange(n_members):07d}" for _ in range(n_lookups)]
+        self.stdout.write(f"Fixture: {n_members} members, {n_lookups} lookups\n")
+
+        table = Member._meta.db_table
+        if connection.vendor == "sqlite":
+            # unary + stops SQLite from using the index → the pre-index plan
+            sql = f'SELECT id FROM "{table}" WHERE +voter_id_number = %s LIMIT 1'
+
+            def scan(key):
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [key])
+                    cursor.fetchone()
+
+            self.timed("before: full table scan", scan, keys[:200])
+
+        self.timed(
+            "after: indexed query",
+            lambda key: Member.objects.filter(voter_id_number=key).only("id").first(),
+            keys,
+        )
+
+        started = time.perf_counter()
+        index = MemberIdentityIndex.from_queryset(Member.objects.filter(family=family))
+        self.stdout.write(f"{'index build':<28} {time.perf_counter() - started:8.2f} s")
+        self.timed("after: MemberIdentityIndex", lambda key: index.get("voter_id_number", key), keys)
@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+from django.test import Client
+
+READ_URL = "/api/members/?page_size=100"
+
+
+def synthetic_sheet(path, rows):
+    pd.DataFrame({
+        "Cluster": [f"Bench {i % 20}" for i in range(rows)],
+        "House No": [f"B{i // 5}" for i in range(rows)],
+        "Family Name": [f"Bench Family {i // 5}" for i in range(rows)],
+        "Name(EN)": [f"Bench Member {i}" for i in range(rows)],
+        "Age": [str(18 + i % 70) for i in range(rows)],
+        "Voter ID": [f"BENCH{i:07d}" for i in range(rows)],
+        "Polling Booth No": [str(i % 40) for i in range(rows)],
+        "Education": ["10th" if i % 3 else "" for i in range(rows)],
+    }).to_excel(path, index=False)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure /api/members/ read latency while import_members runs in "
+        "parallel, once per SQLite journal mode. Works on a copy of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sheet", nargs="?", help="Sheet to import (default: a synthetic one)")
+        parser.add_argument("--rows", type=int, default=20_000, help="Rows in the synthetic sheet")
+        parser.add_argument("--modes", default="DELETE,WAL", help="Journal modes to compare")
+        # internal: the reader process
+        parser.add_argument("--reader", action="store_true", help="(internal)")
+        parser.add_argument("--until-pid", type=int, help="(internal)")
+
+    def handle(self, *args, **options):
+        if options["reader"]:
+            return self.read_until(options["until_pid"])
+
+        database = settings.DATABASES["default"]
+        if database["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("This benchmark is for the SQLite backend.")
+
+        workdir = tempfile.mkdtemp(prefix="bench-sqlite-")
+        try:
+            sheet = options["sheet"]
+            if not sheet:
+                sheet = os.path.join(workdir, "sheet.xlsx")
+                synthetic_sheet(sheet, options["rows"])
+                self.stdout.write(f"Synthetic sheet: {options['rows']} rows")
+
+            self.stdout.write(
+                f"{'mode':<8} {'reads':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} "
+                f"{'max ms':>8} {'import s':>9}"
+            )
+            for mode in options["modes"].upper().split(","):
+                self.run_mode(mode.strip(), str(database["NAME"]), sheet, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run_mode(self, mode, source, sheet, workdir):
+        copy = os.path.join(workdir, f"{mode.lower()}.sqlite3")
+        with sqlite3.connect(source) as src, sqlite3.connect(copy) as dst:
+            src.backup(dst)
+
+        env = {**os.environ, "DB_NAME": copy, "SQLITE_JOURNAL_MODE": mode}
+        manage = [sys.executable, os.path.abspath(sys.argv[0])]
+        subprocess.run([*manage, "migrate", "-v", "0"], env=env, check=True)
+
+        started = time.perf_counter()
+        importer = subprocess.Popen(
+            [*manage, "import_members", sheet, "-v", "0"], env=env, stdout=subprocess.DEVNULL
+        )
+        reader = subprocess.run(
+            [*manage, "bench_sqlite_reads", "--reader", "--until-pid", str(importer.pid)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        importer.wait()
+        elapsed = time.perf_counter() - started
+
+        stats = json.loads(reader.stdout.strip().splitlines()[-1])
+        latencies = sorted(stats["latencies"])
+        if not latencies:
+            self.stdout.write(f"{mode:<8} no successful reads ({stats['errors']} errors)")
+            return
+
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(
+            f"{mode:<8} {len(latencies):>6} {stats['errors']:>6} "
+            f"{statistics.median(latencies):>8.1f} {p95:>8.1f} {latencies[-1]:>8.1f} {elapsed:>9.1f}"
+        )
+
+    def read_until(self, pid):
+        """Read the member list in a loop until process ``pid`` exits."""
+        client = Client()
+        client.get(READ_URL)  # warm up
+
+        latencies, errors = [], 0
+        while pid_alive(pid):
+            started = time.perf_counter()
+            try:
+                ok = client.get(READ_URL).status_code == 200
+            except OperationalError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+
+        self.stdout.write(json.dumps({"latencies": latencies, "errors": errors}))
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # a finished child stays a zombie until the parent waits for it
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return True
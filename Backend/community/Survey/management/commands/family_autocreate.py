@@ -1,6 +1,44 @@
-import pandas as pd
 from django.core.management.base import BaseCommand
-from Survey.models import Family
+from django.db import transaction
+from Survey import ingest
+from Survey.models import Family, late_revision, stamp
+from Survey.reports import invalidate_reports
+
+BATCH_SIZE = 1000
+
+
+def read_sheet(path, cache=True):
+    return ingest.read_table(path, ["Family Name"], cache=cache)
+
+
+def create_families(df, log=None, skip=None):
+    """
+    Create a Family per distinct "Family Name" not in the database yet:
+    existing names are read in one query, new families inserted in bulk.
+    Returns {"created"}.
+    """
+    log = log or (lambda message: None)
+
+    # as text, the way they are stored (a sheet may give numbers)
+    family_names = list(dict.fromkeys(str(name) for name in df["Family Name"].dropna()))
+
+    existing = set(
+        Family.objects.filter(family_name_en__in=family_names).values_list("family_name_en", flat=True)
+    )
+    new_families = [Family(family_name_en=name) for name in family_names if name not in existing]
+
+    with transaction.atomic(), late_revision():
+        stamp(new_families)
+        Family.objects.bulk_create(new_families, batch_size=BATCH_SIZE)
+        # bulk_create skips the post_save that expires cached reports
+        if new_families:
+            invalidate_reports()
+
+    for family in new_families:
+        log(f"➕ Created Family: {family.family_name_en}")
+
+    return {"created": len(new_families)}
+
 
 class Command(BaseCommand):
     help = "Auto-create Family records from Excel before importing houses"
@@ -9,20 +47,9 @@ class Command(BaseCommand):
         parser.add_argument('excel_path', type=str, help="Path to Excel")
 
     def handle(self, *args, **kwargs):
-        excel_path = kwargs['excel_path']
-
-        df = pd.read_excel(excel_path)
-
-        family_names = df["Family Name"].dropna().unique()
-
-        created = 0
-
-        for name in family_names:
-            obj, is_created = Family.objects.get_or_create(
-                family_name_en=name
-            )
-            if is_created:
-                created += 1
-                self.stdout.write(self.style.SUCCESS(f"➕ Created Family: {name}"))
+        result = create_families(
+            read_sheet(kwargs['excel_path']),
+            log=lambda message: self.stdout.write(self.style.SUCCESS(message)),
+        )
 
-        self.stdout.write(self.style.SUCCESS(f"\n🎉 Total new families created: {created}"))
+        self.stdout.write(self.style.SUCCESS(f"\n🎉 Total new families created: {result['created']}"))
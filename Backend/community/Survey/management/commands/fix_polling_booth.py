@@ -1,45 +1,175 @@
+import csv
+from collections import defaultdict
 import pandas as pd
-import math
 from django.core.management.base import BaseCommand
-from Survey.models import Member
+from django.db import transaction
+from django.db.models import Q
+from Survey import ingest
+from Survey.models import Member, late_revision, next_revision
+from Survey.reports import invalidate_reports
+from Survey.rollups import mark_dirty
+
+# members per UPDATE ... WHERE id IN (...)
+BATCH_SIZE = 900
 
 
 # -----------------------------
 # CLEANERS
 # -----------------------------
-def clean_str(v):
-    if v is None:
-        return ""
-    if isinstance(v, float) and math.isnan(v):
-        return ""
-    return str(v).strip()
+def clean(series):
+    """Text column: missing → "", stripped, whole numbers without ".0"."""
+    return series.fillna("").astype(str).str.strip().str.replace(r"^(\d+)\.0+$", r"\1", regex=True)
 
 
 # -----------------------------
 # POLLING BOOTH READER
 # -----------------------------
-def get_polling_booth(row):
-    for col in [
-        "Polling Booth No",
-        "Polling Booth",
-        "Booth No",
-        "Booth",
-    ]:
-        if col in row:
-            val = row.get(col)
-
-            if val is None:
-                continue
-            if isinstance(val, float) and math.isnan(val):
-                continue
-
-            if isinstance(val, (int, float)):
-                return str(int(val))
-
-            val = str(val).strip()
-            if val:
-                return val
-    return ""
+BOOTH_COLUMNS = ["Polling Booth No", "Polling Booth", "Booth No", "Booth"]
+
+# the only headers read from the sheet
+SHEET_COLUMNS = ["Voter ID", "Roll No", *BOOTH_COLUMNS]
+
+
+def sheet_booths(df):
+    """
+    One row per sheet row: the identifier it matches on ("voter_id_number"
+    when it has a Voter ID, else "roll_no_sec": the sheet's Roll No is the
+    SEC roll number) and the first booth column filled in.
+    """
+    def column(name):
+        return clean(df[name]) if name in df.columns else pd.Series("", index=df.index)
+
+    voter_id, roll_no = column("Voter ID"), column("Roll No")
+    booth = column(BOOTH_COLUMNS[0])
+    for name in BOOTH_COLUMNS[1:]:
+        booth = booth.where(booth != "", column(name))
+
+    rows = voter_id.to_frame("value").assign(field="voter_id_number", booth=booth)
+    by_roll = voter_id == ""
+    rows.loc[by_roll, "value"] = roll_no[by_roll]
+    rows.loc[by_roll, "field"] = "roll_no_sec"
+    return rows
+
+
+# -----------------------------
+# UPDATE
+# -----------------------------
+def read_sheet(path, cache=True):
+    return ingest.read_table(path, SHEET_COLUMNS, dtype=str, cache=cache)
+
+
+def plan_booths(df, skip=None):
+    """
+    Work out {member id: booth} for the sheet without writing. Rows are
+    skipped (``skip(index, reason)``) when they have no id or booth, match
+    no member, match more than one member by Roll No (roll numbers repeat
+    across booths and constituencies), or disagree with another row about
+    a member's booth.
+    Returns (targets, {member id: current booth}, counts).
+    """
+    skip = skip or (lambda index, reason: None)
+    rows = sheet_booths(df)
+    counts = {"matched": 0, "unmatched": 0, "ambiguous": 0, "conflicts": 0, "missing": 0}
+
+    missing = rows["value"] == ""
+    for i in rows.index[missing]:
+        skip(i, "Voter ID / Roll No missing")
+    no_booth = ~missing & (rows["booth"] == "")
+    for i in rows.index[no_booth]:
+        skip(i, "Polling booth missing")
+    counts["missing"] = int(missing.sum() + no_booth.sum())
+    rows = rows[~missing & ~no_booth]
+
+    # every member carrying one of the sheet's ids, as plain tuples
+    wanted = rows.groupby("field")["value"].agg(set)
+    members = Member.objects.filter(
+        Q(voter_id_number__in=wanted.get("voter_id_number", set()))
+        | Q(roll_no_sec__in=wanted.get("roll_no_sec", set()))
+    ).values_list("id", "voter_id_number", "roll_no_sec", "constituency_id", "polling_booth_no")
+
+    ids = defaultdict(list)
+    current = {}
+    for pk, voter_id, roll_no, constituency_id, booth in members:
+        ids[("voter_id_number", voter_id)].append(pk)
+        ids[("roll_no_sec", roll_no)].append(pk)
+        current[pk] = (constituency_id, booth)
+
+    # member → the sheet rows (and their booths) that point at it
+    claims = defaultdict(list)
+    for i, field, value, booth in rows[["field", "value", "booth"]].itertuples():
+        matched = ids.get((field, value))
+        if not matched:
+            counts["unmatched"] += 1
+            skip(i, f"No member with {'Voter ID' if field == 'voter_id_number' else 'Roll No'} {value}")
+            continue
+        if field == "roll_no_sec" and len(matched) > 1:
+            counts["ambiguous"] += 1
+            skip(i, f"Roll No {value} matches {len(matched)} members; use the Voter ID")
+            continue
+        for pk in matched:
+            claims[pk].append((i, booth))
+
+    targets, conflicting = {}, set()
+    for pk, claimed in claims.items():
+        booths = {booth for _, booth in claimed}
+        if len(booths) == 1:
+            targets[pk] = booths.pop()
+        else:
+            conflicting.update((i, ", ".join(sorted(booths))) for i, _ in claimed)
+    for i, booths in sorted(conflicting):
+        skip(i, f"Conflicting booths for the same member: {booths}")
+
+    # a row counts as matched when all of its members got a booth
+    conflict_rows = {i for i, _ in conflicting}
+    counts["matched"] = len({i for claimed in claims.values() for i, _ in claimed} - conflict_rows)
+    counts["conflicts"] = len(conflict_rows)
+    return targets, current, counts
+
+
+@transaction.atomic
+@late_revision()
+def apply_booths(targets, current):
+    """One UPDATE per booth (per BATCH_SIZE members); returns the members changed."""
+    by_booth = defaultdict(list)
+    for pk, booth in targets.items():
+        if current[pk][1] != booth:
+            by_booth[booth].append(pk)
+    if not by_booth:
+        return {}
+
+    revision = next_revision()
+    for booth, pks in by_booth.items():
+        for start in range(0, len(pks), BATCH_SIZE):
+            Member.objects.filter(pk__in=pks[start:start + BATCH_SIZE]).update(
+                polling_booth_no=booth, revision=revision,
+            )
+
+    # the booths members left and joined
+    mark_dirty(
+        {(current[pk][0] or 0, current[pk][1] or "") for pks in by_booth.values() for pk in pks}
+        | {(current[pk][0] or 0, booth) for booth, pks in by_booth.items() for pk in pks}
+    )
+    invalidate_reports()
+    return by_booth
+
+
+def fix_booths(df, log=None, skip=None):
+    """
+    Set polling_booth_no on the members matching each row's Voter ID (or
+    Roll No), set-based. ``log(message)`` gets one line per booth,
+    ``skip(index, reason)`` every row left alone.
+    Returns {"updated", "unchanged", "matched", "unmatched", "ambiguous",
+    "conflicts", "missing"}.
+    """
+    log = log or (lambda message: None)
+
+    targets, current, counts = plan_booths(df, skip)
+    changed = apply_booths(targets, current)
+    for booth, pks in sorted(changed.items()):
+        log(f"✅ Booth {booth}: {len(pks)} members")
+
+    updated = sum(len(pks) for pks in changed.values())
+    return {"updated": updated, "unchanged": len(targets) - updated, **counts}
 
 
 # =============================
@@ -50,42 +180,31 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("excel_path", type=str)
+        parser.add_argument(
+            "--report", help="Write the rows left alone (row, reason) to this CSV file"
+        )
 
     def handle(self, *args, **kwargs):
-        df = pd.read_excel(kwargs["excel_path"])
-        df.columns = df.columns.str.strip()
-
-        updated = 0
-
-        for _, row in df.iterrows():
-            voter_id = clean_str(row.get("Voter ID"))
-            roll_no = clean_str(row.get("Roll No"))
-
-            if not voter_id and not roll_no:
-                continue
-
-            booth = get_polling_booth(row)
-            if not booth:
-                continue
-
-            qs = Member.objects.all()
-            if voter_id:
-                qs = qs.filter(voter_id_number=voter_id)
-            elif roll_no:
-                qs = qs.filter(roll_no=roll_no)
-
-            for m in qs:
-                m.polling_booth_no = booth
-                m.save(update_fields=["polling_booth_no"])
-                updated += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"✅ Updated: {m.m_name_en} | Booth: {booth}"
-                    )
-                )
+        # conflicts can span the whole sheet, so it is planned in one go
+        skipped = []
+        result = fix_booths(
+            read_sheet(kwargs["excel_path"]),
+            log=lambda message: self.stdout.write(self.style.SUCCESS(message)),
+            skip=lambda index, reason: skipped.append((int(index) + 2, reason)),
+        )
+
+        if kwargs["report"]:
+            with open(kwargs["report"], "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["row", "reason"])
+                writer.writerows(sorted(skipped))
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"\n🎉 DONE — Polling Booth Updated for {updated} members"
+                f"\n🎉 DONE — Polling Booth Updated for {result['updated']} members | "
+                f"Unchanged: {result['unchanged']} | Rows matched: {result['matched']} | "
+                f"Unmatched: {result['unmatched']} | Ambiguous Roll No: {result['ambiguous']} | "
+                f"Conflicting: {result['conflicts']} | "
+                f"Missing id/booth: {result['missing']}"
             )
         )
@@ -1,7 +1,13 @@
-import pandas as pd
 import math
+import pandas as pd
 from django.core.management.base import BaseCommand
-from Survey.models import Family, Cluster, House
+from django.db import transaction
+from django.db.models import Q
+from Survey import counters, ingest
+from Survey.models import Family, Cluster, House, late_revision, stamp
+from Survey.reports import invalidate_reports
+
+BATCH_SIZE = 1000
 
 
 # --- Helper function to clean numbers safely ---
@@ -36,6 +42,206 @@ def split_house_number(value):
         return parts[0], parts[1].upper()
 
 
+# the only headers read from the sheet
+SHEET_COLUMNS = [
+    "Family Name", "Cluster", "Owner", "House Number", "Address", "Phone Number", "Roll No",
+    "Livestock Count", "Water Source", "Gas Connection", "Biogas", "Solar", "Electricity",
+    "Refrigerator", "Washing Machine", "House Type", "Road Access", "Waste Disposal",
+    "Agriculture", "Agriculture Type", "Livestock", "Livestock Type",
+    "Ration Card", "Ration Card Number", "Ration Card Category", "Remark",
+]
+
+
+def read_sheet(path, cache=True):
+    return ingest.read_table(path, SHEET_COLUMNS, cache=cache)
+
+
+def text(value):
+    """Stripped cell text, "" for missing cells."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    value = str(value).strip()
+    return "" if value.lower() == "nan" else value
+
+
+def preload_families(names):
+    """Family name → its first Family, for the given names."""
+    families = {}
+    for family in Family.objects.filter(family_name_en__in=names).order_by("id"):
+        families.setdefault(family.family_name_en, family)
+    return families
+
+
+def preload_clusters(names):
+    """
+    Raw cluster name → Cluster, matched on the Malayalam name first and the
+    English one second. Missing clusters are created (with both names),
+    existing ones without a Malayalam name get it. Returns (clusters, created).
+    """
+    by_ml, by_en = {}, {}
+    for cluster in Cluster.objects.filter(
+        Q(name_malayalam__in=names) | Q(name_english__in=names)
+    ).order_by("id"):
+        by_ml.setdefault(cluster.name_malayalam, cluster)
+        by_en.setdefault(cluster.name_english, cluster)
+
+    clusters = {name: by_ml.get(name) or by_en.get(name) for name in names}
+    missing = sorted(name for name, cluster in clusters.items() if cluster is None)
+    Cluster.objects.bulk_create(
+        [Cluster(name_english=name, name_malayalam=name) for name in missing],
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    # ignore_conflicts leaves pks unset; read the new rows back
+    for cluster in Cluster.objects.filter(name_english__in=missing):
+        clusters[cluster.name_english] = cluster
+
+    # ✅ Update Malayalam if missing (NO overwrite)
+    unnamed = {}
+    for name, cluster in clusters.items():
+        if not cluster.name_malayalam:
+            cluster.name_malayalam = name
+            unnamed[cluster.pk] = cluster
+    Cluster.objects.bulk_update(unnamed.values(), ["name_malayalam"])
+    return clusters, missing
+
+
+def house_from_row(row, family, cluster):
+    owner_en = row.get("Owner")
+
+    return House(
+        owner_en=owner_en,
+        owner_ml=owner_en,
+
+        family=family,
+        cluster=cluster,
+
+        h_address=row.get("Address") or "",
+        phone_no=row.get("Phone Number") or "",
+        roll_no=row.get("Roll No") or "",
+
+        livestock_count=clean_number(row.get("Livestock Count")),
+
+        # Utilities
+        has_water_source=yesno(row.get("Water Source")),
+        w_source=row.get("Water Source") or "",
+
+        g_connection=yesno(row.get("Gas Connection")),
+        biogas=yesno(row.get("Biogas")),
+        solar=yesno(row.get("Solar")),
+        h_electricity=yesno(row.get("Electricity")),
+        h_refrigerator=yesno(row.get("Refrigerator")),
+        h_washing_machine=yesno(row.get("Washing Machine")),
+
+        # House
+        h_type=row.get("House Type") or "",
+        road_access_type=row.get("Road Access") or "",
+
+        # Waste
+        waste_disposal_method=row.get("Waste Disposal") or "",
+
+        # Agriculture
+        h_agriculture=yesno(row.get("Agriculture")),
+        agriculture_type=row.get("Agriculture Type") or "",
+
+        # Livestock
+        h_livestock=yesno(row.get("Livestock")),
+        livestock_type=row.get("Livestock Type") or "",
+
+        # Ration
+        ration_card=yesno(row.get("Ration Card")),
+        ration_card_number=row.get("Ration Card Number") or "",
+        ration_card_category=row.get("Ration Card Category") or "",
+
+        remark=row.get("Remark") or ""
+    )
+
+
+@transaction.atomic
+@late_revision()
+def import_house_rows(df, log=None, skip=None):
+    """
+    Create a House per row for its (existing) family, creating clusters as
+    needed. Families and clusters are looked up once, houses inserted in
+    batches and their member totals filled in with one grouped update.
+    ``skip(index, reason)`` gets rows that can't be imported.
+    Returns {"imported", "clusters"}.
+    """
+    log = log or (lambda message: None)
+    skip = skip or (lambda index, reason: None)
+
+    family_names = df.get("Family Name", pd.Series(index=df.index)).map(text)
+    cluster_names = df.get("Cluster", pd.Series(index=df.index)).map(text)
+    families = preload_families(set(family_names) - {""})
+    # as before, only rows with a known family create clusters
+    clusters, created = preload_clusters(set(cluster_names[family_names.isin(families)]) - {""})
+    for name in created:
+        log(f"🆕 Created Cluster: {name}")
+
+    houses, renumbered = [], {}
+
+    for index, row in df.iterrows():
+
+        # -------------------------------------------------
+        # 1️⃣ FAMILY
+        # -------------------------------------------------
+        family_name = text(row.get("Family Name"))
+
+        if not family_name:
+            skip(index, "Family Name missing")
+            continue
+
+        family = families.get(family_name)
+
+        if not family:
+            skip(index, f"Family not found: {family_name}")
+            continue
+
+        # -------------------------------------------------
+        # 2️⃣ CLUSTER
+        # -------------------------------------------------
+        cluster_name = text(row.get("Cluster"))
+
+        if not cluster_name:
+            skip(index, "Cluster missing")
+            continue
+
+        # -------------------------------------------------
+        # 3️⃣ OWNER
+        # -------------------------------------------------
+        if not text(row.get("Owner")):
+            skip(index, "Owner missing")
+            continue
+
+        # -------------------------------------------------
+        # 4️⃣ HOUSE NUMBER → Family
+        # -------------------------------------------------
+        h_no, sub = split_house_number(row.get("House Number"))
+
+        if h_no and (family.h_no != h_no or family.sub != sub):
+            family.h_no = h_no
+            family.sub = sub
+            renumbered[family.pk] = family
+
+        houses.append(house_from_row(row, family, clusters[cluster_name]))
+
+    # -------------------------------------------------
+    # 5️⃣ WRITE (NO DATA LOSS)
+    # -------------------------------------------------
+    stamp([*renumbered.values(), *houses])
+    Family.objects.bulk_update(renumbered.values(), ["h_no", "sub", "revision"], batch_size=BATCH_SIZE)
+    House.objects.bulk_create(houses, batch_size=BATCH_SIZE)
+
+    # totals for every new house at once, from its family's members
+    for start in range(0, len(houses), BATCH_SIZE):
+        counters.recount_houses(house_ids=[house.pk for house in houses[start:start + BATCH_SIZE]])
+    invalidate_reports()
+
+    for house in houses:
+        log(f"✅ Imported house: {house.owner_en} ({house.family.h_no} {house.family.sub})")
+
+    return {"imported": len(houses), "clusters": len(created)}
+
+
 class Command(BaseCommand):
     help = "Import Houses from Excel file (SAFE)"
 
@@ -46,7 +252,7 @@ class Command(BaseCommand):
         excel_path = kwargs["excel_path"]
 
         try:
-            df = pd.read_excel(excel_path)
+            df = read_sheet(excel_path)
 
             print("\n================ EXCEL COLUMNS ================")
             print(df.columns.tolist())
@@ -54,145 +260,13 @@ class Command(BaseCommand):
 
             self.stdout.write(self.style.SUCCESS(f"📄 Loaded {len(df)} rows from Excel"))
 
-            for index, row in df.iterrows():
-
-                # -------------------------------------------------
-                # 1️⃣ FAMILY
-                # -------------------------------------------------
-                family_name = row.get("Family Name")
-
-                if not family_name or str(family_name).strip().lower() == "nan":
-                    self.stdout.write(self.style.ERROR(
-                        f"❌ Family Name missing in row {index + 1}"
-                    ))
-                    continue
-
-                family = Family.objects.filter(
-                    family_name_en=str(family_name).strip()
-                ).first()
-
-                if not family:
-                    self.stdout.write(self.style.ERROR(
-                        f"❌ Family not found: {family_name}"
-                    ))
-                    continue
-
-                # -------------------------------------------------
-                # 2️⃣ CLUSTER (SAFE FIX)
-                # -------------------------------------------------
-                cluster_raw = row.get("Cluster")
-
-                if not cluster_raw or str(cluster_raw).strip().lower() == "nan":
-                    self.stdout.write(self.style.ERROR(
-                        f"❌ Cluster missing in row {index + 1}"
-                    ))
-                    continue
-
-                cluster_ml = str(cluster_raw).strip()
-
-                # 🔍 Try to find existing cluster by Malayalam OR English
-                cluster = Cluster.objects.filter(
-                    name_malayalam=cluster_ml
-                ).first() or Cluster.objects.filter(
-                    name_english=cluster_ml
-                ).first()
-
-                if not cluster:
-                    # ✅ Create new cluster safely
-                    cluster = Cluster.objects.create(
-                        name_english=cluster_ml,     # fallback
-                        name_malayalam=cluster_ml
-                    )
-                    self.stdout.write(
-                        self.style.SUCCESS(f"🆕 Created Cluster: {cluster_ml}")
-                    )
-                else:
-                    # ✅ Update Malayalam if missing (NO overwrite)
-                    if not cluster.name_malayalam:
-                        cluster.name_malayalam = cluster_ml
-                        cluster.save()
-
-                # -------------------------------------------------
-                # 3️⃣ OWNER
-                # -------------------------------------------------
-                owner_en = row.get("Owner")
-
-                if not owner_en or str(owner_en).strip().lower() == "nan":
-                    self.stdout.write(self.style.ERROR(
-                        f"❌ Owner missing → row {index + 1}"
-                    ))
-                    continue
-
-                owner_ml = owner_en
-                if isinstance(owner_ml, float) and math.isnan(owner_ml):
-                    owner_ml = ""
-
-                # -------------------------------------------------
-                # 4️⃣ HOUSE NUMBER → Family
-                # -------------------------------------------------
-                h_no_raw = row.get("House Number")
-                h_no, sub = split_house_number(h_no_raw)
-
-                if h_no and (family.h_no != h_no or family.sub != sub):
-                    family.h_no = h_no
-                    family.sub = sub
-                    family.save()
-
-                # -------------------------------------------------
-                # 5️⃣ CREATE HOUSE (NO DATA LOSS)
-                # -------------------------------------------------
-                house = House.objects.create(
-                    owner_en=owner_en,
-                    owner_ml=owner_ml,
-
-                    family=family,
-                    cluster=cluster,
-
-                    h_address=row.get("Address") or "",
-                    phone_no=row.get("Phone Number") or "",
-                    roll_no=row.get("Roll No") or "",
-
-                    livestock_count=clean_number(row.get("Livestock Count")),
-
-                    # Utilities
-                    has_water_source=yesno(row.get("Water Source")),
-                    w_source=row.get("Water Source") or "",
-
-                    g_connection=yesno(row.get("Gas Connection")),
-                    biogas=yesno(row.get("Biogas")),
-                    solar=yesno(row.get("Solar")),
-                    h_electricity=yesno(row.get("Electricity")),
-                    h_refrigerator=yesno(row.get("Refrigerator")),
-                    h_washing_machine=yesno(row.get("Washing Machine")),
-
-                    # House
-                    h_type=row.get("House Type") or "",
-                    road_access_type=row.get("Road Access") or "",
-
-                    # Waste
-                    waste_disposal_method=row.get("Waste Disposal") or "",
-
-                    # Agriculture
-                    h_agriculture=yesno(row.get("Agriculture")),
-                    agriculture_type=row.get("Agriculture Type") or "",
-
-                    # Livestock
-                    h_livestock=yesno(row.get("Livestock")),
-                    livestock_type=row.get("Livestock Type") or "",
-
-                    # Ration
-                    ration_card=yesno(row.get("Ration Card")),
-                    ration_card_number=row.get("Ration Card Number") or "",
-                    ration_card_category=row.get("Ration Card Category") or "",
-
-                    remark=row.get("Remark") or ""
-                )
-
-                house.update_counts()
-
-                self.stdout.write(self.style.SUCCESS(
-                    f"✅ Imported house: {house.owner_en} ({h_no} {sub})"
-                ))
+            import_house_rows(
+                df,
+                log=lambda message: self.stdout.write(self.style.SUCCESS(message)),
+                skip=lambda index, reason: self.stdout.write(
+                    self.style.ERROR(f"❌ {reason} → row {index + 1}")
+                ),
+            )
 
             self.stdout.write(self.style.SUCCESS("\n🎉 IMPORT COMPLETED SUCCESSFULLY"))
 
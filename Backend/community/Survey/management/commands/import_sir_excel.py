@@ -1,8 +1,25 @@
-import pandas as pd
+import csv
 import math
-import re
+from collections import defaultdict
 from django.core.management.base import BaseCommand
-from Survey.models import Member, MemberNameVariant
+from django.db import transaction
+from Survey import counters, guardians, ingest
+from Survey.models import GUARDIAN_LINK_FIELDS, Member, MemberNameVariant, late_revision, stamp
+from Survey.identity import MemberIdentityIndex
+from Survey.names import normalize_name
+from Survey.reports import invalidate_reports
+from Survey.rollups import deferred_rollups, member_written
+
+# Only the first identifier present on a row is used, in this order
+SIR_IDENTITY_FIELDS = ("roll_no_sec", "roll_no_ceo", "epic_id", "voter_id_number")
+
+# the only headers read from the sheet
+SHEET_COLUMNS = [
+    "Polling Booth No", "Roll No-SEC", "Roll No-ECI", "Epic ID", "Voter ID",
+    "Name(EN)", "Name(ML)", "Guardian's Name(EN)",
+]
+
+BATCH_SIZE = 1000
 
 # ---------------------------------------
 # HELPERS
@@ -14,26 +31,244 @@ def clean_str(v):
         return ""
     return str(v).strip()
 
-def normalize_name(name):
-    name = clean_str(name).lower()
-    name = re.sub(r"[^\w\s]", "", name)
-    name = re.sub(r"\s+", " ", name)
-    return name.strip()
-
-def save_alias(member, name_en, name_ml="", source="sir"):
-    if not name_en:
-        return
-
-    MemberNameVariant.objects.get_or_create(
-        member=member,
-        normalized_name=normalize_name(name_en),
-        defaults={
-            "name_en": name_en,
-            "name_ml": name_ml,
-            "source": source,
-            "is_primary": False
+
+class MemberChange:
+    """
+    What the sheet changes on one member: the values before the first
+    change and the rows involved. Changes are applied to the (in-memory)
+    member as they are found, so later rows for the same member see them,
+    as a sequential save would.
+    """
+
+    def __init__(self, member):
+        self.member = member
+        self.rows = []
+        self.before = {}
+
+    def set(self, field, value):
+        self.before.setdefault(field, getattr(self.member, field))
+        setattr(self.member, field, value)
+
+    def alias(self, name_en, name_ml=None):
+        # the name being replaced stays searchable
+        return MemberNameVariant(
+            member=self.member,
+            name_en=name_en,
+            name_ml=name_ml,
+            normalized_name=normalize_name(name_en),
+            member_name_en=self.member.m_name_en or "",
+            source="sir",
+            is_primary=False,
+        )
+
+    @property
+    def aliases(self):
+        """
+        The names the sheet really replaces: the name / guardian the member
+        had before, when it ends up different. A name set and reverted by
+        later rows, or one only held between two rows, gets no alias.
+        """
+        diff, aliases = self.diff, []
+        if "m_name_en" in diff and self.before["m_name_en"]:
+            aliases.append(self.alias(self.before["m_name_en"], self.before.get("m_name_ml")))
+        if "guardian_en" in diff and self.before["guardian_en"]:
+            aliases.append(self.alias(self.before["guardian_en"]))
+        return aliases
+
+    @property
+    def diff(self):
+        """{field: (old, new)} for fields that really end up different."""
+        return {
+            field: (old, getattr(self.member, field))
+            for field, old in self.before.items()
+            if old != getattr(self.member, field)
         }
+
+    def describe(self):
+        rows = ", ".join(str(row) for row in self.rows)
+        fields = "; ".join(f"{field}: {old!r} → {new!r}" for field, (old, new) in self.diff.items())
+        aliases = ", ".join(alias.name_en for alias in self.aliases)
+        return (
+            f"{self.member.m_name_en} (#{self.member.pk}, row {rows}): {fields}"
+            + (f" | aliases: {aliases}" if aliases else "")
+        )
+
+
+# ---------------------------------------
+# PLAN
+# ---------------------------------------
+def read_sheet(path, cache=True):
+    return ingest.read_table(path, SHEET_COLUMNS, dtype=str, cache=cache)
+
+
+def plan_sir_rows(df, skip=None, planned=None):
+    """
+    Match every row (booth + first identifier) against the sheet's booths,
+    loaded once, and work out the changes. Nothing is written.
+    ``planned`` ({member id: Member}) carries the members changed by earlier
+    chunks of a dry run, so later chunks match and diff against them as
+    they would against the written rows; this chunk's changes are added.
+    Returns ({member id: MemberChange}, skipped rows).
+    """
+    skip = skip or (lambda index, reason: None)
+
+    # Load every member of the sheet's booths once, keyed by booth
+    booths = {clean_str(b) for b in df.get("Polling Booth No", [])} - {""}
+    index = MemberIdentityIndex.from_queryset(
+        Member.objects.filter(polling_booth_no__in=booths).order_by("id"),
+        scope=lambda m: m.polling_booth_no,
+        fields=SIR_IDENTITY_FIELDS,
+        # all of what guardian links depend on, so unchanged names relink nothing
+        extra=GUARDIAN_LINK_FIELDS,
     )
+    if planned:
+        index = MemberIdentityIndex(
+            (planned.get(member.pk, member) for member in index.members),
+            scope=index.scope, fields=index.fields,
+        )
+
+    changes = {}
+    skipped = 0
+
+    for i, row in df.iterrows():
+
+        booth = clean_str(row.get("Polling Booth No"))
+        roll_sec = clean_str(row.get("Roll No-SEC"))
+        roll_ceo = clean_str(row.get("Roll No-ECI"))
+        epic_id = clean_str(row.get("Epic ID"))
+        voter_id = clean_str(row.get("Voter ID"))
+
+        if not booth:
+            skipped += 1
+            skip(i, "Polling Booth No missing")
+            continue
+
+        member = None
+        identifiers = zip(SIR_IDENTITY_FIELDS, (roll_sec, roll_ceo, epic_id, voter_id))
+        for field, value in identifiers:
+            if value:
+                member = index.get(field, value, scope=booth)
+                break
+
+        if not member:
+            skipped += 1
+            skip(i, f"No member with these ids in booth {booth}")
+            continue
+
+        change = changes.setdefault(member.pk, MemberChange(member))
+        change.rows.append(int(i) + 2)
+
+        # -----------------------------
+        # NAME → ALIAS + UPDATE
+        # -----------------------------
+        new_name_en = clean_str(row.get("Name(EN)"))
+        new_name_ml = clean_str(row.get("Name(ML)"))
+
+        if new_name_en and new_name_en != member.m_name_en:
+            change.set("m_name_en", new_name_en)
+            change.set("m_name_ml", new_name_ml or member.m_name_ml)
+
+        # -----------------------------
+        # GUARDIAN → ALIAS + UPDATE
+        # -----------------------------
+        new_guardian = clean_str(row.get("Guardian's Name(EN)"))
+        if new_guardian and new_guardian != member.guardian_en:
+            change.set("guardian_en", new_guardian)
+
+        # -----------------------------
+        # 🔥 EPIC / ECI / VOTER UPDATE
+        # (only if empty – SAFE)
+        # -----------------------------
+        if epic_id and not member.epic_id:
+            change.set("epic_id", epic_id)
+
+        if roll_ceo and not member.roll_no_ceo:
+            change.set("roll_no_ceo", roll_ceo)
+
+        if voter_id and not member.voter_id_number:
+            change.set("voter_id_number", voter_id)
+
+        # election flag
+        if epic_id or roll_sec or roll_ceo or voter_id:
+            change.set("election_id", True)
+
+    if planned is not None:
+        planned.update((pk, change.member) for pk, change in changes.items() if change.diff)
+    return changes, skipped
+
+
+# ---------------------------------------
+# APPLY
+# ---------------------------------------
+@transaction.atomic
+@late_revision()
+def apply_changes(changes):
+    """
+    bulk_update members grouped by the columns they change (so no column
+    is rewritten with its own value), aliases in bulk (existing ones left
+    alone), then the counters the saves would have moved. The revision is
+    taken last (late_revision).
+    """
+    groups = defaultdict(list)
+    for change in changes:
+        if change.diff:
+            groups[tuple(sorted(change.diff))].append(change.member)
+    members = [member for group in groups.values() for member in group]
+    aliases = [alias for change in changes for alias in change.aliases]
+
+    stamp([*members, *aliases])
+    for fields, group in groups.items():
+        Member.objects.bulk_update(group, [*fields, "revision"], batch_size=BATCH_SIZE)
+    MemberNameVariant.objects.bulk_create(aliases, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    # voter flags move house totals and booth rollups, names move guardian links
+    with counters.deferred_house_counts(), deferred_rollups(), guardians.deferred_links():
+        for member in members:
+            counters.member_saved(member, created=False)
+            member_written(member)
+            guardians.member_written(member)
+    invalidate_reports()
+    return len(members)
+
+
+def apply_sir_rows(df, log=None, skip=None, dry_run=False, report=None, planned=None):
+    """
+    Plan the rows of ``df`` and (unless ``dry_run``) write the result.
+    ``log(message)`` gets one line per changed member, ``report(change)``
+    its MemberChange, ``skip(index, reason)`` every row left alone.
+    ``planned`` is plan_sir_rows()'s, for dry runs over several chunks.
+    Returns {"updated", "unchanged", "aliases", "skipped"}.
+    """
+    log = log or (lambda message: None)
+    report = report or (lambda change: None)
+
+    changes, skipped = plan_sir_rows(df, skip, planned)
+    changes = list(changes.values())
+    if not dry_run:
+        apply_changes(changes)
+
+    updated = [change for change in changes if change.diff]
+    for change in updated:
+        report(change)
+        log(change.describe() if dry_run else f"🔄 Updated (SIR): {change.member.m_name_en}")
+
+    return {
+        "updated": len(updated),
+        "unchanged": len(changes) - len(updated),
+        "aliases": sum(len(change.aliases) for change in changes),
+        "skipped": skipped,
+    }
+
+
+def write_report(path, changes):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["member_id", "name", "rows", "field", "old", "new"])
+        for change in changes:
+            rows = " ".join(str(row) for row in change.rows)
+            for field, (old, new) in change.diff.items():
+                writer.writerow([change.member.pk, change.member.m_name_en, rows, field, old, new])
+
 
 # ---------------------------------------
 # COMMAND
@@ -43,96 +278,47 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("excel_path", type=str)
+        parser.add_argument(
+            "--chunk-rows", type=int, default=10_000,
+            help="Rows read and applied at a time (default 10000)"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Print what would change, write nothing"
+        )
+        parser.add_argument(
+            "--report", help="Also write the per-field diff to this CSV file"
+        )
 
     def handle(self, *args, **kwargs):
+        dry_run = kwargs["dry_run"]
+        result = {"updated": 0, "unchanged": 0, "aliases": 0, "skipped": 0}
+        report = []
+        # a dry run writes nothing, so later chunks see earlier ones through this
+        planned = {} if dry_run else None
 
-        df = pd.read_excel(kwargs["excel_path"], dtype=str)
-
-        updated = 0
-        skipped = 0
-
-        for _, row in df.iterrows():
-
-            booth = clean_str(row.get("Polling Booth No"))
-            roll_sec = clean_str(row.get("Roll No-SEC"))
-            roll_ceo = clean_str(row.get("Roll No-ECI"))
-            epic_id = clean_str(row.get("Epic ID"))
-            voter_id = clean_str(row.get("Voter ID"))
-
-            if not booth:
-                skipped += 1
-                continue
-
-            qs = Member.objects.filter(polling_booth_no=booth)
-
-            member = None
-            if roll_sec:
-                member = qs.filter(roll_no_sec=roll_sec).first()
-            elif roll_ceo:
-                member = qs.filter(roll_no_ceo=roll_ceo).first()
-            elif epic_id:
-                member = qs.filter(epic_id=epic_id).first()
-            elif voter_id:
-                member = qs.filter(voter_id_number=voter_id).first()
-
-            if not member:
-                skipped += 1
-                continue
-
-            # -----------------------------
-            # NAME → ALIAS + UPDATE
-            # -----------------------------
-            new_name_en = clean_str(row.get("Name(EN)"))
-            new_name_ml = clean_str(row.get("Name(ML)"))
-
-            if new_name_en and new_name_en != member.m_name_en:
-                save_alias(
-                    member,
-                    name_en=member.m_name_en,
-                    name_ml=member.m_name_ml,
-                    source="sir"
-                )
-                member.m_name_en = new_name_en
-                member.m_name_ml = new_name_ml or member.m_name_ml
-
-            # -----------------------------
-            # GUARDIAN → ALIAS + UPDATE
-            # -----------------------------
-            new_guardian = clean_str(row.get("Guardian's Name(EN)"))
-            if new_guardian and new_guardian != member.guardian_en:
-                save_alias(
-                    member,
-                    name_en=member.guardian_en,
-                    source="sir"
-                )
-                member.guardian_en = new_guardian
-
-            # -----------------------------
-            # 🔥 EPIC / ECI / VOTER UPDATE
-            # (only if empty – SAFE)
-            # -----------------------------
-            if epic_id and not member.epic_id:
-                member.epic_id = epic_id
-
-            if roll_ceo and not member.roll_no_ceo:
-                member.roll_no_ceo = roll_ceo
-
-            if voter_id and not member.voter_id_number:
-                member.voter_id_number = voter_id
-
-            # election flag
-            if epic_id or roll_sec or roll_ceo or voter_id:
-                member.election_id = True
-
-            member.save()
-            updated += 1
-
-            self.stdout.write(
-                self.style.SUCCESS(f"🔄 Updated (SIR): {member.m_name_en}")
+        # rows only depend on their booth's members, so the sheet is streamed
+        chunks = ingest.iter_chunks(
+            kwargs["excel_path"], SHEET_COLUMNS, rows=kwargs["chunk_rows"], dtype=str
+        )
+        for df in chunks:
+            counts = apply_sir_rows(
+                df,
+                log=lambda message: self.stdout.write(message if dry_run else self.style.SUCCESS(message)),
+                dry_run=dry_run,
+                report=report.append,
+                planned=planned,
             )
+            for name, count in counts.items():
+                result[name] += count
+
+        if kwargs["report"]:
+            write_report(kwargs["report"], report)
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"\n✅ SIR UPDATE COMPLETED | Updated: {updated} | Skipped: {skipped}"
+                f"\n{'🔍 DRY RUN, nothing written' if dry_run else '✅ SIR UPDATE COMPLETED'} | "
+                f"Updated: {result['updated']} | Unchanged: {result['unchanged']} | "
+                f"Aliases: {result['aliases']} | Skipped: {result['skipped']}"
             )
         )
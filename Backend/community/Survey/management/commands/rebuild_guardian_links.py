@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from Survey import guardians
+
+
+class Command(BaseCommand):
+    help = "Re-resolve every member's guardian name into GuardianLink"
+
+    def handle(self, *args, **kwargs):
+        links = guardians.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"🎉 Wrote {links} guardian links"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from Survey import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute every MemberRollup row from the member table"
+
+    def handle(self, *args, **kwargs):
+        rows = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"🎉 Wrote {rows} rollup rows"))
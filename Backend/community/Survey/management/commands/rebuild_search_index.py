@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from Survey import search
+
+
+class Command(BaseCommand):
+    help = "Re-create the member search table / triggers and refill them (SQLite FTS5)"
+
+    def handle(self, *args, **kwargs):
+        if not search.fts_available():
+            self.stdout.write("ℹ️ No FTS5 here, search uses plain lookups")
+            return
+
+        if not search.install():
+            search.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{search.SEARCH_TABLE}"')
+            rows = cursor.fetchone()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"🎉 Indexed {rows} names"))
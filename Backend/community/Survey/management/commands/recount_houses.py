@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from Survey.counters import recount_houses
+
+
+class Command(BaseCommand):
+    help = "Rebuild House.total_members / total_voters from Member rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--family", type=int, nargs="*",
+            help="Only recount houses of these family ids"
+        )
+
+    def handle(self, *args, **kwargs):
+        updated = recount_houses(kwargs.get("family") or None)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"🎉 Recounted {updated} houses")
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from Survey import jobs
+from Survey.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Run or resume chunked import jobs (started by POST /api/import-jobs/)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("job_id", nargs="?", type=int)
+        parser.add_argument(
+            "--workers", type=int, default=None,
+            help="Worker processes (default IMPORT_JOB_WORKERS, 0 = this process)"
+        )
+        parser.add_argument(
+            "--unfinished", action="store_true",
+            help="Resume every pending / running job, e.g. after a restart"
+        )
+        # internal: one worker process of a running job
+        parser.add_argument("--worker", help="(internal)")
+
+    def handle(self, *args, **options):
+        if options["unfinished"]:
+            job_list = list(ImportJob.objects.filter(status__in=["pending", "running"]).order_by("id"))
+        elif options["job_id"]:
+            job_list = list(ImportJob.objects.filter(pk=options["job_id"]))
+            if not job_list:
+                raise CommandError(f"No import job {options['job_id']}")
+        else:
+            raise CommandError("Give a job id or --unfinished")
+
+        if options["worker"]:
+            jobs.work(job_list[0], worker=options["worker"])
+            return
+
+        for job in job_list:
+            job = jobs.run(job, workers=options["workers"])
+            progress = jobs.progress(job)
+            style = self.style.SUCCESS if job.status == "done" else self.style.ERROR
+            self.stdout.write(style(
+                f"{'🎉' if job.status == 'done' else '❌'} Job {job.pk} ({job.kind}): {job.status} | "
+                f"Chunks: {progress['chunks_done']}/{progress['chunks_total']} | "
+                f"Rows: {progress['rows_done']}/{job.total_rows} | "
+                f"Skipped rows: {progress['error_count']}"
+            ))
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# PostgreSQL only: trigram indexes for name lookups (icontains matches the
+# UPPER(col::text) expression Django emits, plain ones serve similarity)
+# and GIN indexes for containment queries on WardDetails' JSON lists.
+# Other backends skip these.
+INDEXES = [
+    ("member_name_en_trgm", "Survey_member", "(UPPER(m_name_en::text)) gin_trgm_ops"),
+    ("member_name_ml_trgm", "Survey_member", "(UPPER(m_name_ml::text)) gin_trgm_ops"),
+    ("variant_normalized_trgm", "Survey_membernamevariant", "normalized_name gin_trgm_ops"),
+    ("ward_booths_gin", "Survey_warddetails", "polling_booth_no jsonb_path_ops"),
+    ("ward_wards_gin", "Survey_warddetails", "ward jsonb_path_ops"),
+    ("ward_villages_gin", "Survey_warddetails", "villages jsonb_path_ops"),
+    ("ward_panchayaths_gin", "Survey_warddetails", "panchayaths jsonb_path_ops"),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, expression in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING gin ({expression})'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Survey', '0014_sync_revisions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:31
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Coalesce
+
+# frozen copy of the rollup definitions at this migration; later changes to
+# Survey/rollups.py are applied by rebuild_rollups, not here
+AGE_BANDS = {
+    "age_0_17": (0, 17),
+    "age_18_25": (18, 25),
+    "age_26_35": (26, 35),
+    "age_36_45": (36, 45),
+    "age_46_60": (46, 60),
+    "age_61_plus": (61, None),
+}
+
+
+def fill_rollups(apps, schema_editor):
+    Member = apps.get_model("Survey", "Member")
+    MemberRollup = apps.get_model("Survey", "MemberRollup")
+
+    male = Q(m_gender__iexact="m") | Q(m_gender__iexact="male")
+    female = Q(m_gender__iexact="f") | Q(m_gender__iexact="female")
+    counts = {
+        "members": Count("id"),
+        "voters": Count("id", filter=Q(election_id=True)),
+        "male": Count("id", filter=male),
+        "female": Count("id", filter=female),
+        "age_unknown": Count("id", filter=Q(m_age__isnull=True)),
+        "has_2002": Count("id", filter=Q(has_2002=True)),
+        "has_2025": Count("id", filter=Q(has_2025=True)),
+        "d_sir": Count("id", filter=Q(d_sir=True)),
+    }
+    for name, (low, high) in AGE_BANDS.items():
+        band = Q(m_age__gte=low) if high is None else Q(m_age__gte=low, m_age__lte=high)
+        counts[name] = Count("id", filter=band)
+
+    rows = (
+        Member.objects.order_by()
+        .values(
+            key_constituency=Coalesce("constituency_id", Value(0)),
+            key_booth=Coalesce("polling_booth_no", Value("")),
+            key_cluster=Coalesce("house__cluster_id", "family__cluster_id", Value(0)),
+        )
+        .annotate(**{f"n_{name}": count for name, count in counts.items()})
+    )
+
+    def rollups():
+        for row in rows.iterator(chunk_size=2000):
+            values = {name[2:]: row[name] for name in row if name.startswith("n_")}
+            values["other_gender"] = values["members"] - values["male"] - values["female"]
+            yield MemberRollup(
+                constituency_id=row["key_constituency"],
+                polling_booth_no=row["key_booth"],
+                cluster_id=row["key_cluster"],
+                **values,
+            )
+
+    MemberRollup.objects.bulk_create(rollups(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Survey', '0015_postgres_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('constituency_id', models.BigIntegerField(default=0)),
+                ('polling_booth_no', models.CharField(blank=True, default='', max_length=50)),
+                ('cluster_id', models.BigIntegerField(default=0)),
+                ('members', models.PositiveIntegerField(default=0)),
+                ('voters', models.PositiveIntegerField(default=0)),
+                ('male', models.PositiveIntegerField(default=0)),
+                ('female', models.PositiveIntegerField(default=0)),
+                ('other_gender', models.PositiveIntegerField(default=0)),
+                ('age_0_17', models.PositiveIntegerField(default=0)),
+                ('age_18_25', models.PositiveIntegerField(default=0)),
+                ('age_26_35', models.PositiveIntegerField(default=0)),
+                ('age_36_45', models.PositiveIntegerField(default=0)),
+                ('age_46_60', models.PositiveIntegerField(default=0)),
+                ('age_61_plus', models.PositiveIntegerField(default=0)),
+                ('age_unknown', models.PositiveIntegerField(default=0)),
+                ('has_2002', models.PositiveIntegerField(default=0)),
+                ('has_2025', models.PositiveIntegerField(default=0)),
+                ('d_sir', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['polling_booth_no'], name='rollup_booth_idx'), models.Index(fields=['cluster_id'], name='rollup_cluster_idx')],
+                'constraints': [models.UniqueConstraint(fields=('constituency_id', 'polling_booth_no', 'cluster_id'), name='rollup_key_unique')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Survey', '0016_member_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['m_age'], name='member_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['m_gender', 'm_age'], name='member_gender_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['religion'], name='member_religion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membereducation',
+            index=models.Index(fields=['education', 'member'], name='education_member_idx'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:35
+
+import re
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Survey.guardians / Survey.names as of this migration, frozen so the
+# backfill keeps working when those modules change.
+MEMBER_FIELDS = (
+    "id", "m_name_en", "m_name_ml", "guardian_en", "guardian_ml", "m_age",
+    "family_id", "house_id", "original_house_id",
+)
+
+
+def normalize(name):
+    if name is None:
+        return ""
+    name = re.sub(r"[^\w\s]", "", str(name).strip().lower())
+    name = re.sub(r"\b[a-z]{1,2}\b", "", name)
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def fill_links(apps, schema_editor):
+    Member = apps.get_model("Survey", "Member")
+    MemberNameVariant = apps.get_model("Survey", "MemberNameVariant")
+    GuardianLink = apps.get_model("Survey", "GuardianLink")
+
+    members = {m["id"]: m for m in Member.objects.values(*MEMBER_FIELDS)}
+    by_family, by_house = defaultdict(set), defaultdict(set)
+
+    def guardian_keys(member):
+        return normalize(member["guardian_en"]), normalize(member["guardian_ml"])
+
+    def houses(member):
+        return {member["house_id"], member["original_house_id"]} - {None}
+
+    def add(member, key):
+        if member["family_id"] is not None:
+            by_family[key, member["family_id"]].add(member["id"])
+        for house_id in houses(member):
+            by_house[key, house_id].add(member["id"])
+
+    for member in members.values():
+        for key in {normalize(member["m_name_en"]), normalize(member["m_name_ml"])} - {""}:
+            add(member, key)
+    for member_id, key in MemberNameVariant.objects.values_list("member_id", "normalized_name"):
+        member = members[member_id]
+        if key and key not in guardian_keys(member):
+            add(member, key)
+
+    def rank(member, candidate):
+        older = None not in (candidate["m_age"], member["m_age"]) and candidate["m_age"] > member["m_age"]
+        return (
+            member["family_id"] is not None and candidate["family_id"] == member["family_id"],
+            older,
+            member["house_id"] is not None and candidate["house_id"] == member["house_id"],
+        )
+
+    def link(member):
+        key, key_ml = guardian_keys(member)
+        if not (key or key_ml):
+            return None
+        guardian_id, candidates = None, []
+        for name in (key, key_ml):
+            matches = set(by_family.get((name, member["family_id"]), ())) if name else set()
+            for house_id in houses(member) if name else ():
+                matches |= by_house.get((name, house_id), set())
+            matches.discard(member["id"])
+            if matches:
+                best = max(rank(member, members[c]) for c in matches)
+                top = sorted(c for c in matches if rank(member, members[c]) == best)
+                guardian_id, candidates = (top[0], []) if len(top) == 1 else (None, top)
+                break
+        return GuardianLink(
+            member_id=member["id"], guardian_id=guardian_id, candidates=candidates,
+            guardian_key=key, guardian_key_ml=key_ml,
+        )
+
+    links = (link(member) for member in members.values())
+    GuardianLink.objects.bulk_create((row for row in links if row is not None), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Survey', '0018_import_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuardianLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidates', models.JSONField(blank=True, default=list)),
+                ('guardian_key', models.CharField(blank=True, db_index=True, default='', max_length=200)),
+                ('guardian_key_ml', models.CharField(blank=True, db_index=True, default='', max_length=200)),
+                ('guardian', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ward_links', to='Survey.member')),
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='guardian_link', to='Survey.member')),
+            ],
+        ),
+        migrations.RunPython(fill_links, migrations.RunPython.noop),
+    ]
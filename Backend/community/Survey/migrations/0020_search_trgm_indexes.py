@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# PostgreSQL only: the search fallback (Survey/search.py) filters every
+# column below with icontains, which Django emits as UPPER(col::text) LIKE,
+# so each trigram index is built on that expression. Replaces 0015's plain
+# variant_normalized_trgm, which that lookup never used.
+INDEXES = [
+    ("variant_normalized_upper_trgm", "Survey_membernamevariant", "(UPPER(normalized_name::text)) gin_trgm_ops"),
+    ("variant_name_ml_trgm", "Survey_membernamevariant", "(UPPER(name_ml::text)) gin_trgm_ops"),
+    ("member_guardian_en_trgm", "Survey_member", "(UPPER(guardian_en::text)) gin_trgm_ops"),
+    ("member_guardian_ml_trgm", "Survey_member", "(UPPER(guardian_ml::text)) gin_trgm_ops"),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute('DROP INDEX IF EXISTS "variant_normalized_trgm"')
+    for name, table, expression in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING gin ({expression})'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS "variant_normalized_trgm" '
+        'ON "Survey_membernamevariant" USING gin (normalized_name gin_trgm_ops)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Survey', '0019_guardian_links'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
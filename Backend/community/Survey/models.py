@@ -1,6 +1,11 @@
 # users/models.py
+import secrets
+import threading
+from contextlib import contextmanager
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 
 class User(AbstractUser):
     phone_no = models.CharField(max_length=15, blank=True, null=True)
@@ -10,6 +15,89 @@ class User(AbstractUser):
     )
     department = models.CharField(max_length=50, blank=True, null=True)
 
+# ------------------ SYNC REVISIONS ------------------
+# Rows the survey clients mirror offline carry a revision taken from one
+# counter row; /api/sync/ returns what changed after a client's revision.
+# Taking a revision locks that row until commit, so every writer queues
+# behind it: bulk writes take theirs last, inside late_revision().
+class SyncCounter(models.Model):
+    value = models.BigIntegerField(default=0)
+
+
+_late = threading.local()
+
+
+def next_revision():
+    """
+    Take the next revision. Call inside transaction.atomic(): the counter row
+    stays locked until the caller commits, so revisions become visible in
+    the order they were taken and a client never skips past a pending one.
+    Inside late_revision() this is the block's placeholder instead.
+    """
+    placeholder = getattr(_late, "placeholder", None)
+    if placeholder is not None:
+        return placeholder
+    counter = SyncCounter.objects.filter(pk=1)
+    if not counter.update(value=F("value") + 1):
+        SyncCounter.objects.create(pk=1, value=1)
+    return counter.values_list("value", flat=True).get()
+
+
+def stamp(objs):
+    """Give a batch about to be bulk-written one fresh revision."""
+    revision = next_revision()
+    for obj in objs:
+        obj.revision = revision
+    return revision
+
+
+@contextmanager
+def late_revision():
+    """
+    For long bulk writes, inside transaction.atomic(). Revisions taken in
+    the block are a negative placeholder; on exit one real revision is
+    taken and swapped in with an indexed UPDATE per revisioned table, still
+    in the caller's transaction. The counter row is then locked for those
+    statements and the commit only, not for the whole write, so API saves
+    aren't held up by an import. Nested blocks join the outer one.
+    """
+    if getattr(_late, "placeholder", None) is not None:
+        yield
+        return
+
+    _late.placeholder = placeholder = -secrets.randbits(62) - 1
+    try:
+        yield
+    finally:
+        _late.placeholder = None
+
+    revision = next_revision()
+    for model in (*Revisioned.__subclasses__(), SyncTombstone):
+        model.objects.filter(revision=placeholder).update(revision=revision)
+
+
+class Revisioned(models.Model):
+    revision = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "revision"}
+        with transaction.atomic(using=kwargs.get("using")):
+            self.revision = next_revision()
+            super().save(*args, **kwargs)
+
+
+class SyncTombstone(models.Model):
+    """A deleted Revisioned row, kept so clients can drop their copy."""
+    model = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    revision = models.BigIntegerField(db_index=True)
+
+
 class Cluster(models.Model):
     name_english = models.CharField(
         max_length=255,
@@ -29,7 +117,7 @@ class Cluster(models.Model):
   
 
 
-class Family(models.Model):
+class Family(Revisioned):
     # ✅ English + Malayalam
     family_name_en = models.CharField(max_length=100, blank=True, null=True)
     family_name_ml = models.CharField(max_length=100, blank=True, null=True)
@@ -57,7 +145,7 @@ class Family(models.Model):
 
 
 
-class House(models.Model):
+class House(Revisioned):
     # ✅ Owner Details
     owner_en = models.CharField(max_length=120)
     owner_ml = models.CharField(max_length=120, blank=True, null=True)
@@ -136,10 +224,14 @@ class House(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def update_counts(self):
-        members = self.family.members.all()  # related_name="members" from Member model
+        # related_name="members" from Member model, one aggregate query
+        totals = self.family.members.aggregate(
+            members=models.Count("id"),
+            voters=models.Count("id", filter=models.Q(election_id=True)),
+        )
 
-        self.total_members = members.count()
-        self.total_voters = members.filter(election_id=True).count()
+        self.total_members = totals["members"]
+        self.total_voters = totals["voters"]
 
         self.save(update_fields=["total_members", "total_voters"])
 
@@ -158,14 +250,18 @@ class MadrasaDetails(models.Model):
     def __str__(self):
         return f"{self.member.m_name_en} - {'Studied' if self.studied else 'Not Studied'}"
     
-class MemberEducation(models.Model):
+class MemberEducation(Revisioned):
     member = models.ForeignKey(
         'Member', on_delete=models.CASCADE, related_name='educations'
     )
     education = models.CharField(max_length=100)
     education_status = models.CharField(max_length=20, blank=True, null=True)
     education_stream = models.CharField(max_length=100, blank=True, null=True)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["education", "member"], name="education_member_idx"),
+        ]
 
     def __str__(self):
         return f"{self.member.m_name_en} - {self.education}"
@@ -177,7 +273,7 @@ class MemberEducation(models.Model):
 
 
 
-class Member(models.Model):
+class Member(Revisioned):
     family = models.ForeignKey(Family, on_delete=models.CASCADE, related_name="members",blank=True, null=True)
     house = models.ForeignKey(
         House,
@@ -279,6 +375,36 @@ class Member(models.Model):
 
     is_active_in_house = models.BooleanField(default=True)
 
+    class Meta:
+        # ✅ Identity keys used by the import / SIR / booth-fix commands
+        indexes = [
+            models.Index(fields=["voter_id_number"], name="member_voter_id_idx"),
+            models.Index(fields=["epic_id"], name="member_epic_id_idx"),
+            models.Index(fields=["roll_no_sec"], name="member_roll_sec_idx"),
+            models.Index(fields=["roll_no_ceo"], name="member_roll_ceo_idx"),
+            models.Index(fields=["polling_booth_no", "roll_no_sec"], name="member_booth_roll_idx"),
+            models.Index(fields=["family", "m_age"], name="member_family_age_idx"),
+            # ✅ Common list filters (Survey/filters.py)
+            models.Index(fields=["m_age"], name="member_age_idx"),
+            models.Index(fields=["m_gender", "m_age"], name="member_gender_age_idx"),
+            models.Index(fields=["religion"], name="member_religion_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what House counters were built from (see Survey/counters.py)
+        loaded = instance.__dict__
+        if "family_id" in loaded and "election_id" in loaded:
+            instance._counted_as = (loaded["family_id"], bool(loaded["election_id"]))
+        # ...and which booth's rollups it was counted in (see Survey/rollups.py)
+        if "constituency_id" in loaded and "polling_booth_no" in loaded:
+            instance._rolled_as = (loaded["constituency_id"] or 0, loaded["polling_booth_no"] or "")
+        # ...and what its guardian link was resolved from (see Survey/guardians.py)
+        if all(field in loaded for field in GUARDIAN_LINK_FIELDS):
+            instance._linked_as = tuple(loaded[field] for field in GUARDIAN_LINK_FIELDS)
+        return instance
+
     def __str__(self):
         return f"{self.m_name_en}/{self.m_name_ml} ({self.family.h_no})"
     
@@ -339,7 +465,7 @@ class WardDetails(models.Model):
         return f"{self.panchayaths} - {self.villages} {posts_str} {booths_str}"
     
 
-class MemberNameVariant(models.Model):
+class MemberNameVariant(Revisioned):
     member = models.ForeignKey(
         Member,
         on_delete=models.CASCADE,
@@ -405,10 +531,133 @@ class MemberNameVariant(models.Model):
         return f"{self.member_name_en} → {self.name_en}"
 
 
-    
+# ------------------ GUARDIAN LINKS ------------------
+# Member columns a GuardianLink is resolved from
+GUARDIAN_LINK_FIELDS = (
+    "m_name_en", "m_name_ml", "guardian_en", "guardian_ml", "m_age",
+    "family_id", "house_id", "original_house_id",
+)
 
-    
-    
 
+class GuardianLink(models.Model):
+    """
+    A member's guardian name resolved to a member, kept current by
+    Survey/guardians.py. ``guardian`` is empty when nobody nearby goes by
+    the name, or when several do (their ids are in ``candidates``).
+    """
+    member = models.OneToOneField(Member, on_delete=models.CASCADE, related_name="guardian_link")
+    guardian = models.ForeignKey(
+        Member, on_delete=models.SET_NULL, null=True, blank=True, related_name="ward_links"
+    )
+    candidates = models.JSONField(default=list, blank=True)
+    # normalized guardian_en / guardian_ml, as MemberNameVariant.normalized_name
+    guardian_key = models.CharField(max_length=200, blank=True, default="", db_index=True)
+    guardian_key_ml = models.CharField(max_length=200, blank=True, default="", db_index=True)
+
+
+# ------------------ ROLLUPS ------------------
+class MemberRollup(models.Model):
+    """
+    Member counts per (constituency, polling booth, cluster), kept current by
+    Survey/rollups.py. 0 / "" stand for "none" so the key stays unique.
+    """
+    constituency_id = models.BigIntegerField(default=0)
+    polling_booth_no = models.CharField(max_length=50, default="", blank=True)
+    cluster_id = models.BigIntegerField(default=0)
+
+    members = models.PositiveIntegerField(default=0)
+    voters = models.PositiveIntegerField(default=0)
+    male = models.PositiveIntegerField(default=0)
+    female = models.PositiveIntegerField(default=0)
+    other_gender = models.PositiveIntegerField(default=0)
+    age_0_17 = models.PositiveIntegerField(default=0)
+    age_18_25 = models.PositiveIntegerField(default=0)
+    age_26_35 = models.PositiveIntegerField(default=0)
+    age_36_45 = models.PositiveIntegerField(default=0)
+    age_46_60 = models.PositiveIntegerField(default=0)
+    age_61_plus = models.PositiveIntegerField(default=0)
+    age_unknown = models.PositiveIntegerField(default=0)
+    has_2002 = models.PositiveIntegerField(default=0)
+    has_2025 = models.PositiveIntegerField(default=0)
+    d_sir = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["constituency_id", "polling_booth_no", "cluster_id"],
+                name="rollup_key_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["polling_booth_no"], name="rollup_booth_idx"),
+            models.Index(fields=["cluster_id"], name="rollup_cluster_idx"),
+        ]
+
+
+# ------------------ IMPORT JOBS ------------------
+class ImportJob(models.Model):
+    """
+    An uploaded sheet imported in chunks by Survey/jobs.py. Progress lives
+    on its ImportChunk rows, so a crashed job resumes where it stopped.
+    """
+    KINDS = [
+        ("members", "Members"),
+        ("houses", "Houses"),
+        ("families", "Families"),
+        ("sir", "SIR update"),
+        ("booths", "Polling booth fix"),
+    ]
+    STATUSES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    file = models.FileField(upload_to="imports/")
+    status = models.CharField(max_length=10, choices=STATUSES, default="pending")
+    chunk_size = models.PositiveIntegerField(default=2000)
+    total_rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # touched while a driver or worker is alive; a "running" job whose
+    # heartbeat is older than IMPORT_JOB_STALE_AFTER has lost its processes
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
 
+    def __str__(self):
+        return f"{self.kind} import #{self.pk} ({self.status})"
+
+
+class ImportChunk(models.Model):
+    """
+    A slice of an ImportJob's rows. A chunk's writes and its "done" mark
+    commit in the same transaction.
+    """
+    STATUSES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()
+    rows = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default="pending")
+    summary = models.JSONField(default=dict, blank=True)
+    # [{"row": sheet row number, "error": reason}, ...]
+    errors = models.JSONField(default=list, blank=True)
+    worker = models.CharField(max_length=50, blank=True, default="")
+    finished_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        ordering = ["job", "index"]
+        constraints = [
+            models.UniqueConstraint(fields=["job", "index"], name="import_chunk_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["job", "status"], name="import_chunk_status_idx"),
+        ]
@@ -0,0 +1,208 @@
+"""
+Name normalization and fuzzy matching for member aliases.
+
+Every MemberNameVariant.normalized_name is produced by normalize_name().
+NameIndex blocks candidates by a phonetic key (falling back to shared
+trigrams) inside a scope such as a family or a booth, and only scores the
+few candidates in a block with a bounded edit distance, so matching a sheet
+against the alias table is roughly linear instead of pairwise.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from itertools import chain
+
+# ---------------------------------------
+# NORMALIZATION
+# ---------------------------------------
+_PUNCT = r"[^\w\s]"
+_INITIALS = r"\b[a-z]{1,2}\b"
+_SPACES = r"\s+"
+
+
+def normalize_name(name):
+    """lower-case, drop punctuation and 1-2 letter initials, squash spaces"""
+    if name is None or (isinstance(name, float) and math.isnan(name)):
+        return ""
+    name = str(name).strip().lower()
+    name = re.sub(_PUNCT, "", name)
+    name = re.sub(_INITIALS, "", name)
+    name = re.sub(_SPACES, " ", name)
+    return name.strip()
+
+
+def normalize_names(s):
+    """Vectorized normalize_name() for a pandas string Series."""
+    return (
+        s.fillna("").astype(str).str.strip().str.lower()
+        .str.replace(_PUNCT, "", regex=True)
+        .str.replace(_INITIALS, "", regex=True)
+        .str.replace(_SPACES, " ", regex=True)
+        .str.strip()
+    )
+
+
+# ---------------------------------------
+# PHONETIC KEY
+# ---------------------------------------
+# Spellings that Malayalam → English transliteration uses interchangeably
+_LATIN_FOLDS = (
+    ("zh", "l"), ("th", "t"), ("dh", "d"), ("kh", "k"), ("gh", "g"),
+    ("bh", "b"), ("ph", "f"), ("sh", "s"), ("ch", "c"), ("ck", "k"),
+    ("q", "k"), ("w", "v"), ("z", "s"), ("x", "ks"),
+)
+_VOWELS = set("aeiouy")
+
+# Malayalam: dependent vowel signs and virama are dropped, chillus → base consonant
+_ML_SIGNS = {chr(c) for c in range(0x0D3E, 0x0D4E)} | {"ൗ", "ം", "ഃ"}
+_ML_CHILLU = {
+    "ൺ": "ണ", "ൻ": "ന", "ർ": "ര",
+    "ൽ": "ല", "ൾ": "ള", "ൿ": "ക",
+}
+
+
+def _token_key(token):
+    if not token:
+        return ""
+    if any("\u0D00" <= ch <= "\u0D7F" for ch in token):
+        chars = [_ML_CHILLU.get(ch, ch) for ch in token if ch not in _ML_SIGNS]
+    else:
+        for a, b in _LATIN_FOLDS:
+            token = token.replace(a, b)
+        # keep the leading letter, drop the remaining vowels and h
+        chars = [token[0]] + [ch for ch in token[1:] if ch not in _VOWELS and ch != "h"]
+
+    key = []
+    for ch in chars:
+        if not key or key[-1] != ch:
+            key.append(ch)
+    return "".join(key)
+
+
+def phonetic_key(normalized):
+    """Consonant skeleton per token, e.g. 'abdul rahiman' → 'abdl rmn'."""
+    return " ".join(_token_key(t) for t in normalized.split())
+
+
+def trigrams(normalized):
+    padded = f"  {normalized.replace(' ', '')} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ---------------------------------------
+# DISTANCE
+# ---------------------------------------
+def edit_distance(a, b, limit=None):
+    """
+    Levenshtein distance. Stops early and returns ``limit + 1`` once the
+    distance is known to exceed ``limit``.
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def similarity(a, b, threshold=0.0):
+    """1.0 for equal names, 0.0 for nothing in common (or below threshold)."""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    limit = int(longest * (1 - threshold))
+    distance = edit_distance(a, b, limit)
+    if distance > limit:
+        return 0.0
+    return 1 - distance / longest
+
+
+# ---------------------------------------
+# INDEX
+# ---------------------------------------
+class NameIndex:
+    """
+    Blocked candidate index over normalized names.
+
+    ``add(target, name, scope)`` files ``target`` (a member, an id, …) under
+    the name's phonetic key and trigrams within ``scope``; ``match()``
+    scores only those blocks and returns the best ``(target, score)``.
+    """
+
+    def __init__(self, threshold=0.85, min_shared_trigrams=0.6):
+        self.threshold = threshold
+        self.min_shared_trigrams = min_shared_trigrams
+        self._entries = []
+        self._phonetic = defaultdict(list)
+        self._trigrams = defaultdict(list)
+
+    @classmethod
+    def from_variants(cls, queryset, scope_field=None, **kwargs):
+        """
+        Index MemberNameVariant rows by member id in one query.
+        ``scope_field`` is a lookup such as ``"member__family_id"``.
+        """
+        index = cls(**kwargs)
+        fields = ["member_id", "normalized_name"] + ([scope_field] if scope_field else [])
+        for row in queryset.values_list(*fields).iterator(chunk_size=5000):
+            index.add(row[0], row[1], row[2] if scope_field else None, normalized=True)
+        return index
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, target, name, scope=None, normalized=False):
+        norm = name if normalized else normalize_name(name)
+        if not norm:
+            return
+        # postings hold entry numbers, so targets needn't be hashable
+        entry_id = len(self._entries)
+        self._entries.append((norm, target))
+        self._phonetic[(scope, phonetic_key(norm))].append(entry_id)
+        for gram in trigrams(norm):
+            self._trigrams[(scope, gram)].append(entry_id)
+
+    def phonetic_candidates(self, norm, scope=None):
+        block = self._phonetic.get((scope, phonetic_key(norm)), ())
+        return [self._entries[i] for i in block]
+
+    def trigram_candidates(self, norm, scope=None):
+        grams = trigrams(norm)
+        shared = Counter(chain.from_iterable(
+            self._trigrams.get((scope, gram), ()) for gram in grams
+        ))
+        needed = self.min_shared_trigrams * len(grams)
+        return [self._entries[i] for i, n in shared.items() if n >= needed]
+
+    def best(self, norm, candidates):
+        best = None
+        for candidate, target in candidates:
+            score = similarity(norm, candidate, self.threshold)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (target, score)
+                if score == 1.0:
+                    break
+        return best
+
+    def match(self, name, scope=None, normalized=False):
+        norm = name if normalized else normalize_name(name)
+        if not norm:
+            return None
+        return (
+            self.best(norm, self.phonetic_candidates(norm, scope))
+            or self.best(norm, self.trigram_candidates(norm, scope))
+        )
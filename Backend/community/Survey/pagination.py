@@ -0,0 +1,148 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination on id."""
+
+    ordering = "id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (one ordering field, id).
+
+    The view's OrderingFilter picks the field (its first one; later ones
+    are ignored) and id breaks ties, so the position is unique whatever the
+    field holds. NULLs sort last in both directions and are paged like any
+    other value. The cursor is the (value, id) of the row to continue from.
+    """
+
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_field(self, request, queryset, view):
+        """(field name, descending) to page on."""
+        ordering = ["id"]
+        for backend in getattr(view, "filter_backends", ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view) or ordering
+                break
+        field = ordering[0]
+        return field.lstrip("-"), field.startswith("-")
+
+    # ---------------------------------------
+    # CURSORS
+    # ---------------------------------------
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")))
+            return cursor["v"], int(cursor["id"]), bool(cursor["r"])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, value, pk, reverse):
+        position = json.dumps({"v": value, "id": pk, "r": reverse}, default=str)
+        encoded = b64encode(position.encode()).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def past(self, value, pk, before):
+        """Rows after (value, id) in page order, or before it when ``before``."""
+        field = self.field
+        if before:
+            if value is None:
+                return Q(**{f"{field}__isnull": False}) | Q(**{f"{field}__isnull": True, "id__lt": pk})
+            lookup = "gt" if self.descending else "lt"
+            return Q(**{f"{field}__{lookup}": value}) | Q(**{field: value, "id__lt": pk})
+        if value is None:
+            return Q(**{f"{field}__isnull": True, "id__gt": pk})
+        lookup = "lt" if self.descending else "gt"
+        return (
+            Q(**{f"{field}__{lookup}": value})
+            | Q(**{field: value, "id__gt": pk})
+            | Q(**{f"{field}__isnull": True})
+        )
+
+    def order(self, reverse):
+        # walking backwards flips everything, NULLs included
+        nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+        column = F(self.field).desc(**nulls) if self.descending != reverse else F(self.field).asc(**nulls)
+        return [column, "-id" if reverse else "id"]
+
+    # ---------------------------------------
+    # PAGES
+    # ---------------------------------------
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.field, self.descending = self.get_field(request, queryset, view)
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+
+        if cursor is not None:
+            queryset = queryset.filter(self.past(cursor[0], cursor[1], before=reverse))
+        # the key travels with the row, so sparse ?fields= never defers it
+        rows = list(
+            queryset.annotate(_page_key=F(self.field)).order_by(*self.order(reverse))[:size + 1]
+        )
+        more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        # a backwards page always has rows after it, a forwards one before it once moved
+        has_next = True if reverse else more
+        has_previous = more if reverse else cursor is not None
+        self.next_url = self.previous_url = None
+        if rows and has_next:
+            self.next_url = self.encode_cursor(rows[-1]._page_key, rows[-1].pk, False)
+        if rows and has_previous:
+            self.previous_url = self.encode_cursor(rows[0]._page_key, rows[0].pk, True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.next_url),
+            ("previous", self.previous_url),
+            ("results", data),
+        ]))
+
+
+class MemberCursorPagination(KeysetPagination):
+    """
+    Keyset pagination on Member (?ordering= field, then id). Every list
+    response is a ``{"next", "previous", "results"}`` page of at most
+    ``max_page_size`` rows; clients walk ``next`` for more.
+    """
+
+
+class SearchPagination(PageNumberPagination):
+    """Numbered pages over a ranked result list."""
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
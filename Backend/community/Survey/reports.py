@@ -0,0 +1,207 @@
+"""
+Aggregates behind /api/report/.
+
+Each section is one aggregate query; member-level filters (ward, booth)
+narrow families through an EXISTS subquery so nothing is loaded row by row.
+"""
+import hashlib
+import json
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Family, House, Member, MemberEducation
+
+EDUCATION_LEVELS = ["10th", "+1", "+2", "UG", "PG", "PhD"]
+
+# houses rows per streamed chunk
+STREAM_CHUNK = 500
+
+# see CACHES["reports"] in settings
+REPORT_CACHE = "reports"
+REPORT_TIMEOUT = 24 * 60 * 60
+VERSION_KEY = "report:version"
+
+
+class ReportFilters:
+    """cluster / ward / booth query params shared by every report section."""
+
+    def __init__(self, cluster=None, ward=None, booth=None):
+        self.cluster = cluster or None
+        self.ward = ward or None
+        self.booth = booth or None
+
+    @classmethod
+    def from_params(cls, params):
+        ids = {}
+        for name in ("cluster", "ward"):
+            value = params.get(name)
+            if value and not value.isdigit():
+                raise ValidationError({name: "Must be an id."})
+            ids[name] = value
+        return cls(ids["cluster"], ids["ward"], params.get("booth"))
+
+    def as_dict(self):
+        return {"cluster": self.cluster, "ward": self.ward, "booth": self.booth}
+
+    def cache_key(self, version):
+        return f"report:{version}:{self.cluster or ''}:{self.ward or ''}:{self.booth or ''}"
+
+    def member_q(self, prefix=""):
+        """Conditions on Member, relative to ``prefix`` (e.g. "members__")."""
+        q = Q()
+        if self.ward:
+            q &= Q(**{f"{prefix}ward_id": self.ward}) | Q(**{f"{prefix}constituency_id": self.ward})
+        if self.booth:
+            q &= Q(**{f"{prefix}polling_booth_no": self.booth})
+        return q
+
+    @property
+    def has_member_filters(self):
+        return bool(self.ward or self.booth)
+
+    def families(self):
+        families = Family.objects.all()
+        if self.cluster:
+            # imports set the cluster on the family, the UI sets it per house
+            families = families.filter(
+                Q(cluster_id=self.cluster)
+                | Exists(House.objects.filter(family=OuterRef("pk"), cluster_id=self.cluster))
+            )
+        if self.has_member_filters:
+            families = families.filter(
+                Exists(Member.objects.filter(self.member_q(), family=OuterRef("pk")))
+            )
+        return families
+
+    def members(self, queryset=None):
+        members = (Member.objects.all() if queryset is None else queryset).filter(self.member_q())
+        if self.cluster:
+            members = members.filter(
+                Q(family__cluster_id=self.cluster)
+                | Exists(House.objects.filter(family=OuterRef("family_id"), cluster_id=self.cluster))
+            )
+        return members
+
+
+def family_totals(filters):
+    """
+    Distinct h_no values and families. As values("h_no").distinct().count()
+    always did, families without an h_no count as one more house, which
+    COUNT(DISTINCT) alone would leave out.
+    """
+    totals = filters.families().aggregate(
+        house_count=Count("h_no", distinct=True),
+        family_count=Count("id"),
+        unnumbered=Count("id", filter=Q(h_no__isnull=True)),
+    )
+    totals["house_count"] += 1 if totals.pop("unnumbered") else 0
+    return totals
+
+
+def member_count(filters):
+    return filters.members().count()
+
+
+def houses(filters):
+    """One row per family with its member count, straight from the DB cursor."""
+    return (
+        filters.families()
+        .annotate(member_count=Count("members", filter=filters.member_q("members__")))
+        .order_by("id")
+        .values("family_name_en", "family_name_ml", "h_no", "sub", "member_count")
+        .iterator(chunk_size=2000)
+    )
+
+
+def education_summary(filters):
+    educations = MemberEducation.objects.all()
+    if filters.has_member_filters or filters.cluster:
+        educations = educations.filter(member__in=filters.members().values("id"))
+
+    rows = educations.values("education", "education_status").annotate(total=Count("id"))
+
+    summary = {}
+    for row in rows:
+        level = row["education"]
+        status = (row["education_status"] or "").lower()
+
+        if level not in summary:
+            summary[level] = {"name": level, "passed": 0, "failed": 0, "studying": 0}
+        if status in ("passed", "failed", "studying"):
+            summary[level][status] += row["total"]
+
+    # fixed order
+    return [summary[level] for level in EDUCATION_LEVELS if level in summary]
+
+
+def stream_report(filters):
+    """
+    Return an iterator of JSON text. Totals and the education summary are
+    small and computed before the response starts; ``houses`` is written as
+    it is read from the cursor.
+    """
+    totals = family_totals(filters)
+    head = json.dumps({
+        "house_count": totals["house_count"],
+        "member_count": member_count(filters),
+        "family_count": totals["family_count"],
+    })
+    tail = json.dumps(education_summary(filters), ensure_ascii=False)
+
+    def chunks():
+        yield head[:-1] + ', "houses": ['
+        chunk = []
+        for i, row in enumerate(houses(filters)):
+            chunk.append(("," if i else "") + json.dumps(row, ensure_ascii=False))
+            if len(chunk) == STREAM_CHUNK:
+                yield "".join(chunk)
+                chunk = []
+        yield "".join(chunk) + '], "education_summary": ' + tail + "}"
+
+    return chunks()
+
+
+# ---------------------------------------
+# CACHE
+# ---------------------------------------
+# Every cached report is keyed by the current data version; any write to
+# the data a report reads swaps the version, which orphans all of them.
+def current_version():
+    cache = caches[REPORT_CACHE]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_reports():
+    """Drop all cached reports once the current transaction commits."""
+    transaction.on_commit(
+        lambda: caches[REPORT_CACHE].set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    )
+
+
+def report_etag(filters, version):
+    digest = hashlib.sha1(filters.cache_key(version).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def cached_report(filters, version):
+    return caches[REPORT_CACHE].get(filters.cache_key(version))
+
+
+def caching(chunks, filters, version):
+    """Pass chunks through and store the full body once it is complete."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+
+    # skip storing if the data changed while this report was being built
+    if current_version() == version:
+        caches[REPORT_CACHE].set(filters.cache_key(version), "".join(parts), REPORT_TIMEOUT)
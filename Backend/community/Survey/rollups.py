@@ -0,0 +1,220 @@
+"""
+MemberRollup bookkeeping and the /api/rollups/ query.
+
+A rollup row holds the counts for one (constituency, booth, cluster). A
+member's cluster comes from its house, or its family when it has none, so
+member writes don't try to work out which row moved: they mark their
+(constituency, booth) dirty and every row of that booth is recomputed with
+one grouped query. Dirty booths can be collected for a whole block with
+``deferred_rollups()``; ``rebuild()`` without arguments redoes everything.
+"""
+import threading
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+
+from .models import Member, MemberRollup
+
+_local = threading.local()
+
+# past this many dirty booths one full rebuild is cheaper than the OR filter
+MAX_PARTIAL_BOOTHS = 200
+
+AGE_BANDS = {
+    "age_0_17": (0, 17),
+    "age_18_25": (18, 25),
+    "age_26_35": (26, 35),
+    "age_36_45": (36, 45),
+    "age_46_60": (46, 60),
+    "age_61_plus": (61, None),
+}
+
+COUNT_FIELDS = [
+    "members", "voters", "male", "female", "other_gender",
+    *AGE_BANDS, "age_unknown", "has_2002", "has_2025", "d_sir",
+]
+
+# ?group_by= names → MemberRollup key columns
+GROUPS = {
+    "constituency": "constituency_id",
+    "booth": "polling_booth_no",
+    "cluster": "cluster_id",
+}
+
+_MALE = Q(m_gender__iexact="m") | Q(m_gender__iexact="male")
+_FEMALE = Q(m_gender__iexact="f") | Q(m_gender__iexact="female")
+
+
+def member_counts():
+    """Aggregates per rollup field, named ``n_<field>`` (some clash with Member's fields)."""
+    counts = {
+        "members": Count("id"),
+        "voters": Count("id", filter=Q(election_id=True)),
+        "male": Count("id", filter=_MALE),
+        "female": Count("id", filter=_FEMALE),
+        "age_unknown": Count("id", filter=Q(m_age__isnull=True)),
+        "has_2002": Count("id", filter=Q(has_2002=True)),
+        "has_2025": Count("id", filter=Q(has_2025=True)),
+        "d_sir": Count("id", filter=Q(d_sir=True)),
+    }
+    for name, (low, high) in AGE_BANDS.items():
+        band = Q(m_age__gte=low) if high is None else Q(m_age__gte=low, m_age__lte=high)
+        counts[name] = Count("id", filter=band)
+    return {f"n_{name}": count for name, count in counts.items()}
+
+
+# ---------------------------------------
+# REBUILD
+# ---------------------------------------
+def booth_of(member):
+    return (member.constituency_id or 0, member.polling_booth_no or "")
+
+
+def _members_of(constituency_id, booth):
+    q = Q(constituency_id=constituency_id) if constituency_id else Q(constituency__isnull=True)
+    if booth:
+        return q & Q(polling_booth_no=booth)
+    return q & (Q(polling_booth_no__isnull=True) | Q(polling_booth_no=""))
+
+
+@transaction.atomic(savepoint=False)
+def rebuild(booths=None):
+    """
+    Recompute the rollup rows of ``booths`` ((constituency_id, booth) pairs),
+    or of everything when None. Returns the number of rows written.
+    """
+    members = Member.objects.all()
+    rollups = MemberRollup.objects.all()
+
+    if booths is not None:
+        booths = set(booths)
+        if not booths:
+            return 0
+        if len(booths) <= MAX_PARTIAL_BOOTHS:
+            members = members.filter(reduce(or_, (_members_of(*b) for b in booths)))
+            rollups = rollups.filter(reduce(or_, (
+                Q(constituency_id=c, polling_booth_no=b) for c, b in booths
+            )))
+
+    rollups.delete()
+    written = MemberRollup.objects.bulk_create(
+        (MemberRollup(**row) for row in grouped_counts(members)), batch_size=1000
+    )
+    return len(written)
+
+
+def grouped_counts(members):
+    """One dict of MemberRollup field values per (constituency, booth, cluster) of ``members``."""
+    rows = (
+        members.order_by()
+        .values(
+            key_constituency=Coalesce("constituency_id", Value(0)),
+            key_booth=Coalesce("polling_booth_no", Value("")),
+            key_cluster=Coalesce("house__cluster_id", "family__cluster_id", Value(0)),
+        )
+        .annotate(**member_counts())
+    )
+    for row in rows.iterator(chunk_size=2000):
+        counts = {name[2:]: row[name] for name in row if name.startswith("n_")}
+        counts["other_gender"] = counts["members"] - counts["male"] - counts["female"]
+        yield {
+            "constituency_id": row["key_constituency"],
+            "polling_booth_no": row["key_booth"],
+            "cluster_id": row["key_cluster"],
+            **counts,
+        }
+
+
+# ---------------------------------------
+# DIRTY TRACKING
+# ---------------------------------------
+def _pending():
+    return getattr(_local, "pending", None)
+
+
+def mark_dirty(booths):
+    booths = set(booths)
+    pending = _pending()
+    if pending is None:
+        rebuild(booths)
+    else:
+        pending |= booths
+
+
+def member_written(member):
+    booths = {booth_of(member)}
+    old = getattr(member, "_rolled_as", None)
+    if old is not None:
+        booths.add(old)
+    mark_dirty(booths)
+    member._rolled_as = booth_of(member)
+
+
+def member_removed(member):
+    mark_dirty({getattr(member, "_rolled_as", None) or booth_of(member)})
+
+
+def members_moved(members):
+    """Members whose cluster may have changed (house / family edits)."""
+    mark_dirty(
+        (c or 0, b or "")
+        for c, b in members.order_by().values_list("constituency_id", "polling_booth_no").distinct()
+    )
+
+
+@contextmanager
+def deferred_rollups():
+    """
+    Recompute the booths dirtied inside the block once, on exit. Nested
+    blocks join the outer one and nothing is written if the block raises.
+    """
+    if _pending() is not None:
+        yield
+        return
+
+    _local.pending = set()
+    try:
+        yield
+        booths = _local.pending
+    finally:
+        _local.pending = None
+
+    if booths:
+        rebuild(booths)
+
+
+# ---------------------------------------
+# QUERY
+# ---------------------------------------
+def summarize(params):
+    """
+    ?constituency=<id>&booth=<no>&cluster=<id>&group_by=booth,cluster
+
+    Totals (or one row per group) summed from the rollup rows in one query.
+    """
+    rollups = MemberRollup.objects.all()
+    for name in ("constituency", "cluster"):
+        value = params.get(name)
+        if value:
+            if not value.isdigit():
+                raise ValidationError({name: "Must be an id."})
+            rollups = rollups.filter(**{GROUPS[name]: int(value)})
+    if params.get("booth"):
+        rollups = rollups.filter(polling_booth_no=params["booth"])
+
+    group_by = [g.strip() for g in params.get("group_by", "").split(",") if g.strip()]
+    unknown = [g for g in group_by if g not in GROUPS]
+    if unknown:
+        raise ValidationError({"group_by": f"Unknown groups: {', '.join(unknown)}"})
+
+    sums = {field: Coalesce(Sum(field), 0) for field in COUNT_FIELDS}
+    if not group_by:
+        return rollups.aggregate(**sums)
+
+    columns = [GROUPS[g] for g in group_by]
+    return list(rollups.values(*columns).annotate(**sums).order_by(*columns))
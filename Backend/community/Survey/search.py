@@ -0,0 +1,189 @@
+"""
+Member search behind /api/members/search/?q=.
+
+On SQLite the searchable text lives in an FTS5 table with the trigram
+tokenizer (substring matches in any script, Malayalam included), one row
+per member and one per MemberNameVariant. Triggers keep it current, so
+bulk_create / update() writes are covered too. Rebuilding a table during a
+migration drops its triggers, so ``install()`` runs after every migrate and
+re-creates anything missing.
+
+Other backends, SQLite builds without FTS5 or older than 3.34 (the first
+with the trigram tokenizer), and queries with a term too short for
+trigrams fall back to icontains lookups, which the UPPER(col::text)
+pg_trgm indexes from migrations 0015 and 0020 serve on Postgres.
+"""
+import sqlite3
+from contextlib import closing
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Exists, F, FloatField, Func, OuterRef, Q, Value
+
+from .models import Member, MemberNameVariant
+
+SEARCH_TABLE = "Survey_member_search"
+SEARCH_MAX_RESULTS = 1000
+# FTS trigram matching needs terms of at least this many characters
+MIN_TERM_LENGTH = 3
+# the first SQLite with FTS5's trigram tokenizer
+TRIGRAM_SQLITE_VERSION = (3, 34, 0)
+
+# FTS rowids: members at 2*id, aliases at 2*id + 1
+MEMBER_NAMES = (
+    "coalesce({p}.m_name_en, '') || ' ' || coalesce({p}.m_name_ml, '') || ' ' || "
+    "coalesce({p}.guardian_en, '') || ' ' || coalesce({p}.guardian_ml, '')"
+)
+MEMBER_IDS = "coalesce({p}.voter_id_number, '') || ' ' || coalesce({p}.epic_id, '')"
+VARIANT_NAMES = (
+    "{p}.name_en || ' ' || coalesce({p}.name_ml, '') || ' ' || {p}.normalized_name"
+)
+VARIANT_IDS = "coalesce({p}.voter_id, '')"
+
+MEMBER_COLUMNS = "m_name_en, m_name_ml, guardian_en, guardian_ml, voter_id_number, epic_id"
+VARIANT_COLUMNS = "member_id, name_en, name_ml, normalized_name, voter_id"
+
+
+def _insert(rowid, member_id, names, ids, prefix):
+    return (
+        f'INSERT INTO "{SEARCH_TABLE}"(rowid, member_id, names, ids) VALUES '
+        f"({rowid.format(p=prefix)}, {member_id.format(p=prefix)}, "
+        f"{names.format(p=prefix)}, {ids.format(p=prefix)});"
+    )
+
+
+def _delete(rowid, prefix):
+    return f'DELETE FROM "{SEARCH_TABLE}" WHERE rowid = {rowid.format(p=prefix)};'
+
+
+def _triggers(table, columns, rowid, member_id, names, ids):
+    name = table.lower()
+    return {
+        f"{name}_search_ai": (
+            f'CREATE TRIGGER IF NOT EXISTS "{name}_search_ai" AFTER INSERT ON "{table}" '
+            f"BEGIN {_insert(rowid, member_id, names, ids, 'new')} END"
+        ),
+        f"{name}_search_au": (
+            f'CREATE TRIGGER IF NOT EXISTS "{name}_search_au" AFTER UPDATE OF {columns} ON "{table}" '
+            f"BEGIN {_delete(rowid, 'old')} {_insert(rowid, member_id, names, ids, 'new')} END"
+        ),
+        f"{name}_search_ad": (
+            f'CREATE TRIGGER IF NOT EXISTS "{name}_search_ad" AFTER DELETE ON "{table}" '
+            f"BEGIN {_delete(rowid, 'old')} END"
+        ),
+    }
+
+
+TRIGGERS = {
+    **_triggers("Survey_member", MEMBER_COLUMNS, "{p}.id * 2", "{p}.id", MEMBER_NAMES, MEMBER_IDS),
+    **_triggers(
+        "Survey_membernamevariant", VARIANT_COLUMNS,
+        "{p}.id * 2 + 1", "{p}.member_id", VARIANT_NAMES, VARIANT_IDS,
+    ),
+}
+
+
+# ---------------------------------------
+# INDEX MAINTENANCE (SQLite)
+# ---------------------------------------
+@lru_cache(maxsize=None)
+def _sqlite_has_trigram_fts():
+    if sqlite3.sqlite_version_info < TRIGRAM_SQLITE_VERSION:
+        return False
+    with closing(sqlite3.connect(":memory:")) as conn:
+        return bool(conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+
+def fts_available(using=connection):
+    return using.vendor == "sqlite" and _sqlite_has_trigram_fts()
+
+
+def install(using=connection):
+    """Create the FTS table and triggers if missing; refill it when anything was."""
+    if not fts_available(using):
+        return False
+
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s)"
+            % ", ".join(["%s"] * (len(TRIGGERS) + 1)),
+            [SEARCH_TABLE, *TRIGGERS],
+        )
+        present = {row[0] for row in cursor.fetchall()}
+        if len(present) == len(TRIGGERS) + 1:
+            return False
+
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{SEARCH_TABLE}" '
+            "USING fts5(member_id UNINDEXED, names, ids, tokenize='trigram')"
+        )
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+    rebuild(using)
+    return True
+
+
+def rebuild(using=connection):
+    """Refill the FTS table from Member and MemberNameVariant in two statements."""
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{SEARCH_TABLE}"')
+        cursor.execute(
+            f'INSERT INTO "{SEARCH_TABLE}"(rowid, member_id, names, ids) '
+            f'SELECT m.id * 2, m.id, {MEMBER_NAMES.format(p="m")}, {MEMBER_IDS.format(p="m")} '
+            'FROM "Survey_member" m'
+        )
+        cursor.execute(
+            f'INSERT INTO "{SEARCH_TABLE}"(rowid, member_id, names, ids) '
+            f'SELECT v.id * 2 + 1, v.member_id, {VARIANT_NAMES.format(p="v")}, '
+            f'{VARIANT_IDS.format(p="v")} FROM "Survey_membernamevariant" v'
+        )
+
+
+# ---------------------------------------
+# QUERY
+# ---------------------------------------
+def search_terms(q):
+    """Whitespace-separated terms of ``q``."""
+    return (q or "").split()
+
+
+def fts_query(terms):
+    # every term quoted: a substring that must appear, FTS syntax escaped
+    return " ".join('"%s"' % term.replace('"', '""') for term in terms)
+
+
+def ranked_member_ids(q, limit=SEARCH_MAX_RESULTS):
+    """Ids of the best matching members, best first (every term must match)."""
+    terms = search_terms(q)
+    if not terms:
+        return []
+
+    # a short term has no trigram to match on, so it takes the icontains path
+    if fts_available() and min(len(term) for term in terms) >= MIN_TERM_LENGTH:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT member_id FROM "{SEARCH_TABLE}" WHERE "{SEARCH_TABLE}" MATCH %s '
+                "GROUP BY member_id ORDER BY MIN(rank), member_id LIMIT %s",
+                [fts_query(terms), limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    members = Member.objects.all()
+    for term in terms:
+        members = members.filter(
+            Q(m_name_en__icontains=term) | Q(m_name_ml__icontains=term)
+            | Q(guardian_en__icontains=term) | Q(guardian_ml__icontains=term)
+            | Q(voter_id_number__in=[term, term.upper()]) | Q(epic_id__in=[term, term.upper()])
+            | Exists(MemberNameVariant.objects.filter(
+                Q(normalized_name__icontains=term.lower()) | Q(name_ml__icontains=term),
+                member=OuterRef("pk"),
+            ))
+        )
+
+    if connection.vendor == "postgresql":
+        members = members.annotate(score=Func(
+            F("m_name_en"), Value(q), function="similarity", output_field=FloatField()
+        )).order_by("-score", "id")
+    else:
+        members = members.order_by("id")
+    return list(members.values_list("id", flat=True)[:limit])
@@ -1,10 +1,14 @@
 from rest_framework import serializers
+from . import counters, guardians, ingest, jobs, rollups
+from .bulk import BulkListSerializer, sync_children
+from .sparse import SparseFieldsMixin
 from .models import (
-    Family, House, Member, User, MadrasaDetails, MemberEducation,WardDetails,Cluster,MemberNameVariant
+    Family, House, Member, User, MadrasaDetails, MemberEducation,WardDetails,Cluster,MemberNameVariant,
+    ImportJob,
 )
 
 # ------------------ User ------------------
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     department = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     phone_no = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     password = serializers.CharField(write_only=True, required=False, allow_blank=True)
@@ -37,13 +41,13 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 # ------------------ Family ------------------
-class FamilySerializer(serializers.ModelSerializer):
+class FamilySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Family
         fields = ["id", "family_name_en", "family_name_ml", "h_no", "sub"]
 
 
-class ClusterHouseSerializer(serializers.ModelSerializer):
+class ClusterHouseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     family_name_en = serializers.CharField(source="family.family_name_en", read_only=True)
     family_name_ml = serializers.CharField(source="family.family_name_ml", read_only=True)
     h_no = serializers.CharField(source="family.h_no", read_only=True)
@@ -60,22 +64,31 @@ class ClusterHouseSerializer(serializers.ModelSerializer):
         ]
 
 
-class ClusterSerializer(serializers.ModelSerializer):
-    houses = ClusterHouseSerializer(source="house_set", many=True, read_only=True)
+class ClusterSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Cluster
+        fields = ["id", "name_english", "name_malayalam"]
+
+
+class ClusterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # ✅ Annotated by ClusterViewSet; houses are paged at /clusters/{id}/houses/
+    house_count = serializers.IntegerField(read_only=True)
+    family_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Cluster
-        fields = ["id", "name_english", "name_malayalam", "houses"]
+        fields = ["id", "name_english", "name_malayalam", "house_count", "family_count"]
 
 # ------------------ House ------------------
 # ------------------ House ------------------
-class HouseSerializer(serializers.ModelSerializer):
+class HouseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     family_name_en = serializers.CharField(source="family.family_name_en", read_only=True)
     family_name_ml = serializers.CharField(source="family.family_name_ml", read_only=True)
     h_no = serializers.CharField(source="family.h_no", read_only=True)
     sub = serializers.CharField(source="family.sub", read_only=True)
 
-    cluster = ClusterSerializer(read_only=True)
+    # ✅ id/name only, never the cluster's other houses
+    cluster = ClusterSummarySerializer(read_only=True)
     cluster_id = serializers.PrimaryKeyRelatedField(
         queryset=Cluster.objects.all(),
         source="cluster",
@@ -91,25 +104,22 @@ class HouseSerializer(serializers.ModelSerializer):
         allow_null=True
     )
 
-    # ✅ Corrected fields
-    total_voters = serializers.SerializerMethodField()
-    total_members = serializers.SerializerMethodField()
-
     class Meta:
         model = House
         fields = "__all__"
+        # ✅ Maintained by Survey/counters.py, never written by clients
+        read_only_fields = ["total_members", "total_voters"]
+        list_serializer_class = BulkListSerializer
 
-    def get_total_voters(self, obj):
-        # ✅ Members filtered through family
-        return obj.family.members.filter(election_id=True).count()
-
-    def get_total_members(self, obj):
-        # ✅ All family members
-        return obj.family.members.count()
+    def bulk_written(self, objs, created):
+        # new houses, or houses moved to another family, take the family totals
+        counters.recount_houses(house_ids=[house.pk for house in objs])
+        if not created:
+            rollups.members_moved(Member.objects.filter(house__in=objs))
 
 
 # ------------------ Madrasa Details ------------------
-class MadrasaDetailsSerializer(serializers.ModelSerializer):
+class MadrasaDetailsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MadrasaDetails
         fields = "__all__"
@@ -117,7 +127,7 @@ class MadrasaDetailsSerializer(serializers.ModelSerializer):
 
 # ------------------ Member Education ------------------
 # ------------------ Member Education ------------------
-class MemberEducationSerializer(serializers.ModelSerializer):
+class MemberEducationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     education = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     education_status = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     education_stream = serializers.CharField(required=False, allow_blank=True, allow_null=True)
@@ -127,7 +137,7 @@ class MemberEducationSerializer(serializers.ModelSerializer):
         fields = ['id', 'education', 'education_status', 'education_stream']
 
 
-class MemberNameVariantSerializer(serializers.ModelSerializer):
+class MemberNameVariantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MemberNameVariant
         fields = ["id", "name_en", "name_ml", "is_primary"]
@@ -135,7 +145,7 @@ class MemberNameVariantSerializer(serializers.ModelSerializer):
 
 
 # ------------------ Member ------------------
-class MemberSerializer(serializers.ModelSerializer):
+class MemberSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     display_name_en = serializers.CharField(read_only=True)
     display_name_ml = serializers.CharField(read_only=True)
@@ -162,7 +172,7 @@ class MemberSerializer(serializers.ModelSerializer):
 
     # 🔥 🔥 THIS IS THE FIX 🔥 🔥
     house = HouseSerializer(read_only=True)
-    house_id = serializers.IntegerField(source="house.id", read_only=True)
+    house_id = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Member
@@ -170,6 +180,17 @@ class MemberSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             "family": {"required": False, "allow_null": True},
         }
+        list_serializer_class = BulkListSerializer
+
+    # ✅ educations are paired with existing rows by level on bulk writes
+    bulk_nested = {"educations": ("member", "education")}
+
+    def bulk_written(self, objs, created):
+        with counters.deferred_house_counts(), rollups.deferred_rollups(), guardians.deferred_links():
+            for member in objs:
+                counters.member_saved(member, created)
+                rollups.member_written(member)
+                guardians.member_written(member, created)
 
     def create(self, validated_data):
         educations_data = validated_data.pop("educations", [])
@@ -182,19 +203,44 @@ class MemberSerializer(serializers.ModelSerializer):
         return member
 
     def update(self, instance, validated_data):
-        educations_data = validated_data.pop("educations", [])
+        educations_data = validated_data.pop("educations", None)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
 
-        instance.educations.all().delete()
-        for edu_data in educations_data:
-            if any(edu_data.values()):
-                MemberEducation.objects.create(member=instance, **edu_data)
+        # Only touch educations that were sent, and only the rows that changed
+        if educations_data is not None:
+            sync_children(MemberEducation, "member", "education", {
+                instance.pk: [edu for edu in educations_data if any(edu.values())],
+            })
         return instance
 
     
-class WardDetailsSerializer(serializers.ModelSerializer):
+class MemberListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    List rows: Member's own columns plus flat family info. Nested objects
+    come back only on ?expand=house,educations,name_variants,madrasa_details.
+    """
+    family_name_en = serializers.CharField(source="family.family_name_en", read_only=True)
+    family_name_ml = serializers.CharField(source="family.family_name_ml", read_only=True)
+    h_no = serializers.CharField(source="family.h_no", read_only=True)
+    sub = serializers.CharField(source="family.sub", read_only=True)
+    house_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Member
+        fields = "__all__"
+
+    def get_expandable_fields(self):
+        return {
+            "house": HouseSerializer(read_only=True),
+            "educations": MemberEducationSerializer(many=True, read_only=True),
+            "name_variants": MemberNameVariantSerializer(many=True, read_only=True),
+            "madrasa_details": MadrasaDetailsSerializer(read_only=True),
+        }
+
+
+class WardDetailsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = WardDetails
         fields = '__all__'
@@ -207,3 +253,31 @@ class WardDetailsSerializer(serializers.ModelSerializer):
 
 
 
+
+
+# ------------------ IMPORT JOBS ------------------
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Upload with kind + file; reads add the job's progress (Survey/jobs.py)."""
+
+    chunk_size = serializers.IntegerField(min_value=100, max_value=20000, required=False)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id", "kind", "file", "status", "chunk_size", "total_rows", "error",
+            "created_at", "started_at", "finished_at", "heartbeat_at",
+        ]
+        read_only_fields = [
+            "status", "total_rows", "error", "created_at", "started_at", "finished_at",
+            "heartbeat_at",
+        ]
+
+    def validate_file(self, file):
+        if ingest.extension(file.name) not in ingest.SUPPORTED:
+            raise serializers.ValidationError(
+                f"Upload a sheet: {', '.join(ingest.SUPPORTED)}."
+            )
+        return file
+
+    def to_representation(self, instance):
+        return {**super().to_representation(instance), **jobs.progress(instance)}
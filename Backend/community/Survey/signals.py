@@ -1,18 +1,85 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Member, House
+from .models import Member, House, Family, MemberEducation, MemberNameVariant
+from . import counters, guardians, rollups, sync
+from .reports import invalidate_reports
 
-@receiver([post_save, post_delete], sender=Member)
-def update_house_member_count(sender, instance, **kwargs):
-    # 🛑 family already deleted or null
-    if not instance.family_id:
+
+@receiver(post_save, sender=Member)
+def update_house_member_count(sender, instance, created, raw=False, **kwargs):
+    # 🛑 fixtures load raw rows, counters are rebuilt with recount_houses
+    if raw:
+        return
+    counters.member_saved(instance, created)
+    rollups.member_written(instance)
+    guardians.member_written(instance, created)
+
+
+@receiver(post_delete, sender=Member)
+def release_house_member_count(sender, instance, **kwargs):
+    counters.member_deleted(instance)
+    rollups.member_removed(instance)
+    guardians.member_removed(instance)
+
+
+@receiver(pre_delete, sender=Member)
+def remember_member_aliases(sender, instance, **kwargs):
+    guardians.member_removing(instance)
+
+
+@receiver(post_save, sender=MemberNameVariant)
+def relink_alias_namers(sender, instance, raw=False, **kwargs):
+    # an alias can make its member someone's guardian
+    if raw:
         return
+    guardians.mark_dirty(named_ids={instance.member_id})
 
-    try:
-        family = instance.family
-    except Exception:
+
+@receiver(post_delete, sender=MemberNameVariant)
+def relink_former_alias_namers(sender, instance, origin=None, **kwargs):
+    # ...or stop doing so. Aliases deleted with their member are left to member_removed
+    if origin is not instance and getattr(origin, "model", None) is not MemberNameVariant:
         return
+    guardians.mark_dirty(named_ids={instance.member_id}, keys={instance.normalized_name})
+
 
-    # Family might have multiple houses
-    for house in family.houses.all():
-        house.update_counts()
+@receiver(post_save, sender=House)
+def init_house_member_count(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # A new house (or one moved to another family) starts from the family's totals
+    if raw:
+        return
+    if created or update_fields is None or "family" in update_fields:
+        counters.recount_houses(house_ids=[instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Member)
+@receiver([post_save, post_delete], sender=Family)
+@receiver([post_save, post_delete], sender=House)
+@receiver([post_save, post_delete], sender=MemberEducation)
+def expire_cached_reports(sender, **kwargs):
+    invalidate_reports()
+
+
+@receiver(post_delete, sender=Family)
+@receiver(post_delete, sender=House)
+@receiver(post_delete, sender=Member)
+@receiver(post_delete, sender=MemberEducation)
+@receiver(post_delete, sender=MemberNameVariant)
+def tombstone_synced_row(sender, instance, **kwargs):
+    # 🪦 offline clients learn about deletions from /api/sync/
+    sync.record_deletion(instance)
+
+
+@receiver(post_save, sender=Family)
+def refresh_family_rollups(sender, instance, created, raw=False, **kwargs):
+    # the family's cluster counts for members whose house has none
+    if raw or created:
+        return
+    rollups.members_moved(instance.members.all())
+
+
+@receiver(post_save, sender=House)
+def refresh_house_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    rollups.members_moved(Member.objects.filter(house=instance))
@@ -0,0 +1,136 @@
+"""
+Sparse fieldsets: ?fields=a,b and ?expand=x,y on GET requests.
+
+Serializers mix in SparseFieldsMixin to drop unrequested fields and add
+expandable nested ones. ViewSets mix in SparseFieldsViewSetMixin to use a
+compact serializer for lists and to derive the queryset's only() /
+select_related / prefetch plan from the fields that will be rendered.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def param_list(request, name):
+    if request is None:
+        return []
+    raw = request.query_params.get(name, "")
+    return [part.strip() for part in raw.split(",") if part.strip()]
+
+
+def is_read(request):
+    return request is not None and request.method in SAFE_METHODS
+
+
+class SparseFieldsMixin:
+    """
+    ``get_expandable_fields()`` returns {name: field} added on ?expand=name.
+    ``?fields=`` then keeps only the listed names (``id`` is always kept).
+    Only the top-level serializer of a GET request is affected.
+    """
+
+    def get_expandable_fields(self):
+        return {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if not is_read(request):
+            return
+
+        expandable = self.get_expandable_fields()
+        for name in param_list(request, "expand"):
+            if name in expandable:
+                self.fields[name] = expandable[name]
+
+        wanted = set(param_list(request, "fields"))
+        if wanted:
+            for name in list(self.fields):
+                if name not in wanted and name != "id":
+                    self.fields.pop(name)
+
+
+def columns_for(fields, model):
+    """
+    ``only()`` lookups and forward relations to join for the readable
+    ``fields``, or None when that can't be known (a SerializerMethodField, a
+    model property, a nested serializer that no related plan covers).
+    """
+    opts = model._meta
+    columns = {opts.pk.attname}
+    joins = set()
+
+    for field in fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*" or isinstance(field, serializers.SerializerMethodField):
+            return None
+
+        head, _, rest = field.source.partition(".")
+        try:
+            model_field = opts.get_field(head)
+        except FieldDoesNotExist:
+            if hasattr(model, head):
+                return None
+            continue  # missing attribute: DRF leaves the field out anyway
+
+        if not model_field.concrete or isinstance(field, serializers.BaseSerializer) or "." in rest:
+            return None
+
+        columns.add(model_field.attname)
+        if rest:
+            columns.add(f"{head}__{rest}")
+            joins.add(head)
+
+    return columns, joins
+
+
+class SparseFieldsViewSetMixin:
+    """
+    ``list_serializer_class``: compact serializer used for ``list_actions``.
+    ``related_plan``: {field name: callable(queryset) → queryset} applied
+    only when that field is rendered. Plans for forward relations should
+    use Prefetch so they combine with the derived only().
+    """
+
+    list_serializer_class = None
+    list_actions = ("list",)
+    related_plan = {}
+
+    def get_serializer_class(self):
+        if self.action in self.list_actions and self.list_serializer_class is not None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not is_read(self.request):
+            return queryset
+
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        fields = serializer.fields
+        opts = queryset.model._meta
+
+        extra_columns = set()
+        for name, plan in self.related_plan.items():
+            if name not in fields:
+                continue
+            queryset = plan(queryset)
+            try:
+                related = opts.get_field(fields[name].source.split(".")[0])
+            except FieldDoesNotExist:
+                continue
+            if related.concrete:
+                extra_columns.add(related.attname)
+
+        loaded = columns_for(
+            {n: f for n, f in fields.items() if n not in self.related_plan},
+            queryset.model,
+        )
+        if loaded is None:
+            return queryset
+
+        columns, joins = loaded
+        if joins:
+            queryset = queryset.select_related(*joins)
+        return queryset.only(*columns, *extra_columns)
@@ -0,0 +1,112 @@
+"""
+Delta sync behind /api/sync/.
+
+Every Revisioned row (and every SyncTombstone) is ordered by the key
+(revision, stream, id). A sync token is the key of the last row a client
+received; the next pull returns the rows after it, so a big batch written
+under one revision can still be split across pages.
+"""
+import heapq
+
+from rest_framework.exceptions import ValidationError
+
+from .models import (
+    Family, House, Member, MemberEducation, MemberNameVariant, SyncTombstone, next_revision
+)
+
+# stream name → model; the position is the stream's place in the sync key
+SYNC_MODELS = {
+    "families": Family,
+    "houses": House,
+    "members": Member,
+    "educations": MemberEducation,
+    "name_variants": MemberNameVariant,
+}
+STREAMS = [*SYNC_MODELS, "deleted"]
+STREAM_NAMES = {model: name for name, model in SYNC_MODELS.items()}
+
+SYNC_LIMIT = 1000
+SYNC_MAX_LIMIT = 5000
+
+
+def parse_token(since):
+    """
+    ``"<revision>.<stream>.<id>"`` as returned in ``next``, or a bare
+    revision meaning everything after it. Empty → start from scratch.
+    """
+    if not since:
+        return (-1, -1, -1)
+    try:
+        parts = [int(part) for part in since.split(".")]
+    except ValueError:
+        parts = []
+    if len(parts) == 1:
+        return (parts[0], len(STREAMS), 0)
+    if len(parts) != 3:
+        raise ValidationError({"since": "Not a sync token."})
+    return tuple(parts)
+
+
+def format_token(key):
+    return ".".join(str(part) for part in key)
+
+
+def after(queryset, stream, key):
+    """Rows of ``stream`` whose (revision, stream, id) comes after ``key``."""
+    revision, after_stream, after_id = key
+    if stream > after_stream:
+        queryset = queryset.filter(revision__gte=revision)
+    elif stream < after_stream:
+        queryset = queryset.filter(revision__gt=revision)
+    else:
+        queryset = queryset.filter(revision__gt=revision) | queryset.filter(
+            revision=revision, id__gt=after_id
+        )
+    return queryset.order_by("revision", "id")
+
+
+def stream_rows(stream, key, limit):
+    name = STREAMS[stream]
+    if name == "deleted":
+        rows = after(SyncTombstone.objects.all(), stream, key).values(
+            "id", "revision", "model", "object_id"
+        )
+    else:
+        model = SYNC_MODELS[name]
+        columns = [field.attname for field in model._meta.concrete_fields]
+        rows = after(model.objects.all(), stream, key).values(*columns)
+    return [((row["revision"], stream, row["id"]), name, row) for row in rows[:limit]]
+
+
+def changes(since=None, limit=SYNC_LIMIT):
+    """
+    {"changes": {stream: [row, ...]}, "deleted": {stream: [id, ...]},
+    "next": token, "more": bool} for at most ``limit`` rows after ``since``.
+    """
+    key = parse_token(since)
+    merged = heapq.merge(*(stream_rows(i, key, limit + 1) for i in range(len(STREAMS))))
+
+    result = {"changes": {name: [] for name in SYNC_MODELS}, "deleted": {name: [] for name in SYNC_MODELS}}
+    last, more = key, False
+    for count, (row_key, name, row) in enumerate(merged):
+        if count == limit:
+            more = True
+            break
+        if name == "deleted":
+            result["deleted"][row["model"]].append(row["object_id"])
+        else:
+            result["changes"][name].append(row)
+        last = row_key
+
+    result["next"] = format_token(last) if last != key else (since or "")
+    result["more"] = more
+    return result
+
+
+def record_deletion(instance):
+    """Tombstone a deleted row (runs inside the delete's transaction)."""
+    SyncTombstone.objects.create(
+        model=STREAM_NAMES[type(instance)],
+        object_id=instance.pk,
+        revision=next_revision(),
+    )
@@ -1,3 +1,1586 @@
+import os
+
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import (
+    Cluster, Family, House, Member, MemberEducation, MemberHouse, MemberNameVariant,
+    GuardianLink, MadrasaDetails, MemberRollup, WardDetails,
+)
+from . import rollups
+
+
+def make_family(n_members, h_no, cluster=None):
+    family = Family.objects.create(family_name_en=f"Family {h_no}", h_no=str(h_no), sub="")
+    house = House.objects.create(
+        owner_en=f"Owner {h_no}", family=family, cluster=cluster, road_access_type="Road"
+    )
+    for i in range(n_members):
+        member = Member.objects.create(
+            family=family, house=house, m_name_en=f"Member {h_no}-{i}",
+            m_age=20 + i, election_id=i % 2 == 0,
+        )
+        MemberNameVariant.objects.create(
+            member=member, name_en=member.m_name_en, normalized_name=f"member {h_no} {i}",
+            member_name_en=member.m_name_en, is_primary=True,
+        )
+        MemberEducation.objects.create(member=member, education="10th")
+        MadrasaDetails.objects.create(member=member, studied=True)
+    return family, house
+
+
+class MemberListQueryBudgetTests(TestCase):
+    BUDGET = 8
+
+    def setUp(self):
+        self.client = APIClient()
+        self.cluster = Cluster.objects.create(name_english="North")
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_page_cost_is_constant(self):
+        make_family(3, 1, self.cluster)
+        small, _ = self.count_queries("/api/members/?page_size=50")
+
+        for h_no in range(2, 12):
+            make_family(5, h_no, self.cluster)
+        large, _ = self.count_queries("/api/members/?page_size=50")
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.BUDGET)
+
+    def test_plain_list_is_paged_and_capped(self):
+        from unittest import mock
+
+        from .pagination import MemberCursorPagination
+
+        for h_no in range(1, 4):
+            make_family(2, h_no, self.cluster)
+        with mock.patch.multiple(MemberCursorPagination, page_size=2, max_page_size=4):
+            _, data = self.count_queries("/api/members/")
+            self.assertEqual(len(data["results"]), 2)
+            self.assertIsNotNone(data["next"])
+            _, data = self.count_queries("/api/members/?page_size=100000")
+            self.assertEqual(len(data["results"]), 4)
+
+    def test_cursor_walks_every_member_once(self):
+        for h_no in range(1, 5):
+            make_family(3, h_no, self.cluster)
+
+        seen = []
+        url = "/api/members/?page_size=5"
+        while url:
+            response = self.client.get(url)
+            body = response.json()
+            seen.extend(m["id"] for m in body["results"])
+            url = body["next"]
+
+        self.assertEqual(seen, sorted(Member.objects.values_list("id", flat=True)))
+
+    def test_expanded_page_cost_is_constant(self):
+        url = "/api/members/?page_size=50&expand=house,educations,name_variants,madrasa_details"
+        make_family(3, 1, self.cluster)
+        small, _ = self.count_queries(url)
+
+        for h_no in range(2, 12):
+            make_family(5, h_no, self.cluster)
+        large, _ = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.BUDGET)
+
+    def test_expanded_house_carries_stored_counts(self):
+        make_family(4, 1, self.cluster)
+        _, data = self.count_queries("/api/members/?page_size=10&expand=house")
+        house = data["results"][0]["house"]
+        self.assertEqual(house["total_members"], 4)
+        self.assertEqual(house["total_voters"], 2)
+
+
+class HouseCounterTests(TestCase):
+    def setUp(self):
+        self.family, self.house = make_family(0, 1)
+        self.other_family, self.other_house = make_family(0, 2)
+
+    def totals(self, house):
+        house.refresh_from_db()
+        return house.total_members, house.total_voters
+
+    def test_create_update_delete_adjust_counts(self):
+        voter = Member.objects.create(family=self.family, election_id=True)
+        Member.objects.create(family=self.family, election_id=False)
+        self.assertEqual(self.totals(self.house), (2, 1))
+
+        voter.election_id = False
+        voter.save()
+        self.assertEqual(self.totals(self.house), (2, 0))
+
+        voter.family = self.other_family
+        voter.election_id = True
+        voter.save()
+        self.assertEqual(self.totals(self.house), (1, 0))
+        self.assertEqual(self.totals(self.other_house), (1, 1))
+
+        voter.delete()
+        self.assertEqual(self.totals(self.other_house), (0, 0))
+
+    def test_new_house_starts_from_family_totals(self):
+        Member.objects.create(family=self.family, election_id=True)
+        house = House.objects.create(owner_en="Second", family=self.family, road_access_type="Road")
+        self.assertEqual(self.totals(house), (1, 1))
+
+    def test_deferred_block_writes_once(self):
+        from .counters import deferred_house_counts
+
+        with CaptureQueriesContext(connection) as ctx:
+            with deferred_house_counts():
+                for _ in range(5):
+                    Member.objects.create(family=self.family, election_id=True)
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "Survey_house"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.totals(self.house), (5, 5))
+
+    def test_deferred_block_discards_on_error(self):
+        from .counters import deferred_house_counts
+
+        with self.assertRaises(RuntimeError):
+            with deferred_house_counts():
+                Member.objects.create(family=self.family, election_id=True)
+                raise RuntimeError
+        self.assertEqual(self.totals(self.house), (0, 0))
+
+    def test_recount_repairs_drift(self):
+        from .counters import recount_houses
+
+        Member.objects.create(family=self.family, election_id=True)
+        House.objects.update(total_members=40, total_voters=7)
+        recount_houses()
+        self.assertEqual(self.totals(self.house), (1, 1))
+        self.assertEqual(self.totals(self.other_house), (0, 0))
+
+
+class ImportMembersTests(TestCase):
+    def write_sheet(self, rows):
+        import tempfile
+
+        import pandas as pd
+
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        pd.DataFrame(rows).to_excel(path, index=False)
+        return path
+
+    def test_import_links_guardians(self):
+        path = self.write_sheet([
+            {"Cluster": "North", "House No": "7", "Family Name": "Puthiya",
+             "Name(EN)": "Abdul Rahman", "Age": "60"},
+            {"Cluster": "North", "House No": "7", "Family Name": "Puthiya",
+             "Name(EN)": "Sana", "Age": "8", "Guardian's Name(EN)": "Abdul Rahman"},
+        ])
+        from django.core.management import call_command
+
+        call_command("import_members", path, stdout=open(os.devnull, "w"))
+
+        sana = Member.objects.get(m_name_en="Sana")
+        self.assertEqual(sana.guardian_link.guardian.m_name_en, "Abdul Rahman")
+
+    def test_bulk_import_resolves_duplicates_in_memory(self):
+        from django.core.management import call_command
+
+        path = self.write_sheet([
+            {"Cluster": "North", "House No": "12/A", "Family Name": "Puthiya",
+             "Name(EN)": "Abdul Rahman", "Age": "45", "Voter ID": "KL001",
+             "Education": "10th, +2", "Date of Birth": "01/02/1980"},
+            {"Cluster": "North", "House No": "12/A", "Family Name": "Puthiya",
+             "Name(EN)": "Abdul Rahiman", "Age": "45", "Voter ID": "KL001"},
+            {"Cluster": "North", "House No": "12/A", "Family Name": "Puthiya",
+             "Name(EN)": "Fathima", "Age": "40"},
+        ])
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("import_members", path, stdout=open(os.devnull, "w"))
+        # + 6 for the guardian relink, + 7 for the late revision swap
+        self.assertLess(len(ctx.captured_queries), 37)
+
+        family = Family.objects.get(h_no="12", sub="A")
+        self.assertEqual(family.cluster.name_english, "North")
+        self.assertEqual(family.members.count(), 2)
+
+        rahman = Member.objects.get(voter_id_number="KL001")
+        self.assertTrue(rahman.election_id)
+        self.assertEqual(str(rahman.date_of_birth), "1980-02-01")
+        self.assertEqual(
+            sorted(rahman.name_variants.values_list("normalized_name", "is_primary")),
+            [("abdul rahiman", False), ("abdul rahman", True)],
+        )
+        self.assertEqual(
+            sorted(rahman.educations.values_list("education", flat=True)), ["+2", "10th"]
+        )
+
+        house = House.objects.create(owner_en="Owner", family=family, road_access_type="Road")
+        house.refresh_from_db()
+        self.assertEqual((house.total_members, house.total_voters), (2, 1))
+
+        # re-running matches KL001 by id and Fathima by name within family/age,
+        # and every name is already known: no alias is created or counted
+        import io
+
+        variants = MemberNameVariant.objects.count()
+        out = io.StringIO()
+        call_command("import_members", path, stdout=out)
+        self.assertEqual(family.members.count(), 2)
+        self.assertEqual(MemberNameVariant.objects.count(), variants)
+        self.assertIn("Aliases: 0 |", out.getvalue())
+
+
+class MemberIdentityIndexTests(TestCase):
+    def test_lookup_by_any_identifier_within_scope(self):
+        from .identity import MemberIdentityIndex
+
+        family, _ = make_family(0, 1)
+        a = Member.objects.create(family=family, voter_id_number="V1", epic_id="E1", polling_booth_no="7")
+        b = Member.objects.create(family=family, roll_no_sec="55", polling_booth_no="8")
+
+        with self.assertNumQueries(1):
+            index = MemberIdentityIndex.from_queryset(scope=lambda m: m.polling_booth_no)
+        self.assertEqual(len(index), 2)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(index.get("voter_id_number", "V1", scope="7"), a)
+            self.assertIsNone(index.get("voter_id_number", "V1", scope="8"))
+            self.assertEqual(index.find("8", epic_id="X", roll_no_sec="55"), b)
+            self.assertIsNone(index.find("8"))
+
+
+class NameMatchingTests(TestCase):
+    def test_normalize_and_phonetic_key(self):
+        from .names import normalize_name, phonetic_key
+
+        self.assertEqual(normalize_name("  K. P. Abdul  Rahman "), "abdul rahman")
+        self.assertEqual(phonetic_key("abdul rahiman"), phonetic_key("abdul rahman"))
+        self.assertEqual(phonetic_key("sainaba"), phonetic_key("zainaba"))
+
+    def test_index_matches_within_scope_only(self):
+        from .names import NameIndex
+
+        index = NameIndex()
+        index.add("m1", "Muhammed Ashraf", scope=1)
+        index.add("m2", "Abdul Razak", scope=1)
+
+        self.assertEqual(index.match("Mohammed Ashraf", scope=1)[0], "m1")
+        self.assertIsNone(index.match("Mohammed Ashraf", scope=2))
+        self.assertIsNone(index.match("Abdul Rahman", scope=1))
+
+    def test_import_folds_spelling_variants_into_aliases(self):
+        from django.core.management import call_command
+
+        path = ImportMembersTests.write_sheet(self, [
+            {"House No": "3", "Name(EN)": "Muhammed Ashraf", "Age": "30", "Voter ID": "KL9"},
+            {"House No": "3", "Name(EN)": "Mohammed Ashraf", "Age": "30"},
+            {"House No": "3", "Name(EN)": "Mohammed Ashraf", "Age": "30", "Voter ID": "KL10"},
+        ])
+        call_command("import_members", path, stdout=open(os.devnull, "w"))
+
+        self.assertEqual(Member.objects.count(), 2)
+        ashraf = Member.objects.get(voter_id_number="KL9")
+        self.assertEqual(ashraf.name_variants.count(), 2)
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches["reports"].clear()
+
+    def get_report(self, url="/api/report/"):
+        import json
+
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))
+        return json.loads(response.content)
+
+    def test_report_totals_and_houses(self):
+        cluster = Cluster.objects.create(name_english="North")
+        make_family(3, 1, cluster)
+        make_family(2, 2)
+        Member.objects.filter(family__h_no="1").update(polling_booth_no="7")
+
+        with self.assertNumQueries(4):
+            data = self.get_report()
+        self.assertEqual(
+            (data["house_count"], data["member_count"], data["family_count"]), (2, 5, 2)
+        )
+        self.assertEqual([h["member_count"] for h in data["houses"]], [3, 2])
+        self.assertEqual(data["education_summary"][0], {
+            "name": "10th", "passed": 0, "failed": 0, "studying": 0,
+        })
+
+        data = self.get_report(f"/api/report/?cluster={cluster.id}")
+        self.assertEqual((data["member_count"], len(data["houses"])), (3, 1))
+
+        data = self.get_report("/api/report/?booth=7")
+        self.assertEqual([h["h_no"] for h in data["houses"]], ["1"])
+
+    def test_families_without_h_no_count_as_one_house(self):
+        from .reports import ReportFilters, family_totals
+
+        make_family(1, 1)
+        for name in ("First", "Second"):
+            Family.objects.create(family_name_en=name, h_no=None, sub=name)
+        totals = family_totals(ReportFilters())
+        self.assertEqual(totals, {
+            "house_count": Family.objects.values("h_no").distinct().count(), "family_count": 3,
+        })
+        self.assertEqual(totals["house_count"], 2)
+
+    def test_invalid_filter_is_rejected(self):
+        self.assertEqual(APIClient().get("/api/report/?cluster=x").status_code, 400)
+
+    def test_etag_and_cache_skip_queries_until_data_changes(self):
+        make_family(2, 1)
+        first = APIClient().get("/api/report/")
+        self.assertTrue(first.streaming)
+        b"".join(first.streaming_content)
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            response = APIClient().get("/api/report/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.assertNumQueries(0):
+            data = APIClient().get("/api/report/").json()
+        self.assertEqual(data["member_count"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.create(family=Family.objects.get(), m_name_en="New")
+        response = APIClient().get("/api/report/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(self.get_report()["member_count"], 3)
+
+    def test_invalidation_from_another_process_reaches_this_one(self):
+        import subprocess
+        import sys
+        import tempfile
+
+        from .reports import current_version
+
+        make_family(2, 1)
+        first = APIClient().get("/api/report/")
+        b"".join(first.streaming_content)
+        version = current_version()
+
+        # as an import command run next to the web server would (on a scratch
+        # database: connecting runs the WAL pragma, which rewrites the file)
+        with tempfile.TemporaryDirectory() as scratch:
+            subprocess.run(
+                [sys.executable, "manage.py", "shell", "-c",
+                 "from Survey.reports import invalidate_reports; invalidate_reports()"],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                env={**os.environ, "DB_ENGINE": "sqlite", "DB_NAME": os.path.join(scratch, "db.sqlite3")},
+                check=True, capture_output=True,
+            )
+        self.assertNotEqual(current_version(), version)
+        response = APIClient().get("/api/report/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        family, _ = make_family(3, 1)
+        Member.objects.filter(family=family).update(polling_booth_no="7", m_name_ml="മുഹമ്മദ്")
+
+    def test_csv_export_streams_requested_columns(self):
+        response = APIClient().get(
+            "/api/members/voters/export/?booth=7&columns=m_name_en,m_name_ml,family__h_no"
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(len(lines), 3)  # header + 2 voters
+        self.assertTrue(lines[1].endswith(",മുഹമ്മദ്,1"))
+
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+        import io
+
+        response = APIClient().get("/api/members/export/?type=xlsx")
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+        self.assertEqual(sheet.max_row, 4)
+
+    def test_unknown_column_is_rejected(self):
+        response = APIClient().get("/api/members/export/?columns=password")
+        self.assertEqual(response.status_code, 400)
+
+    def test_voters_list_is_not_shadowed_by_member_detail(self):
+        response = APIClient().get("/api/members/voters/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.cluster = Cluster.objects.create(name_english="North")
+        make_family(2, 1, self.cluster)
+
+    def test_fields_limit_output_and_loaded_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = APIClient().get("/api/members/?fields=m_name_en,h_no").json()["results"]
+        self.assertEqual(set(data[0]), {"id", "m_name_en", "h_no"})
+
+        member_sql = ctx.captured_queries[0]["sql"]
+        self.assertIn('"Survey_family"."h_no"', member_sql)
+        self.assertNotIn("monthly_income", member_sql)
+
+    def test_list_is_compact_and_retrieve_is_nested(self):
+        row = APIClient().get("/api/members/").json()["results"][0]
+        self.assertNotIn("educations", row)
+        self.assertEqual(row["house"], row["house_id"])
+
+        detail = APIClient().get(f"/api/members/{row['id']}/").json()
+        self.assertEqual(detail["house"]["cluster"]["name_english"], "North")
+        self.assertEqual(len(detail["educations"]), 1)
+
+    def test_house_list_embeds_cluster_summary_only(self):
+        house = APIClient().get("/api/houses/").json()[0]
+        self.assertEqual(house["cluster"], {
+            "id": self.cluster.id, "name_english": "North", "name_malayalam": None,
+        })
+        self.assertEqual(house["total_members"], 2)
+
+
+class ClusterHousesTests(TestCase):
+    def setUp(self):
+        self.cluster = Cluster.objects.create(name_english="North")
+        for h_no in range(1, 6):
+            make_family(1, h_no, self.cluster)
+        make_family(1, 99)  # outside the cluster
+
+    def test_cluster_list_has_counts_not_houses(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = APIClient().get("/api/clusters/").json()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(data, [{
+            "id": self.cluster.id, "name_english": "North", "name_malayalam": None,
+            "house_count": 5, "family_count": 5,
+        }])
+
+    def test_cluster_houses_are_cursor_paginated(self):
+        url = f"/api/clusters/{self.cluster.id}/houses/?page_size=2"
+        seen = []
+        while url:
+            page = APIClient().get(url).json()
+            self.assertLessEqual(len(page["results"]), 2)
+            seen += [house["h_no"] for house in page["results"]]
+            url = page["next"]
+        self.assertEqual(sorted(seen), ["1", "2", "3", "4", "5"])
+
+
+class AssignHouseTests(TestCase):
+    def setUp(self):
+        self.family, self.old_house = make_family(4, 1)
+        self.new_house = House.objects.create(
+            owner_en="Split", family=self.family, road_access_type="Road"
+        )
+        self.ids = list(self.family.members.values_list("id", flat=True))
+        MemberHouse.objects.bulk_create(
+            [MemberHouse(member_id=i, house=self.old_house) for i in self.ids]
+        )
+
+    def test_bulk_move_is_set_based(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = APIClient().put(
+                "/api/members/assign-house/",
+                {"house_id": self.new_house.id, "member_ids": self.ids},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        # + 4 for the rollup recompute of the members' booth, + 6 for the guardian relink
+        self.assertLessEqual(len(ctx.captured_queries), 20)
+
+        self.assertEqual(Member.objects.filter(house=self.new_house).count(), 4)
+        active = MemberHouse.objects.filter(is_active=True)
+        self.assertEqual(set(active.values_list("house_id", flat=True)), {self.new_house.id})
+        self.assertEqual(MemberHouse.objects.filter(is_active=False).count(), 4)
+
+        self.new_house.refresh_from_db()
+        self.assertEqual((self.new_house.total_members, self.new_house.total_voters), (4, 2))
+
+    def test_moving_back_reactivates_old_link(self):
+        client = APIClient()
+        member_id = self.ids[0]
+        for house in (self.new_house, self.old_house):
+            client.put(f"/api/members/{member_id}/assign-house/", {"house_id": house.id}, format="json")
+
+        links = dict(MemberHouse.objects.filter(member_id=member_id).values_list("house_id", "is_active"))
+        self.assertEqual(links, {self.old_house.id: True, self.new_house.id: False})
+
+    def test_unknown_member_moves_nobody(self):
+        response = APIClient().put(
+            "/api/members/assign-house/",
+            {"house_id": self.new_house.id, "member_ids": self.ids + [999999]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["member_ids"], [999999])
+        self.assertFalse(Member.objects.filter(house=self.new_house).exists())
+
+
+class BulkWriteTests(TestCase):
+    def setUp(self):
+        self.family, self.house = make_family(2, 1)
+        self.members = list(self.family.members.order_by("id"))
+
+    def test_bulk_create_members_with_educations(self):
+        items = [
+            {"m_name_en": f"New {i}", "family_id": self.family.id, "election_id": True,
+             "educations": [{"education": "UG", "education_status": "passed"}]}
+            for i in range(3)
+        ]
+        response = APIClient().post("/api/members/bulk/", items, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["count"], 3)
+
+        self.assertEqual(MemberEducation.objects.filter(education="UG").count(), 3)
+        self.house.refresh_from_db()
+        self.assertEqual((self.house.total_members, self.house.total_voters), (5, 4))
+
+    def test_bulk_patch_diffs_educations(self):
+        first, second = self.members
+        kept = first.educations.get()
+        items = [
+            {"id": first.id, "educations": [
+                {"education": "10th", "education_status": "passed"},
+                {"education": "+2"},
+            ]},
+            {"id": second.id, "election_id": True},
+        ]
+        response = APIClient().patch("/api/members/bulk/", items, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        # the 10th row is updated in place, not re-inserted
+        kept.refresh_from_db()
+        self.assertEqual(kept.education_status, "passed")
+        self.assertEqual(
+            sorted(first.educations.values_list("education", flat=True)), ["+2", "10th"]
+        )
+        self.assertEqual(second.educations.count(), 1)
+
+        self.house.refresh_from_db()
+        self.assertEqual(self.house.total_voters, 2)
+
+    def test_invalid_item_rolls_back_whole_batch(self):
+        items = [
+            {"id": self.members[0].id, "m_name_en": "Renamed"},
+            {"id": 999999, "m_name_en": "Ghost"},
+            {"id": self.members[1].id, "m_age": "old"},
+        ]
+        response = APIClient().patch("/api/members/bulk/", items, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["errors"]), {"1", "2"})
+        self.assertFalse(Member.objects.filter(m_name_en="Renamed").exists())
+
+    def test_bulk_create_houses_takes_family_totals(self):
+        response = APIClient().post(
+            "/api/houses/bulk/",
+            [{"owner_en": "Annex", "family": self.family.id, "road_access_type": "Road"}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        annex = House.objects.get(pk=response.json()["ids"][0])
+        self.assertEqual(annex.total_members, 2)
+
+
+class SyncTests(TestCase):
+    def pull(self, since="", limit=None):
+        url = f"/api/sync/?since={since}" + (f"&limit={limit}" if limit else "")
+        return APIClient().get(url).json()
+
+    def test_bulk_import_takes_one_revision_in_a_short_final_step(self):
+        import tempfile
+
+        import pandas as pd
+        from django.core.management import call_command
+
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        pd.DataFrame([
+            {"Cluster": "North", "House No": str(h), "Family Name": f"F{h}", "Name(EN)": f"Member {h}", "Age": "30"}
+            for h in range(5)
+        ]).to_excel(path, index=False)
+        make_family(1, 99)
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("import_members", path, stdout=open(os.devnull, "w"))
+        sql = [q["sql"] for q in ctx.captured_queries]
+        taken = [i for i, q in enumerate(sql) if q.startswith('UPDATE "Survey_synccounter"')]
+        self.assertEqual(len(taken), 1)
+        # after the counter is locked: read it back, swap it in, commit
+        for q in sql[taken[0] + 1:]:
+            self.assertTrue(
+                q.startswith('SELECT "Survey_synccounter"')
+                or ' SET "revision" = ' in q
+                or q.startswith(("RELEASE", "SAVEPOINT")),
+                q,
+            )
+        imported = Member.objects.filter(m_name_en__startswith="Member ").exclude(family__h_no="99")
+        revisions = set(imported.values_list("revision", flat=True))
+        revisions |= set(Family.objects.exclude(h_no="99").values_list("revision", flat=True))
+        self.assertEqual(len(revisions), 1)
+        self.assertGreater(revisions.pop(), 0)
+
+    def test_initial_pull_then_deltas_only(self):
+        family, house = make_family(2, 1)
+        first = self.pull()
+        self.assertEqual(len(first["changes"]["members"]), 2)
+        self.assertEqual(len(first["changes"]["houses"]), 1)
+        self.assertFalse(first["more"])
+
+        # nothing new → empty delta, same token
+        again = self.pull(first["next"])
+        self.assertEqual(again["next"], first["next"])
+        self.assertFalse(any(again["changes"].values()))
+
+        member = family.members.order_by("id").first()
+        member.m_name_en = "Renamed"
+        member.save(update_fields=["m_name_en"])
+        family.members.order_by("id").last().delete()
+
+        delta = self.pull(first["next"])
+        self.assertEqual([m["m_name_en"] for m in delta["changes"]["members"]], ["Renamed"])
+        self.assertEqual(len(delta["deleted"]["members"]), 1)
+        # the counters moved the house totals, so the house is re-sent too
+        self.assertEqual(delta["changes"]["houses"][0]["total_members"], 1)
+
+    def test_pages_split_a_single_revision_batch(self):
+        make_family(1, 1)
+        token = self.pull()["next"]
+        items = [{"m_name_en": f"Bulk {i}"} for i in range(5)]
+        APIClient().post("/api/members/bulk/", items, format="json")
+
+        names = []
+        while True:
+            page = self.pull(token, limit=2)
+            names += [m["m_name_en"] for m in page["changes"]["members"]]
+            token = page["next"]
+            if not page["more"]:
+                break
+        self.assertEqual(names, [f"Bulk {i}" for i in range(5)])
+
+    def test_gzip_and_bad_token(self):
+        make_family(3, 1)
+        response = APIClient().get("/api/sync/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(APIClient().get("/api/sync/?since=a.b").status_code, 400)
+
+
+class MemberSearchTests(TestCase):
+    def setUp(self):
+        family, _ = make_family(0, 1)
+        self.abdul = Member.objects.create(
+            family=family, m_name_en="Abdul Rahman", m_name_ml="അബ്ദുൽ റഹ്മാൻ",
+            guardian_en="Moideen", voter_id_number="KLA1234567",
+        )
+        self.fathima = Member.objects.create(family=family, m_name_en="Fathima")
+        MemberNameVariant.objects.create(
+            member=self.fathima, name_en="Pathumma", normalized_name="pathumma",
+            member_name_en="Fathima",
+        )
+
+    def search(self, q):
+        response = APIClient().get("/api/members/search/", {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_names_guardians_ids_and_malayalam(self):
+        self.assertEqual(self.search("rahman"), [self.abdul.id])
+        self.assertEqual(self.search("abdul moideen"), [self.abdul.id])
+        self.assertEqual(self.search("kla1234"), [self.abdul.id])
+        self.assertEqual(self.search("റഹ്മാ"), [self.abdul.id])
+        self.assertEqual(self.search("rahman fathima"), [])
+
+    def test_index_follows_writes_including_bulk_ones(self):
+        self.assertEqual(self.search("pathumma"), [self.fathima.id])
+
+        Member.objects.filter(pk=self.abdul.pk).update(m_name_en="Abdul Kareem")
+        self.assertEqual(self.search("kareem"), [self.abdul.id])
+        self.assertEqual(self.search("rahman"), [])
+        self.fathima.delete()
+        self.assertEqual(self.search("pathumma"), [])
+
+    def test_short_terms_fall_back_to_icontains(self):
+        self.assertEqual(self.search("ab"), [self.abdul.id])
+        self.assertEqual(self.search("abdul ra"), [self.abdul.id])
+        self.assertEqual(self.search("fathima ra"), [])
+
+    def test_empty_query_is_rejected(self):
+        response = APIClient().get("/api/members/search/", {"q": " "})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sqlite_without_the_trigram_tokenizer_uses_icontains(self):
+        from unittest import mock
+
+        from . import search
+
+        search._sqlite_has_trigram_fts.cache_clear()
+        self.addCleanup(search._sqlite_has_trigram_fts.cache_clear)
+        with mock.patch.object(search.sqlite3, "sqlite_version_info", (3, 33, 0)):
+            self.assertFalse(search.fts_available())
+            self.assertFalse(search.install())
+            self.assertEqual(self.search("rahman"), [self.abdul.id])
+            self.assertEqual(self.search("pathumma"), [self.fathima.id])
+
+
+class RollupTests(TestCase):
+    def summary(self, query=""):
+        return APIClient().get(f"/api/rollups/{query}")
+
+    def booth(self, no):
+        return MemberRollup.objects.filter(polling_booth_no=no).aggregate(
+            members=Sum("members"), voters=Sum("voters")
+        )
+
+    def test_member_writes_keep_booth_rows_current(self):
+        family, house = make_family(3, 1)
+        Member.objects.filter(family=family).update(polling_booth_no="7")
+        rollups.rebuild()
+        self.assertEqual(self.booth("7"), {"members": 3, "voters": 2})
+
+        member = family.members.order_by("id").first()
+        member.polling_booth_no = "8"
+        member.m_gender = "Female"
+        member.save()
+        self.assertEqual(self.booth("7"), {"members": 2, "voters": 1})
+        self.assertEqual(MemberRollup.objects.get(polling_booth_no="8").female, 1)
+
+        member.delete()
+        self.assertFalse(MemberRollup.objects.filter(polling_booth_no="8").exists())
+        self.assertEqual(self.summary().json()["members"], 2)
+
+    def test_moving_a_house_moves_its_members_cluster(self):
+        north, south = Cluster.objects.create(name_english="North"), Cluster.objects.create(name_english="South")
+        _, house = make_family(2, 1, cluster=north)
+        house.cluster = south
+        house.save()
+        self.assertEqual(
+            list(MemberRollup.objects.values_list("cluster_id", "members")), [(south.id, 2)]
+        )
+
+    def test_group_by_and_filters(self):
+        cluster = Cluster.objects.create(name_english="North")
+        make_family(2, 1, cluster=cluster)
+        make_family(3, 2)
+
+        rows = self.summary("?group_by=cluster").json()
+        self.assertEqual([(r["cluster_id"], r["members"]) for r in rows], [(0, 3), (cluster.id, 2)])
+        total = self.summary(f"?cluster={cluster.id}").json()
+        self.assertEqual((total["members"], total["age_18_25"]), (2, 2))
+
+    def test_bad_params_are_rejected(self):
+        self.assertEqual(self.summary("?group_by=street").status_code, 400)
+        self.assertEqual(self.summary("?cluster=abc").status_code, 400)
+
+    def test_deferred_block_recomputes_once(self):
+        family, _ = make_family(3, 1)
+        members = list(family.members.all())
+        with CaptureQueriesContext(connection) as queries, rollups.deferred_rollups():
+            for member in members:
+                member.polling_booth_no = "9"
+                member.save()
+        deletes = [q for q in queries if 'DELETE FROM "Survey_memberrollup"' in q["sql"]]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(self.booth("9")["members"], 3)
+
+
+class MemberFilterTests(TestCase):
+    def setUp(self):
+        self.family, _ = make_family(4, 1)
+        members = list(self.family.members.order_by("id"))
+        for member, gender, booth in zip(members, ["M", "F", "F", "M"], ["1", "1", "2", "2"]):
+            member.m_gender, member.polling_booth_no = gender, booth
+            member.save()
+        self.members = members
+        MemberEducation.objects.create(member=members[1], education="Degree")
+
+    def ids(self, query):
+        response = APIClient().get(f"/api/members/{query}")
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_filters_combine(self):
+        m = self.members
+        self.assertEqual(self.ids("?gender=F"), [m[1].id, m[2].id])
+        self.assertEqual(self.ids("?gender=F&booth=2"), [m[2].id])
+        self.assertEqual(self.ids("?age_min=21&age_max=22"), [m[1].id, m[2].id])
+        self.assertEqual(self.ids("?voter=true"), [m[0].id, m[2].id])
+        self.assertEqual(self.ids("?booth=1,2&gender=M"), [m[0].id, m[3].id])
+
+    def test_related_filters_do_not_repeat_members(self):
+        # members[1] has two education rows, one of them matches
+        self.assertEqual(self.ids("?education=10th,Degree&gender=F"), [self.members[1].id, self.members[2].id])
+        self.assertEqual(self.ids("?education=Degree"), [self.members[1].id])
+        self.assertEqual(len(self.ids("?madrasa=true")), 4)
+
+    def test_ordering(self):
+        self.assertEqual(self.ids("?ordering=-m_age"), [m.id for m in reversed(self.members)])
+        paged = APIClient().get("/api/members/?ordering=-m_age&page_size=2").json()
+        self.assertEqual([r["id"] for r in paged["results"]], [self.members[3].id, self.members[2].id])
+
+    def test_cursor_pages_through_nulls_and_ties(self):
+        # 3 members without an age, 2 sharing one
+        for name, age in [("A", None), ("B", 22), ("C", None), ("D", None)]:
+            Member.objects.create(family=self.family, m_name_en=name, m_age=age)
+        expected = [
+            m.id for m in sorted(
+                Member.objects.all(), key=lambda m: (m.m_age is None, -(m.m_age or 0), m.id)
+            )
+        ]
+
+        for query in ("ordering=-m_age", "ordering=m_age", "ordering=date_of_birth"):
+            pages, url = [], f"/api/members/?{query}&page_size=2"
+            while url:
+                body = APIClient().get(url).json()
+                pages.append(body)
+                url = body["next"]
+            seen = [row["id"] for page in pages for row in page["results"]]
+            self.assertEqual(len(seen), 8)
+            self.assertEqual(len(set(seen)), 8)
+            if query == "ordering=-m_age":
+                self.assertEqual(seen, expected)
+
+            # and back again from the last page
+            back, url = [], pages[-1]["previous"]
+            while url:
+                body = APIClient().get(url).json()
+                back = [row["id"] for row in body["results"]] + back
+                url = body["previous"]
+            self.assertEqual(back + [row["id"] for row in pages[-1]["results"]], seen)
+
+    def test_bad_values_are_rejected(self):
+        response = APIClient().get("/api/members/?age_min=old&voter=maybe")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"age_min", "voter"})
+
+    def test_facets_follow_the_filters_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = APIClient().get("/api/members/facets/?facets=gender,booth,age&voter=true").json()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["facets"]["gender"], [{"value": "F", "count": 1}, {"value": "M", "count": 1}])
+        self.assertEqual(data["facets"]["booth"], [{"value": "1", "count": 1}, {"value": "2", "count": 1}])
+        self.assertEqual(data["facets"]["age"], [{"value": "age_18_25", "count": 2}])
+
+        response = APIClient().get("/api/members/facets/?facets=shoe_size")
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        from django.test import override_settings
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(__import__("shutil").rmtree, media, True)
+        settings = override_settings(MEDIA_ROOT=media, IMPORT_JOB_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def sheet(self, rows):
+        import io
+
+        import pandas as pd
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        buffer = io.BytesIO()
+        pd.DataFrame(rows).to_excel(buffer, index=False)
+        return SimpleUploadedFile("sheet.xlsx", buffer.getvalue())
+
+    def member_rows(self, houses):
+        return [
+            {"Cluster": "North", "House No": str(h), "Family Name": f"Family {h}",
+             "Name(EN)": f"Person {h}-{i}", "Age": str(30 + i), "Voter ID": f"V{h}{i}"}
+            for h in range(houses) for i in range(2)
+        ]
+
+    def test_partition_keeps_key_groups_together(self):
+        from .jobs import partition
+
+        chunks = partition(["a", "b", "a", "", "c", "b"], 2)
+        self.assertEqual(chunks, [[0, 2], [1, 5], [3, 4]])
+
+    def test_house_rows_of_a_family_share_a_chunk_across_clusters(self):
+        import pandas as pd
+
+        from .jobs import KINDS, partition
+
+        df = pd.DataFrame([
+            {"Family Name": "Puthiya", "Cluster": "North"},
+            {"Family Name": "Other", "Cluster": "North"},
+            {"Family Name": "Puthiya", "Cluster": "South"},
+        ])
+        self.assertEqual(partition(list(KINDS["houses"].key(df)), 1), [[0, 2], [1]])
+
+    def test_upload_runs_the_job_and_reports_progress(self):
+        response = APIClient().post(
+            "/api/import-jobs/", {"kind": "members", "file": self.sheet(self.member_rows(3))},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        job = APIClient().get(f"/api/import-jobs/{response.json()['id']}/").json()
+        self.assertEqual(job["status"], "done")
+        self.assertEqual((job["total_rows"], job["rows_done"]), (6, 6))
+        self.assertEqual(job["summary"], {"members": 6, "aliases": 0, "families": 3})
+        self.assertEqual(Cluster.objects.filter(name_english="North").count(), 1)
+
+    def test_failed_chunk_resumes_without_duplicates(self):
+        from unittest import mock
+
+        from . import jobs
+        from .models import ImportJob
+
+        job = ImportJob.objects.create(kind="members", file=self.sheet(self.member_rows(3)), chunk_size=2)
+        process = jobs.KINDS["members"].process
+
+        def flaky(df, skip=None):
+            if "1" in set(df["House No"]):
+                raise RuntimeError("worker died")
+            return process(df, skip=skip)
+
+        with mock.patch.object(jobs.KINDS["members"], "process", flaky):
+            jobs.run(job, workers=0)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(Member.objects.count(), 4)
+        self.assertEqual(jobs.progress(job)["chunks_failed"], 1)
+
+        response = APIClient().post(f"/api/import-jobs/{job.pk}/resume/")
+        self.assertEqual(response.json()["status"], "done")
+        self.assertEqual(Member.objects.count(), 6)
+        self.assertEqual(Family.objects.count(), 3)
+
+    def test_running_job_without_a_heartbeat_can_be_resumed(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from .models import ImportJob
+
+        job = ImportJob.objects.create(
+            kind="members", file=self.sheet(self.member_rows(2)), status="running",
+            started_at=timezone.now(), heartbeat_at=timezone.now(),
+        )
+        response = APIClient().post(f"/api/import-jobs/{job.pk}/resume/")
+        self.assertEqual(response.status_code, 409)
+
+        # the driver died: nothing has beaten for longer than IMPORT_JOB_STALE_AFTER
+        ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        response = APIClient().post(f"/api/import-jobs/{job.pk}/resume/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "done")
+        self.assertEqual(Member.objects.count(), 4)
+
+    def test_booth_fix_plans_conflicts_over_the_whole_sheet(self):
+        from .models import ImportJob
+        from . import jobs
+
+        family, _ = make_family(1, 1)
+        Member.objects.filter(family=family).update(voter_id_number="V0", roll_no_sec="R0", polling_booth_no="1")
+        job = ImportJob.objects.create(kind="booths", chunk_size=1, file=self.sheet([
+            {"Voter ID": "V0", "Polling Booth No": "7"},
+            {"Roll No": "R0", "Polling Booth No": "8"},
+        ]))
+        jobs.run(job, workers=0)
+
+        self.assertEqual(job.chunks.count(), 1)
+        self.assertEqual(jobs.progress(job)["summary"]["conflicts"], 2)
+        self.assertEqual(Member.objects.get(voter_id_number="V0").polling_booth_no, "1")
+
+    def test_skipped_rows_keep_their_sheet_row_number(self):
+        family, _ = make_family(1, 1)
+        Member.objects.filter(family=family).update(polling_booth_no="5", roll_no_sec="R1")
+        response = APIClient().post("/api/import-jobs/", {"kind": "sir", "file": self.sheet([
+            {"Polling Booth No": "5", "Roll No-SEC": "R1", "Name(EN)": "Renamed"},
+            {"Polling Booth No": "", "Roll No-SEC": "R2", "Name(EN)": "Nobody"},
+            {"Polling Booth No": "5", "Roll No-SEC": "R9", "Name(EN)": "Nobody"},
+        ])}, format="multipart")
+
+        job = response.json()
+        self.assertEqual(job["summary"], {"updated": 1, "unchanged": 0, "aliases": 1, "skipped": 2})
+        self.assertEqual([e["row"] for e in job["errors"]], [3, 4])
+        self.assertEqual(Member.objects.get(roll_no_sec="R1").m_name_en, "Renamed")
+
+    def test_rejects_files_that_are_not_sheets(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        response = APIClient().post("/api/import-jobs/", {
+            "kind": "members", "file": SimpleUploadedFile("sheet.txt", b"a,b"),
+        }, format="multipart")
+        self.assertEqual(response.status_code, 400)
+
+
+class SirUpdateTests(TestCase):
+    def setUp(self):
+        self.family, _ = make_family(3, 1)
+        for i, member in enumerate(self.family.members.order_by("id")):
+            member.polling_booth_no, member.roll_no_sec = "5", f"R{i}"
+            member.guardian_en, member.election_id = "Father", False
+            member.save()
+
+    def write_sheet(self, rows):
+        import tempfile
+
+        import pandas as pd
+
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        pd.DataFrame(rows).to_excel(path, index=False)
+        return path
+
+    def rows(self):
+        return [
+            {"Polling Booth No": "5", "Roll No-SEC": "R0", "Name(EN)": "Renamed", "Epic ID": "E0"},
+            {"Polling Booth No": "5", "Roll No-SEC": "R1", "Guardian's Name(EN)": "Father"},
+            {"Polling Booth No": "5", "Roll No-SEC": "R2", "Guardian's Name(EN)": "Mother"},
+            {"Polling Booth No": "5", "Roll No-SEC": "R9", "Name(EN)": "Nobody"},
+        ]
+
+    def test_dry_run_reports_the_diff_and_writes_nothing(self):
+        import io
+
+        from django.core.management import call_command
+
+        before = list(Member.objects.order_by("id").values())
+        variants = MemberNameVariant.objects.count()
+        report = os.path.join(os.path.dirname(self.write_sheet([])), "sir-report.csv")
+        self.addCleanup(lambda: os.path.exists(report) and os.remove(report))
+
+        out = io.StringIO()
+        call_command("import_sir_excel", self.write_sheet(self.rows()), dry_run=True, report=report, stdout=out)
+
+        self.assertEqual(list(Member.objects.order_by("id").values()), before)
+        self.assertEqual(MemberNameVariant.objects.count(), variants)
+        self.assertIn("m_name_en: 'Member 1-0' → 'Renamed'", out.getvalue())
+        self.assertIn("Updated: 3 | Unchanged: 0 | Aliases: 2 | Skipped: 1", out.getvalue())
+        with open(report, encoding="utf-8") as f:
+            fields = [line.split(",")[3] for line in f.read().splitlines()[1:]]
+        self.assertEqual(sorted(fields), [
+            "election_id", "election_id", "election_id", "epic_id", "guardian_en", "m_name_en",
+        ])
+
+    def test_changes_are_written_in_bulk(self):
+        from .management.commands.import_sir_excel import apply_sir_rows, read_sheet
+
+        df = read_sheet(self.write_sheet(self.rows()), cache=False)
+        with CaptureQueriesContext(connection) as ctx:
+            result = apply_sir_rows(df)
+        self.assertEqual(result, {"updated": 3, "unchanged": 0, "aliases": 2, "skipped": 1})
+        updates = [
+            q["sql"] for q in ctx.captured_queries
+            if q["sql"].startswith('UPDATE "Survey_member"')
+            and not q["sql"].startswith('UPDATE "Survey_member" SET "revision"')
+        ]
+        # one statement per set of changed columns, never the untouched ones
+        self.assertEqual(len(updates), 3)
+        self.assertTrue(all('"m_age"' not in sql for sql in updates))
+        # + 6 for the guardian relink, + 7 for the late revision swap
+        self.assertLess(len(ctx.captured_queries), 33)
+
+        renamed = Member.objects.get(roll_no_sec="R0")
+        self.assertEqual((renamed.m_name_en, renamed.epic_id, renamed.election_id), ("Renamed", "E0", True))
+        self.assertEqual(Member.objects.get(roll_no_sec="R2").guardian_en, "Mother")
+        # the replaced guardian is kept; the old name already had its (primary) variant
+        guardian = MemberNameVariant.objects.get(member__roll_no_sec="R2", source="sir")
+        self.assertEqual((guardian.normalized_name, guardian.is_primary), ("father", False))
+        self.assertEqual(renamed.name_variants.filter(normalized_name="member 1 0").count(), 1)
+
+        # voter flags reach the house totals
+        house = House.objects.get(family=self.family)
+        self.assertEqual(house.total_voters, 3)
+
+        # a second run changes nothing and adds no aliases
+        variants = MemberNameVariant.objects.count()
+        self.assertEqual(apply_sir_rows(df), {"updated": 0, "unchanged": 3, "aliases": 0, "skipped": 1})
+        self.assertEqual(MemberNameVariant.objects.count(), variants)
+
+    def test_chunked_dry_run_sees_earlier_chunks(self):
+        import io
+
+        from django.core.management import call_command
+
+        # row 3 only matches through the Epic ID row 1 fills in
+        path = self.write_sheet([
+            {"Polling Booth No": "5", "Roll No-SEC": "R0", "Name(EN)": "Second", "Epic ID": "E0"},
+            {"Polling Booth No": "5", "Roll No-SEC": "R0", "Name(EN)": "Third"},
+            {"Polling Booth No": "5", "Epic ID": "E0", "Name(EN)": "Fourth"},
+        ])
+        summaries = []
+        for dry_run in (True, False):
+            out = io.StringIO()
+            call_command("import_sir_excel", path, chunk_rows=1, dry_run=dry_run, stdout=out)
+            summaries.append(out.getvalue().rsplit("|", 4)[1:])
+        self.assertEqual(summaries[0], summaries[1])
+        self.assertEqual(Member.objects.get(roll_no_sec="R0").m_name_en, "Fourth")
+
+    def test_reverted_name_keeps_no_alias(self):
+        import pandas as pd
+
+        from .management.commands.import_sir_excel import apply_sir_rows
+
+        df = pd.DataFrame([
+            {"Polling Booth No": "5", "Roll No-SEC": "R0", "Name(EN)": "Renamed"},
+            {"Polling Booth No": "5", "Roll No-SEC": "R0", "Name(EN)": "Member 1-0"},
+        ])
+        variants = MemberNameVariant.objects.count()
+        self.assertEqual(apply_sir_rows(df), {"updated": 1, "unchanged": 0, "aliases": 0, "skipped": 0})
+        self.assertEqual(MemberNameVariant.objects.count(), variants)
+        self.assertEqual(Member.objects.get(roll_no_sec="R0").m_name_en, "Member 1-0")
+
+
+class PostgresIndexMigrationTests(TestCase):
+    """
+    0015 / 0020 only run on Postgres, which this suite doesn't have: check
+    the DDL they would send, the way sqlmigrate would show it.
+    """
+
+    def statements(self, migration, function, vendor="postgresql"):
+        from importlib import import_module
+        from types import SimpleNamespace
+
+        sql = []
+        editor = SimpleNamespace(connection=SimpleNamespace(vendor=vendor), execute=sql.append)
+        getattr(import_module(f"Survey.migrations.{migration}"), function)(None, editor)
+        return sql
+
+    def indexed(self, statements):
+        """{index name: (table, indexed expression)} left by ``statements``, in order."""
+        import re
+
+        indexes = {}
+        for sql in statements:
+            created = re.match(r'CREATE INDEX IF NOT EXISTS "(\w+)" ON "(\w+)" USING gin \((.*)\)$', sql)
+            dropped = re.match(r'DROP INDEX IF EXISTS "(\w+)"$', sql)
+            if created:
+                indexes[created[1]] = (created[2], created[3])
+            elif dropped:
+                indexes.pop(dropped[1], None)
+        return indexes
+
+    def test_every_icontains_column_gets_an_upper_trigram_index(self):
+        forward = (
+            self.statements("0015_postgres_indexes", "create_indexes")
+            + self.statements("0020_search_trgm_indexes", "create_indexes")
+        )
+        self.assertEqual(forward[0], "CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        expressions = {
+            (table, expression) for table, expression in self.indexed(forward).values()
+            if expression.startswith("(UPPER(")
+        }
+        # the columns ranked_member_ids() filters with icontains (Postgres: UPPER(col::text) LIKE)
+        for table, column in [
+            ("Survey_member", "m_name_en"), ("Survey_member", "m_name_ml"),
+            ("Survey_member", "guardian_en"), ("Survey_member", "guardian_ml"),
+            ("Survey_membernamevariant", "normalized_name"), ("Survey_membernamevariant", "name_ml"),
+        ]:
+            self.assertIn((table, f"(UPPER({column}::text)) gin_trgm_ops"), expressions)
+        self.assertNotIn("variant_normalized_trgm", self.indexed(forward))
+
+    def test_0020_reverses_to_0015(self):
+        after_0015 = self.indexed(self.statements("0015_postgres_indexes", "create_indexes"))
+        round_trip = self.indexed(
+            self.statements("0015_postgres_indexes", "create_indexes")
+            + self.statements("0020_search_trgm_indexes", "create_indexes")
+            + self.statements("0020_search_trgm_indexes", "drop_indexes")
+        )
+        self.assertEqual(round_trip, after_0015)
+
+    def test_other_backends_send_nothing(self):
+        for migration in ("0015_postgres_indexes", "0020_search_trgm_indexes"):
+            for function in ("create_indexes", "drop_indexes"):
+                self.assertEqual(self.statements(migration, function, vendor="sqlite"), [])
+
+
+class FixPollingBoothTests(TestCase):
+    def setUp(self):
+        family, _ = make_family(4, 1)
+        self.members = list(family.members.order_by("id"))
+        for i, member in enumerate(self.members):
+            member.voter_id_number, member.roll_no_sec, member.polling_booth_no = f"V{i}", f"R{i}", "1"
+            member.save()
+
+    def test_booths_are_applied_set_based_with_a_report(self):
+        import pandas as pd
+
+        from .management.commands.fix_polling_booth import fix_booths
+
+        df = pd.DataFrame([
+            {"Voter ID": "V0", "Polling Booth No": "7"},
+            {"Voter ID": "V1", "Booth": 7.0},
+            {"Roll No": "R2", "Polling Booth No": "1"},
+            {"Voter ID": "V3", "Polling Booth No": "8"},
+            {"Roll No": "R3", "Polling Booth No": "9"},
+            {"Voter ID": "V9", "Polling Booth No": "7"},
+            {"Voter ID": "V0"},
+        ])
+        skipped = []
+        with CaptureQueriesContext(connection) as ctx:
+            result = fix_booths(df, skip=lambda index, reason: skipped.append((int(index) + 2, reason)))
+
+        self.assertEqual(result, {
+            "updated": 2, "unchanged": 1, "matched": 3, "unmatched": 1, "ambiguous": 0,
+            "conflicts": 2, "missing": 1,
+        })
+        self.assertEqual([row for row, _ in sorted(skipped)], [5, 6, 7, 8])
+        self.assertIn("Conflicting booths for the same member: 8, 9", dict(skipped)[5])
+
+        # the revision swap (late_revision) aside
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "Survey_member" SET "polling')]
+        self.assertEqual(len(updates), 1)
+        booths = dict(Member.objects.values_list("voter_id_number", "polling_booth_no"))
+        self.assertEqual(booths, {"V0": "7", "V1": "7", "V2": "1", "V3": "1"})
+
+        # the moved members are picked up by sync and the booth rollups
+        moved = Member.objects.get(voter_id_number="V0")
+        self.assertGreater(moved.revision, Member.objects.get(voter_id_number="V2").revision)
+        self.assertEqual(
+            MemberRollup.objects.filter(polling_booth_no="7").values_list("members", flat=True).get(), 2
+        )
+
+    def test_roll_no_shared_across_booths_is_skipped_as_ambiguous(self):
+        import pandas as pd
+
+        from .management.commands.fix_polling_booth import fix_booths
+
+        # the same SEC roll number in another booth of another constituency
+        other = self.members[3]
+        other.roll_no_sec, other.polling_booth_no = "R0", "4"
+        other.constituency = WardDetails.objects.create(constituency="Other", sub_district="Other")
+        other.save()
+
+        df = pd.DataFrame([
+            {"Roll No": "R0", "Polling Booth No": "7"},
+            {"Roll No": "R1", "Polling Booth No": "7"},
+        ])
+        skipped = []
+        result = fix_booths(df, skip=lambda index, reason: skipped.append((int(index) + 2, reason)))
+
+        self.assertEqual(result["ambiguous"], 1)
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(skipped, [(2, "Roll No R0 matches 2 members; use the Voter ID")])
+        booths = dict(Member.objects.values_list("voter_id_number", "polling_booth_no"))
+        self.assertEqual(booths, {"V0": "1", "V1": "7", "V2": "1", "V3": "4"})
+
+
+class HouseImportTests(TestCase):
+    def test_autocreated_families_expire_cached_reports(self):
+        import pandas as pd
+
+        from .management.commands.family_autocreate import create_families
+        from .reports import current_version
+
+        version = current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_families(pd.DataFrame([{"Family Name": "Puthiya"}]))
+        self.assertNotEqual(current_version(), version)
+
+    def test_families_and_houses_are_imported_in_batches(self):
+        import pandas as pd
+
+        from .management.commands.family_autocreate import create_families
+        from .management.commands.import_houses import import_house_rows
+
+        family, _ = make_family(2, 1)
+        Cluster.objects.create(name_english="North")
+        df = pd.DataFrame([
+            {"Family Name": family.family_name_en, "Cluster": "North", "Owner": "Ali", "House Number": "7 b"},
+            {"Family Name": "Puthiya", "Cluster": "South", "Owner": "Sara", "House Number": "8"},
+            {"Family Name": "Puthiya", "Cluster": "South", "Owner": "Nisa", "House Number": "8"},
+            {"Family Name": "Puthiya", "Cluster": "East"},
+            {"Family Name": None, "Cluster": "West", "Owner": "Nobody"},
+        ])
+
+        self.assertEqual(create_families(df), {"created": 1})
+        self.assertEqual(create_families(df), {"created": 0})
+
+        skipped = []
+        with CaptureQueriesContext(connection) as ctx:
+            result = import_house_rows(df, skip=lambda index, reason: skipped.append(index))
+        self.assertEqual(result, {"imported": 3, "clusters": 2})
+        self.assertEqual(skipped, [3, 4])
+        # + 7 for the late revision swap
+        self.assertLess(len(ctx.captured_queries), 27)
+
+        family.refresh_from_db()
+        self.assertEqual((family.h_no, family.sub), ("7", "B"))
+        self.assertEqual(Cluster.objects.get(name_english="North").name_malayalam, "North")
+        self.assertFalse(Cluster.objects.filter(name_english="West").exists())
+
+        house = House.objects.get(owner_en="Ali")
+        self.assertEqual((house.cluster.name_english, house.total_members, house.total_voters), ("North", 2, 1))
+        self.assertEqual(House.objects.filter(family__family_name_en="Puthiya", cluster__name_english="South").count(), 2)
+
+
+class HouseholdGraphTests(TestCase):
+    def setUp(self):
+        self.family = Family.objects.create(family_name_en="Puthiya", h_no="1", sub="")
+        self.home = House.objects.create(owner_en="Abdul", family=self.family, road_access_type="Road")
+        other = Family.objects.create(family_name_en="Rahim's", h_no="2", sub="")
+        self.new_home = House.objects.create(owner_en="Rahim", family=other, road_access_type="Road")
+
+        def member(name, age, guardian, family, house, **extra):
+            return Member.objects.create(
+                m_name_en=name, m_age=age, guardian_en=guardian, family=family, house=house, **extra
+            )
+
+        self.abdul = member("Abdul", 60, "Hassan", self.family, self.home)
+        self.fathima = member("Fathima", 55, "Abdul", self.family, self.home, g_relation="Husband")
+        self.rahim = member("Rahim", 30, "K. Abdul", other, self.new_home, original_house=self.home)
+        self.sana = member("Sana", 5, "Rahim", other, self.new_home)
+        MemberHouse.objects.create(member=self.rahim, house=self.home, is_active=False)
+        MemberHouse.objects.create(member=self.rahim, house=self.new_home, is_active=True)
+
+    def test_member_graph_follows_guardians_across_houses(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = APIClient().get(f"/api/members/{self.sana.pk}/household-graph/").json()
+        queries = len(ctx.captured_queries)
+
+        self.assertEqual(data["guardian_chain"], [self.rahim.pk, self.abdul.pk])
+        self.assertEqual(
+            sorted(m["id"] for m in data["members"]),
+            sorted([self.abdul.pk, self.fathima.pk, self.rahim.pk, self.sana.pk]),
+        )
+        self.assertEqual(sorted(h["id"] for h in data["houses"]), [self.home.pk, self.new_home.pk])
+        self.assertIn({"from": self.rahim.pk, "to": self.home.pk, "kind": "past_house"}, data["edges"])
+        self.assertIn({"from": self.rahim.pk, "to": self.home.pk, "kind": "original_house"}, data["edges"])
+        self.assertIn(
+            {"from": self.fathima.pk, "to": self.abdul.pk, "kind": "guardian", "relation": "Husband"},
+            data["edges"],
+        )
+
+        # a bigger household costs the same queries
+        for i in range(10):
+            Member.objects.create(m_name_en=f"Kid {i}", m_age=i, guardian_en="Fathima", family=self.family, house=self.home)
+        with CaptureQueriesContext(connection) as ctx:
+            APIClient().get(f"/api/members/{self.sana.pk}/household-graph/")
+        self.assertEqual(len(ctx.captured_queries), queries)
+
+    def test_family_tree_nests_members_under_guardians(self):
+        data = APIClient().get(f"/api/families/{self.family.pk}/tree/").json()
+
+        self.assertEqual(data["family"]["family_name_en"], "Puthiya")
+        [root] = data["tree"]
+        self.assertEqual(root["id"], self.abdul.pk)
+        self.assertEqual([c["id"] for c in root["children"]], [self.fathima.pk, self.rahim.pk])
+        self.assertEqual([c["id"] for c in root["children"][1]["children"]], [self.sana.pk])
+
+    def test_ambiguous_guardians_are_left_unresolved(self):
+        from .graph import family_household
+
+        twin = Member.objects.create(
+            m_name_en="Abdul", m_age=60, guardian_en="Hassan", family=self.family, house=self.home
+        )
+        household = family_household(self.family)
+        self.assertEqual(household.guardians[self.fathima.pk], (None, [self.abdul.pk, twin.pk]))
+        # the older Abdul wins over a younger namesake
+        twin.m_age = 20
+        twin.save()
+        self.assertEqual(family_household(self.family).guardians[self.fathima.pk], (self.abdul.pk, []))
+
+
+class GuardianLinkTests(TestCase):
+    def setUp(self):
+        self.family = Family.objects.create(family_name_en="Puthiya", h_no="1", sub="")
+        self.home = House.objects.create(owner_en="Abdul", family=self.family, road_access_type="Road")
+        other = Family.objects.create(family_name_en="Rahim's", h_no="2", sub="")
+        self.new_home = House.objects.create(owner_en="Rahim", family=other, road_access_type="Road")
+
+        self.abdul = Member.objects.create(
+            m_name_en="Abdul", m_age=60, guardian_en="Hassan", family=self.family, house=self.home
+        )
+        self.rahim = Member.objects.create(
+            m_name_en="Rahim", m_age=30, guardian_en="K. Abdul", family=other, house=self.new_home,
+            original_house=self.home,
+        )
+        self.sana = Member.objects.create(
+            m_name_en="Sana", m_age=5, guardian_en="Rahim", family=other, house=self.new_home
+        )
+
+    def guardian(self, member):
+        return GuardianLink.objects.get(member=member).guardian_id
+
+    def test_relink_binds_ids_in_batches(self):
+        import re
+        from unittest import mock
+
+        from . import guardians
+
+        heads = []
+        for h_no in range(3, 7):
+            family, _ = make_family(3, h_no)
+            members = list(family.members.order_by("id"))
+            for member in members[1:]:
+                member.guardian_en = members[0].m_name_en
+                member.save()
+            heads.append(members[0])
+
+        def links():
+            return sorted(GuardianLink.objects.values_list("member_id", "guardian_id", "candidates"))
+
+        self.assertEqual(GuardianLink.objects.filter(guardian__in=heads).count(), 8)
+
+        # renamed behind the signals' back, then relinked by hand
+        Member.objects.filter(pk__in=[m.pk for m in heads]).update(m_name_en="Renamed")
+        old_keys = {f"member {m.family.h_no} 0" for m in heads}
+        MemberNameVariant.objects.filter(member__in=heads).delete()
+        with mock.patch.object(guardians, "ID_BATCH", 2), CaptureQueriesContext(connection) as ctx:
+            guardians.relink(member_ids=[m.pk for m in heads], keys=old_keys)
+        relinked = links()
+
+        lists = [
+            ids.split(",") for q in ctx.captured_queries for ids in re.findall(r"IN \(([^()]*)\)", q["sql"])
+        ]
+        self.assertLessEqual(max(len(ids) for ids in lists), 2)
+        self.assertFalse(GuardianLink.objects.filter(guardian__in=heads).exists())
+        guardians.rebuild()
+        self.assertEqual(relinked, links())
+
+    def test_links_are_resolved_on_create(self):
+        # Rahim's original house is Abdul's
+        self.assertEqual(self.guardian(self.rahim), self.abdul.pk)
+        self.assertEqual(self.guardian(self.sana), self.rahim.pk)
+        # nobody nearby is called Hassan
+        link = GuardianLink.objects.get(member=self.abdul)
+        self.assertEqual((link.guardian_id, link.guardian_key), (None, "hassan"))
+
+    def test_renames_and_aliases_relink_wards(self):
+        self.rahim.m_name_en = "Raheem"
+        self.rahim.save()
+        self.assertIsNone(self.guardian(self.sana))
+
+        MemberNameVariant.objects.create(
+            member=self.rahim, name_en="Rahim", normalized_name="rahim", member_name_en="Raheem"
+        )
+        self.assertEqual(self.guardian(self.sana), self.rahim.pk)
+
+    def test_guardian_edits_and_deletes_relink(self):
+        self.sana.guardian_en = "Abdul"
+        self.sana.save()
+        # Abdul lives outside Sana's family and houses
+        self.assertIsNone(self.guardian(self.sana))
+        self.sana.guardian_en = "RAHIM"
+        self.sana.save()
+        self.assertEqual(self.guardian(self.sana), self.rahim.pk)
+
+        self.sana.guardian_en = ""
+        self.sana.save()
+        self.assertFalse(GuardianLink.objects.filter(member=self.sana).exists())
+
+        # the aliases go with the member, and the links naming it are redone
+        MemberNameVariant.objects.create(
+            member=self.abdul, name_en="Abdu", normalized_name="abdu", member_name_en="Abdul"
+        )
+        self.abdul.delete()
+        self.assertIsNone(self.guardian(self.rahim))
+        self.assertFalse(GuardianLink.objects.filter(member_id=self.abdul.pk).exists())
+
+    def test_unrelated_saves_relink_nothing(self):
+        member = Member.objects.get(pk=self.sana.pk)
+        member.religion = "Islam"
+        with CaptureQueriesContext(connection) as ctx:
+            member.save()
+        self.assertFalse(any("guardianlink" in q["sql"].lower() for q in ctx.captured_queries))
+
+    def test_moving_house_relinks_the_neighbourhoods(self):
+        from .households import assign_house
+
+        sana = Member.objects.create(m_name_en="Sana", m_age=8, guardian_en="Abdul", family=None)
+        self.assertIsNone(self.guardian(sana))
+        assign_house([sana.pk], self.home)
+        self.assertEqual(self.guardian(sana), self.abdul.pk)
+
+    def test_wards_endpoint_lists_who_names_the_member(self):
+        Member.objects.create(m_name_en="Salim", m_age=12, guardian_en="Rahim", family=self.rahim.family)
+        response = APIClient().get(f"/api/members/{self.rahim.pk}/wards/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m["m_name_en"] for m in response.json()], ["Salim", "Sana"])
+
+    def test_rebuild_matches_incremental_links(self):
+        from django.core.management import call_command
+
+        before = set(GuardianLink.objects.values_list("member_id", "guardian_id", "guardian_key"))
+        GuardianLink.objects.all().delete()
+        call_command("rebuild_guardian_links", stdout=open(os.devnull, "w"))
+        self.assertEqual(
+            set(GuardianLink.objects.values_list("member_id", "guardian_id", "guardian_key")), before
+        )
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        import pandas as pd
+
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(__import__("shutil").rmtree, self.dir, True)
+        self.df = pd.DataFrame({
+            " Voter ID ": ["V1", None, "V3", "V4", "V5"],
+            "Age": [30, 41, None, 19, 65],
+            "Unused": ["x"] * 5,
+        })
+        self.xlsx = os.path.join(self.dir, "sheet.xlsx")
+        self.df.to_excel(self.xlsx, index=False)
+
+    def test_projection_reads_only_the_listed_columns(self):
+        from .ingest import read_table
+
+        df = read_table(self.xlsx, ["Voter ID", "Age", "Missing"], dtype=str, cache=False)
+        self.assertEqual(list(df.columns), ["Voter ID", "Age"])
+        self.assertEqual(df["Age"].tolist()[:2], ["30", "41"])
+
+        csv = os.path.join(self.dir, "sheet.csv")
+        self.df.to_csv(csv, index=False)
+        self.assertEqual(list(read_table(csv, ["Age"], cache=False).columns), ["Age"])
+
+    def test_streamed_chunks_match_the_whole_table(self):
+        import pandas as pd
+
+        from .ingest import iter_chunks, read_table
+
+        whole = read_table(self.xlsx, ["Voter ID", "Age"], dtype=str, cache=False)
+        chunks = list(iter_chunks(self.xlsx, ["Voter ID", "Age"], rows=2, dtype=str))
+        self.assertEqual([len(c) for c in chunks], [2, 2, 1])
+        streamed = pd.concat(chunks)
+        self.assertEqual(streamed.index.tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(
+            streamed.astype(object).where(streamed.notna(), None).values.tolist(),
+            whole.astype(object).where(whole.notna(), None).values.tolist(),
+        )
+
+    def test_parsed_tables_are_cached_by_content(self):
+        from unittest import mock
+
+        from django.test import override_settings
+
+        from . import ingest
 
-# Create your tests here.
+        cache = os.path.join(self.dir, "cache")
+        with override_settings(INGEST_CACHE_DIR=cache, INGEST_CACHE_MIN_BYTES=0):
+            first = ingest.read_table(self.xlsx, ["Age"])
+            with mock.patch.object(ingest, "parse", wraps=ingest.parse) as parse:
+                again = ingest.read_table(self.xlsx, ["Age"])
+                parse.assert_not_called()
+                ingest.read_table(self.xlsx, ["Voter ID"])
+                parse.assert_called_once()
+        self.assertTrue(first.equals(again))
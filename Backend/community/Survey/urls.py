@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     FamilyViewSet, HouseViewSet, MemberViewSet, UserViewSet,MemberEducationViewSet,
     
-    report, CustomTokenObtainPairView,MadrasaDetailsViewSet,WardDetailsViewSet,ClusterViewSet,voters
+    report, CustomTokenObtainPairView,MadrasaDetailsViewSet,WardDetailsViewSet,ClusterViewSet,voters,
+    export_members, export_voters, sync_changes, rollup_summary, ImportJobViewSet
 )
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -16,13 +17,20 @@ router.register(r'madrasa-details', MadrasaDetailsViewSet)
 router.register(r'education', MemberEducationViewSet)
 router.register(r'wards', WardDetailsViewSet)
 router.register(r'clusters', ClusterViewSet)
+router.register(r'import-jobs', ImportJobViewSet)
 
 
 
 urlpatterns = [
+    # ⚠️ before the router, or members/<pk>/ swallows these
+    path('members/voters/', voters, name='voters-list'),
+    path('members/export/', export_members, name='members-export'),
+    path('members/voters/export/', export_voters, name='voters-export'),
+
     path('', include(router.urls)),
     path('report/', report, name='report'),
-    path('members/voters/', voters, name='voters-list'),
+    path('sync/', sync_changes, name='sync'),
+    path('rollups/', rollup_summary, name='rollups'),
     
    
 
@@ -1,7 +1,11 @@
 from rest_framework import viewsets
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Count, F, Prefetch
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.views import TokenObtainPairView
@@ -12,9 +16,19 @@ from Survey.models import (
 )
 from Survey.serializers import (
     FamilySerializer, HouseSerializer, MemberSerializer,
-    UserSerializer, MadrasaDetailsSerializer,MemberEducationSerializer,WardDetailsSerializer,ClusterSerializer
+    UserSerializer, MadrasaDetailsSerializer,MemberEducationSerializer,WardDetailsSerializer,ClusterSerializer,
+    ClusterHouseSerializer, MemberListSerializer
 )
-from Survey.models import MemberHouse
+from Survey.pagination import IdCursorPagination
+from Survey import graph
+from Survey.sparse import SparseFieldsViewSetMixin
+from Survey.bulk import BulkWriteViewSetMixin
+from Survey.models import next_revision
+from Survey.reports import (
+    ReportFilters, cached_report, caching, current_version, invalidate_reports, report_etag,
+    stream_report,
+)
+from Survey.rollups import members_moved
 
 
 User = get_user_model()
@@ -39,9 +53,17 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 
 
 
-class ClusterViewSet(viewsets.ModelViewSet):
-    queryset = Cluster.objects.prefetch_related("house_set__family").all()
+class ClusterViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
+    """
+    ✔ Clusters with house / family counts (one grouped query)
+    ✔ /clusters/{id}/houses/ → that cluster's houses, cursor-paginated
+    """
+    queryset = Cluster.objects.all()
     serializer_class = ClusterSerializer
+    related_plan = {
+        "house_count": lambda qs: qs.annotate(house_count=Count("house", distinct=True)),
+        "family_count": lambda qs: qs.annotate(family_count=Count("house__family", distinct=True)),
+    }
 
     def get_queryset(self):
         """
@@ -49,33 +71,73 @@ class ClusterViewSet(viewsets.ModelViewSet):
         """
         return super().get_queryset()
 
+    @action(detail=True, methods=["get"], url_path="houses")
+    def houses(self, request, pk=None):
+        cluster = self.get_object()
+        houses = House.objects.filter(cluster=cluster).select_related("family").only(
+            "id", "owner_en", "owner_ml",
+            "family__family_name_en", "family__family_name_ml", "family__h_no",
+        )
+
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(houses, request, view=self)
+        serializer = ClusterHouseSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 
 
 
 # ------------------ USER ------------------
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
-class WardDetailsViewSet(viewsets.ModelViewSet):
+class WardDetailsViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = WardDetails.objects.all().order_by('-created_at')
     serializer_class = WardDetailsSerializer
 
 
 
 # ------------------ FAMILY ------------------
-class FamilyViewSet(viewsets.ModelViewSet):
+class FamilyViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
+    """
+    ✔ /families/{id}/tree/ → members nested under their guardians
+    """
     queryset = Family.objects.all()
     serializer_class = FamilySerializer
 
+    @action(detail=True, methods=["get"])
+    def tree(self, request, pk=None):
+        """
+        The family's members (and anyone living / who lived in its houses)
+        nested under their resolved guardian, eldest first, with its houses.
+        """
+        family = get_object_or_404(
+            Family.objects.only("id", "family_name_en", "family_name_ml", "h_no", "sub"), pk=pk
+        )
+        self.check_object_permissions(request, family)
+        return Response({
+            "family": {
+                "id": family.id,
+                "family_name_en": family.family_name_en,
+                "family_name_ml": family.family_name_ml,
+                "h_no": family.h_no,
+                "sub": family.sub,
+            },
+            **graph.family_household(family).tree(),
+        })
+
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 # ------------------ HOUSE ------------------
 # ------------------ HOUSE ------------------
-class HouseViewSet(viewsets.ModelViewSet):
-    queryset = House.objects.select_related("family", "cluster").all()
+class HouseViewSet(BulkWriteViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
+    queryset = House.objects.all()
     serializer_class = HouseSerializer
+    related_plan = {
+        "cluster": lambda qs: qs.prefetch_related("cluster"),
+    }
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -104,7 +166,12 @@ class HouseViewSet(viewsets.ModelViewSet):
             )
 
         # Update all selected houses
-        updated = House.objects.filter(id__in=house_ids).update(cluster_id=cluster_id)
+        with transaction.atomic():
+            updated = House.objects.filter(id__in=house_ids).update(
+                cluster_id=cluster_id, revision=next_revision()
+            )
+            members_moved(Member.objects.filter(house_id__in=house_ids))
+        invalidate_reports()
 
         return Response(
             {"message": f"{updated} houses updated successfully"},
@@ -124,9 +191,15 @@ from django.db.models import Q
 
 from .models import Member, House
 from .serializers import MemberSerializer
+from .pagination import MemberCursorPagination, SearchPagination
+from .search import ranked_member_ids, search_terms
+from .filters import DEFAULT_FACETS, MemberFilterBackend, facet_counts
+from .sparse import param_list
+from rest_framework.filters import OrderingFilter
+from . import households
 
 
-class MemberViewSet(viewsets.ModelViewSet):
+class MemberViewSet(BulkWriteViewSetMixin, SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     """
     Member ViewSet
 
@@ -135,10 +208,35 @@ class MemberViewSet(viewsets.ModelViewSet):
         - This house-il active members
         - + family members not assigned to any other house
     ✔ Member assign / reassign to house
+    ✔ ?fields= / ?expand= sparse fieldsets, compact rows on list
+    ✔ /members/bulk/ batch create / update
+    ✔ /members/search/?q= ranked name / alias / voter id search
+    ✔ ?gender=&age_min=&booth=&education=… filters (Survey/filters.py),
+      ?ordering=-m_age, /members/facets/ counts for the same filters
+    ✔ /members/{id}/household-graph/ guardians + house history (Survey/graph.py)
+    ✔ /members/{id}/wards/ members whose guardian resolved to this member
     """
 
-    queryset = Member.objects.select_related("family", "house").all()
+    queryset = Member.objects.all()
     serializer_class = MemberSerializer
+    list_serializer_class = MemberListSerializer
+    list_actions = ("list", "search", "facets", "wards")
+    pagination_class = MemberCursorPagination
+    filter_backends = [MemberFilterBackend, OrderingFilter]
+    ordering = ["id"]
+    ordering_fields = [
+        "id", "m_name_en", "m_name_ml", "m_age", "date_of_birth",
+        "polling_booth_no", "roll_no_sec", "roll_no_2025", "revision",
+    ]
+
+    related_plan = {
+        "house": lambda qs: qs.prefetch_related(
+            Prefetch("house", queryset=House.objects.select_related("family", "cluster"))
+        ),
+        "educations": lambda qs: qs.prefetch_related("educations"),
+        "name_variants": lambda qs: qs.prefetch_related("name_variants"),
+        "madrasa_details": lambda qs: qs.prefetch_related("madrasa_details"),
+    }
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -175,6 +273,60 @@ class MemberViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """
+        ?facets=gender,age,booth plus any list filter
+
+        Member count and per-value counts of each facet for the filtered
+        members, in one grouped query.
+        """
+        names = param_list(request, "facets") or DEFAULT_FACETS
+        return Response(facet_counts(self.filter_queryset(self.get_queryset()), names))
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        ?q=abdul rahman / ?q=KL001 / Malayalam text
+
+        Every term must appear in the member's names, guardian names,
+        voter / EPIC id or one of their aliases.
+        Best matches first, ?page= / ?page_size= numbered pages.
+        """
+        q = request.query_params.get("q", "")
+        if not search_terms(q):
+            return Response(
+                {"error": "q is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        paginator = SearchPagination()
+        page_ids = paginator.paginate_queryset(ranked_member_ids(q), request, view=self)
+        members = self.get_queryset().in_bulk(page_ids)
+        serializer = self.get_serializer([members[i] for i in page_ids if i in members], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=["get"], url_path="household-graph")
+    def household_graph(self, request, pk=None):
+        """
+        Members and houses around this member (family, current / original
+        house, house history) with guardian and house edges, and the
+        member's guardian line. Same number of queries for any household.
+        """
+        member = get_object_or_404(Member.objects.only(*graph.ROOT_FIELDS), pk=pk)
+        self.check_object_permissions(request, member)
+        return Response(graph.member_household(member).graph(member.pk))
+
+    @action(detail=True, methods=["get"])
+    def wards(self, request, pk=None):
+        """Members listing this member as guardian (Survey/guardians.py), eldest first."""
+        member = get_object_or_404(Member.objects.only("id"), pk=pk)
+        self.check_object_permissions(request, member)
+        wards = self.get_queryset().filter(guardian_link__guardian=member).order_by(
+            F("m_age").desc(nulls_last=True), "id"
+        )
+        return Response(self.get_serializer(wards, many=True).data)
+
     @action(detail=True, methods=["put"], url_path="assign-house")
     def assign_house(self, request, pk=None):
         """
@@ -185,77 +337,174 @@ class MemberViewSet(viewsets.ModelViewSet):
         ✔ Only ONE active house per member
         ✔ MemberHouse history maintained
         """
+        member = self.get_object()
+        house_id = request.data.get("house_id")
+
+        if not house_id:
+            return Response(
+                {"error": "house_id is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
-            member = self.get_object()
-            house_id = request.data.get("house_id")
+            new_house = House.objects.get(id=house_id)
+        except House.DoesNotExist:
+            return Response(
+                {"error": "House not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-            if not house_id:
-                return Response(
-                    {"error": "house_id is required"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        households.assign_house([member.id], new_house)
 
-            try:
-                new_house = House.objects.get(id=house_id)
-            except House.DoesNotExist:
-                return Response(
-                    {"error": "House not found"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+        return Response(
+            {
+                "message": "Member successfully transferred to new house",
+                "member_id": member.id,
+                "house_id": new_house.id,
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=["put"], url_path="assign-house")
+    def bulk_assign_house(self, request):
+        """
+        Move many members to one house in a single transaction.
 
-            # 🔴 1. Deactivate ALL old house links
-            MemberHouse.objects.filter(
-                member=member,
-                is_active=True
-            ).update(is_active=False)
-
-            # 🔴 2. Clear old house reference
-            member.house = None
-            member.is_active_in_house = False
-            member.save(update_fields=["house", "is_active_in_house"])
-
-            # 🔴 3. Assign to NEW house
-            member.house = new_house
-            member.is_active_in_house = True
-            member.save(update_fields=["house", "is_active_in_house"])
-
-            # 🔴 4. Activate MemberHouse link
-            MemberHouse.objects.update_or_create(
-                member=member,
-                house=new_house,
-                defaults={"is_active": True}
+        Body: {"house_id": 1, "member_ids": [1, 2, 3]}
+        Nothing is moved if any member id is unknown.
+        """
+        house_id = request.data.get("house_id")
+        member_ids = request.data.get("member_ids")
+
+        if not house_id or not isinstance(member_ids, list) or not member_ids:
+            return Response(
+                {"error": "house_id and member_ids are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not all(isinstance(i, int) for i in member_ids):
+            return Response(
+                {"error": "member_ids must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            new_house = House.objects.get(id=house_id)
+        except House.DoesNotExist:
             return Response(
-                {
-                    "message": "Member successfully transferred to new house",
-                    "member_id": member.id,
-                    "house_id": new_house.id,
-                },
-                status=status.HTTP_200_OK
+                {"error": "House not found"},
+                status=status.HTTP_404_NOT_FOUND
             )
 
-        except Exception as e:
-            print("Assign Error:", e)
+        found = set(Member.objects.filter(id__in=member_ids).values_list("id", flat=True))
+        missing = sorted(set(member_ids) - found)
+        if missing:
             return Response(
-                {"error": "Internal Server Error"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"error": "Members not found", "member_ids": missing},
+                status=status.HTTP_404_NOT_FOUND
             )
-        
+
+        moved = households.assign_house(member_ids, new_house)
+
+        return Response(
+            {
+                "message": f"{moved} members transferred to new house",
+                "member_ids": sorted(found),
+                "house_id": new_house.id,
+            },
+            status=status.HTTP_200_OK
+        )
+
+
 @api_view(["GET"])
 def voters(request):
-    voters = Member.objects.filter(election_id=True)
+    # every relation MemberSerializer touches, loaded up front
+    houses = House.objects.select_related("family", "cluster")
+    voters = (
+        Member.objects.filter(election_id=True)
+        .select_related("family", "madrasa_details")
+        .prefetch_related(Prefetch("house", queryset=houses), "name_variants", "educations")
+    )
     serializer = MemberSerializer(voters, many=True)
     return Response(serializer.data)
 
 
+# ------------------ EXPORT ------------------
+from .exports import csv_chunks, export_rows, parse_columns, xlsx_file
+
+
+def export_response(request, queryset, filename):
+    """
+    ?type=csv|xlsx  ?columns=a,b,...  ?booth=  ?ward=  ?cluster=
+    """
+    export_type = request.query_params.get("type", "csv").lower()
+    if export_type not in ("csv", "xlsx"):
+        return Response(
+            {"error": "type must be csv or xlsx"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    columns = parse_columns(request.query_params.get("columns"))
+    filters = ReportFilters.from_params(request.query_params)
+    rows = export_rows(filters.members(queryset), columns)
+
+    if export_type == "xlsx":
+        return FileResponse(xlsx_file(rows, columns), as_attachment=True, filename=f"{filename}.xlsx")
+
+    response = StreamingHttpResponse(csv_chunks(rows, columns), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+@api_view(["GET"])
+def export_members(request):
+    return export_response(request, Member.objects.all(), "members")
+
+
+@api_view(["GET"])
+def export_voters(request):
+    return export_response(request, Member.objects.filter(election_id=True), "voters")
+
+
+# ------------------ SYNC ------------------
+from django.views.decorators.gzip import gzip_page
+
+from .sync import SYNC_LIMIT, SYNC_MAX_LIMIT, changes
+
+
+@gzip_page
+@api_view(["GET"])
+def sync_changes(request):
+    """
+    Offline survey clients: ?since=<"next" from the previous pull>&limit=
+
+    ✔ Only rows created / updated / deleted after the token
+    ✔ Keep pulling while "more" is true
+    ✔ gzip-compressed when the client accepts it
+    """
+    limit = request.query_params.get("limit", "")
+    limit = min(int(limit), SYNC_MAX_LIMIT) if limit.isdigit() and int(limit) > 0 else SYNC_LIMIT
+    return Response(changes(request.query_params.get("since"), limit))
+
+
+from . import rollups
+
+
+@api_view(["GET"])
+def rollup_summary(request):
+    """
+    Demographic counts from the materialized rollups:
+    ?constituency=<id>&booth=<no>&cluster=<id>&group_by=constituency,booth,cluster
+    """
+    return Response(rollups.summarize(request.query_params))
+
+
 # ------------------ MADRASA DETAILS ------------------
-class MadrasaDetailsViewSet(viewsets.ModelViewSet):
+class MadrasaDetailsViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
     queryset = MadrasaDetails.objects.all()
     serializer_class = MadrasaDetailsSerializer
 
-class MemberEducationViewSet(viewsets.ModelViewSet):
-    queryset = MemberEducation.objects.select_related("member").all()
+class MemberEducationViewSet(SparseFieldsViewSetMixin, viewsets.ModelViewSet):
+    queryset = MemberEducation.objects.all()
     serializer_class = MemberEducationSerializer    
 
 
@@ -267,57 +516,86 @@ def update_cluster(request):
     if not house_ids or not cluster_id:
         return Response({"error": "Missing data"}, status=400)
 
-    House.objects.filter(id__in=house_ids).update(cluster_id=cluster_id)
+    with transaction.atomic():
+        House.objects.filter(id__in=house_ids).update(cluster_id=cluster_id, revision=next_revision())
+        members_moved(Member.objects.filter(house_id__in=house_ids))
+    invalidate_reports()
     return Response({"success": True})
 
 
 # ------------------ REPORT API ------------------
 @api_view(['GET'])
 def report(request):
-    house_count = Family.objects.values("h_no").distinct().count()
-    member_count = Member.objects.count()
-    family_count = Family.objects.count()
-
-    # Prefetch members to avoid N+1 queries
-    families = Family.objects.prefetch_related("members").all()
-    houses_data = [
-        {
-            "family_name_en": f.family_name_en,
-            "family_name_ml": f.family_name_ml,
-            "h_no": f.h_no,
-            "sub": f.sub,
-            "member_count": f.members.count()
-        }
-        for f in families
-    ]
+    """
+    Dashboard totals, optionally narrowed with ?cluster=<id>&ward=<id>&booth=<no>.
+
+    ✔ Unchanged data + matching If-None-Match → 304, no queries
+    ✔ Cached body served as-is until a write invalidates it
+    ✔ Otherwise the ``houses`` list is streamed and cached on the way out
+    """
+    filters = ReportFilters.from_params(request.query_params)
+    version = current_version()
+    etag = report_etag(filters, version)
+
+    client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in client_etags or "*" in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        body = cached_report(filters, version)
+        if body is not None:
+            response = HttpResponse(body, content_type="application/json")
+        else:
+            response = StreamingHttpResponse(
+                caching(stream_report(filters), filters, version),
+                content_type="application/json",
+            )
 
-    # Education summary now from MemberEducation model
-    qs = MemberEducation.objects.values("education", "education_status").annotate(total=Count("id"))
-
-    summary = {}
-    for row in qs:
-        level = row["education"]
-        status = (row["education_status"] or "").lower()
-        total = row["total"]
-
-        if level not in summary:
-            summary[level] = {"name": level, "passed": 0, "failed": 0, "studying": 0}
-
-        if status == "passed":
-            summary[level]["passed"] += total
-        elif status == "failed":
-            summary[level]["failed"] += total
-        elif status == "studying":
-            summary[level]["studying"] += total
-
-    # fixed order
-    levels = ["10th", "+1", "+2", "UG", "PG", "PhD"]
-    education_summary = [summary[l] for l in levels if l in summary]
-
-    return Response({
-        "house_count": house_count,
-        "member_count": member_count,
-        "family_count": family_count,
-        "houses": houses_data,
-        "education_summary": education_summary
-    })
+    response["ETag"] = etag
+    return response
+
+
+# ------------------ IMPORT JOBS ------------------
+from rest_framework import mixins
+
+from . import jobs
+from .models import ImportJob
+from .serializers import ImportJobSerializer
+
+
+class ImportJobViewSet(
+    mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Background sheet imports
+
+    ✔ POST kind + file (multipart) → job starts in worker processes
+    ✔ GET /import-jobs/<id>/ → status, chunk / row progress, first skipped rows
+    ✔ GET /import-jobs/<id>/errors/ → every skipped row
+    ✔ POST /import-jobs/<id>/resume/ → retry what didn't finish
+    """
+
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    pagination_class = IdCursorPagination
+
+    def perform_create(self, serializer):
+        jobs.launch(serializer.save())
+
+    @action(detail=True, methods=["get"])
+    def errors(self, request, pk=None):
+        return Response(jobs.row_errors(self.get_object()))
+
+    @action(detail=True, methods=["post"])
+    def resume(self, request, pk=None):
+        job = self.get_object()
+        # a job whose processes died stays "running"; without a heartbeat it is fair game
+        if job.status == "running" and not jobs.is_stale(job):
+            return Response(
+                {"error": "Job is still running"},
+                status=status.HTTP_409_CONFLICT
+            )
+        job.status = "pending"
+        job.save(update_fields=["status"])
+        job = jobs.launch(job)
+        return Response(self.get_serializer(job).data)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -92,11 +93,77 @@ WSGI_APPLICATION = 'community.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite is the zero-setup default. Set DB_ENGINE=postgres (and DB_NAME,
+# DB_USER, DB_PASSWORD, DB_HOST, DB_PORT) for production, where imports no
+# longer lock readers out. DB_CONN_MAX_AGE keeps connections open between
+# requests; DB_POOL=1 uses psycopg's connection pool instead (Django does not
+# allow both, so the pool turns persistent connections off).
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite').lower()
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    DB_POOL = os.environ.get('DB_POOL', '') in ('1', 'true', 'yes')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'community'),
+            'USER': os.environ.get('DB_USER', 'community'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN', '2')),
+                    'max_size': int(os.environ.get('DB_POOL_MAX', '10')),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    # Run on every new connection (Survey/management/commands/bench_sqlite_reads.py
+    # measures the difference). SQLITE_JOURNAL_MODE=DELETE restores the old mode.
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),  # readers don't wait for writers
+        'synchronous': 'NORMAL',    # with WAL: fsync at checkpoints, not every commit
+        'cache_size': -65536,       # 64 MiB page cache (negative = KiB)
+        'mmap_size': 268435456,     # 256 MiB of the file read through mmap
+        'temp_store': 'MEMORY',
+    }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {k}={v}' for k, v in SQLITE_PRAGMAS.items()),
+                # busy timeout: wait up to this many seconds for a lock before failing
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '20')),
+                # take the write lock at BEGIN, so a transaction never has to upgrade
+                # a read lock mid-way (that case fails at once, ignoring the timeout)
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
+
+
+# Cache
+# /api/report/ bodies and their data version are kept in the "reports" cache
+# (Survey/reports.py). It is file-backed so an import command or import-job
+# worker invalidating reports reaches every web worker; REPORT_CACHE_DIR
+# moves it (every process must point at the same folder).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'REPORT_CACHE_DIR',
+            os.path.join(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'), 'report-cache'),
+        ),
+    },
 }
 
 
@@ -136,6 +203,23 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (import job sheets)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+
+# Parsed-sheet cache (Survey/ingest.py): files from INGEST_CACHE_MIN_BYTES up,
+# newest INGEST_CACHE_MAX tables kept
+INGEST_CACHE_DIR = os.environ.get('INGEST_CACHE_DIR', os.path.join(MEDIA_ROOT, 'ingest-cache'))
+INGEST_CACHE_MIN_BYTES = int(os.environ.get('INGEST_CACHE_MIN_BYTES', 1024 * 1024))
+INGEST_CACHE_MAX = int(os.environ.get('INGEST_CACHE_MAX', 20))
+
+# Worker processes per import job, 0 runs jobs inside the request
+IMPORT_JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS', 2))
+# Seconds between a running job's heartbeats, and without one before the
+# job counts as crashed (and can be resumed from the API)
+IMPORT_JOB_HEARTBEAT = int(os.environ.get('IMPORT_JOB_HEARTBEAT', 30))
+IMPORT_JOB_STALE_AFTER = int(os.environ.get('IMPORT_JOB_STALE_AFTER', 600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
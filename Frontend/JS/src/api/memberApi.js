@@ -0,0 +1,22 @@
+import axios from "axios";
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL;
+
+// largest page /api/members/ serves (KeysetPagination.max_page_size)
+const PAGE_SIZE = 1000;
+
+// Fetch Members: /api/members/ answers in { next, previous, results } pages,
+// so follow `next` until the last one. Pass the axios instance to send
+// its auth headers; `params` are the list filters (?family=, ?booth=, ...).
+export const getAllMembers = async (client = axios, params = {}) => {
+  const members = [];
+  let res = await client.get(`${API_BASE_URL}/api/members/`, {
+    params: { ...params, page_size: PAGE_SIZE },
+  });
+  members.push(...res.data.results);
+  while (res.data.next) {
+    res = await client.get(res.data.next);
+    members.push(...res.data.results);
+  }
+  return members;
+};
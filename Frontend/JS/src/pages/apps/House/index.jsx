@@ -7,6 +7,7 @@ import ViewHouseForm from "./ViewHouseForm";
 import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import { faTrash, faEdit, faEye,faPlus, faSearch, faTimes } from '@fortawesome/free-solid-svg-icons';
 import axios from "axios";
+import { getAllMembers } from "../../../api/memberApi";
 import "./HouseList.css";
 import ViewClusterHouses from "./ViewClusterHouses"; // new component
 import * as XLSX from "xlsx";
@@ -88,13 +89,13 @@ const isBulkClusterUpdate = selectedRows.length > 0;
     try {
       const [housesRes, membersRes, familiesRes, clustersRes] = await Promise.all([
         axios.get(`${API_BASE_URL}/api/houses/`),
-        axios.get(`${API_BASE_URL}/api/members/`),
+        getAllMembers(),
         axios.get(`${API_BASE_URL}/api/families/`),
         axios.get(`${API_BASE_URL}/api/clusters/`),
       ]);
 
       setHouses(housesRes.data);
-      setMembers(membersRes.data);
+      setMembers(membersRes);
       setFamilies(familiesRes.data);
       setClusters(clustersRes.data); // ✅ now works properly
     } catch (e) {
@@ -7,6 +7,7 @@ import { faTrash, faEdit, faEye } from "@fortawesome/free-solid-svg-icons";
 
 import PageTitle from "../../../components/PageTitle";
 import api from "../../../api/axios";
+import { getAllMembers } from "../../../api/memberApi";
 import AddEditMember from "./AddEditMember";
 import ViewMember from "./ViewMember";
 import { toast, ToastContainer } from "react-toastify";
@@ -40,12 +41,12 @@ const MemberDetailsApp = () => {
     try {
       setLoading(true);
       const [mRes, fRes, wRes] = await Promise.all([
-        api.get("members/"),
+        getAllMembers(api),
         api.get("families/"),
         api.get("wards/"),
       ]);
 
-      setMembers(mRes.data);
+      setMembers(mRes);
       setFamilies(fRes.data);
       setWards(wRes.data);
     } catch {
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import axios from "axios";
+import { getAllMembers } from "../../../api/memberApi";
 import {
   Row,
   Col,
@@ -87,8 +88,7 @@ const BOOTH_MAP = {
 
   const fetchMembers = async () => {
     try {
-      const res = await axios.get(`${API_BASE_URL}/api/members/`);
-      setMembers(res.data);
+      setMembers(await getAllMembers());
     } catch (err) {
       console.error(err);
     } finally {
@@ -1,12 +1,10 @@
 import React, { useEffect, useState } from "react";
-import axios from "axios";
+import { getAllMembers } from "@/api/memberApi";
 import { Card, Table, Button, Spinner } from "react-bootstrap";
 import PageTitle from "@/components/PageTitle";
 import * as XLSX from "xlsx";
 import { useNavigate } from "react-router-dom";
 
-const API_BASE_URL = import.meta.env.VITE_API_BASE_URL;
-
 const VotersFormList = () => {
   const [members, setMembers] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -23,8 +21,7 @@ const VotersFormList = () => {
 
   const fetchMembers = async () => {
     try {
-      const res = await axios.get(`${API_BASE_URL}/api/members/`);
-      setMembers(res.data);
+      setMembers(await getAllMembers());
     } catch (err) {
       console.error("Error fetching members:", err);
     } finally {